@@ -1,9 +1,18 @@
+import argparse
+
 from deploy_chatbot_python.launcher import Launcher
 import deploy_chatbot_python.utils.load_env  # pylint: disable=unused-import
+from deploy_chatbot_python.config import constants
 
 
 def main() -> None:
-    launcher = Launcher()
+    parser = argparse.ArgumentParser(description="Launch the chatbot API and dashboard")
+    parser.add_argument("--production", action="store_true",
+                        help="pre-forked API workers sharing one loaded index, no hot-reload")
+    parser.add_argument("--workers", type=int, default=constants.PREFORK_NUM_WORKERS,
+                        help="number of API workers in production mode")
+    args = parser.parse_args()
+    launcher = Launcher(production=args.production, num_workers=args.workers)
     launcher.run()
 
 if __name__ == "__main__":
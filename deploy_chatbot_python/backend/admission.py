@@ -0,0 +1,126 @@
+import math
+import time
+import asyncio
+from typing import Awaitable, Callable, TypeVar, Union
+from dataclasses import dataclass, field
+
+from fastapi import HTTPException, Request
+
+from deploy_chatbot_python.core import metrics
+from deploy_chatbot_python.config import constants
+from deploy_chatbot_python.logging.logger_instance import log
+
+
+T = TypeVar('T')
+
+CLIENT_CLOSED_REQUEST = 499  # nginx's status of requests the client abandoned
+
+
+@dataclass
+class Admission:
+    """A held query slot, `release` is idempotent"""
+    controller: "AdmissionController"
+    admitted_at: float = field(default_factory=time.perf_counter)
+    released: bool = field(default=False, init=False)
+
+    def release(self) -> None:
+        if not self.released:
+            self.released = True
+            self.controller.release(self)
+
+
+@dataclass
+class AdmissionController:
+    """
+    Bounds the queries in flight at `max_in_flight`, with at most `max_queued` more waiting for
+    a slot. A request finding the queue full is rejected at once (429), one waiting longer than
+    `queue_timeout` is shed (503); both with a `Retry-After` estimated from the queue length and
+    the recent query durations
+    """
+    max_in_flight: int = field(default_factory=lambda: constants.ADMISSION_MAX_IN_FLIGHT)
+    max_queued: int = field(default_factory=lambda: constants.ADMISSION_MAX_QUEUED)
+    queue_timeout: float = constants.ADMISSION_QUEUE_TIMEOUT_SECONDS
+
+    in_flight: int = field(default=0, init=False)
+    queued: int = field(default=0, init=False)
+    _average_seconds: float = field(default=1.0, init=False)  # moving average of query durations
+    _semaphore: asyncio.Semaphore = field(init=False)
+
+    def __post_init__(self):
+        self._semaphore = asyncio.Semaphore(self.max_in_flight)
+
+    @property
+    def retry_after(self) -> int:
+        """Seconds until the queries ahead have likely finished"""
+        waves = (self.queued + self.in_flight) / self.max_in_flight
+        return max(1, math.ceil(waves * self._average_seconds))
+
+    def _reject(self, status_code: int, reason: str, detail: str) -> HTTPException:
+        metrics.SHED_REQUESTS.inc(reason=reason)
+        log.warning('Shed query (%s) [in flight: %d | queued: %d]',
+                    reason, self.in_flight, self.queued)
+        return HTTPException(status_code=status_code, detail=detail,
+                             headers={"Retry-After": str(self.retry_after)})
+
+    async def acquire(self, timeout: Union[float, None] = None) -> Admission:
+        """Wait (at most `queue_timeout`, or `timeout` if shorter) for a query slot"""
+        if self._semaphore.locked() and self.queued >= self.max_queued:
+            raise self._reject(429, 'queue_full', "Too many queued queries")
+        timeout = self.queue_timeout if timeout is None else min(timeout, self.queue_timeout)
+        self.queued += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout)
+        except asyncio.TimeoutError:
+            raise self._reject(503, 'queue_timeout', "Timed out waiting for a query slot") from None
+        finally:
+            self.queued -= 1
+        self.in_flight += 1
+        return Admission(self)
+
+    def release(self, admission: Admission) -> None:
+        self.in_flight -= 1
+        self._semaphore.release()
+        duration = time.perf_counter() - admission.admitted_at
+        self._average_seconds += 0.1 * (duration - self._average_seconds)
+
+
+async def _wait_for_disconnect(request: Request) -> None:
+    while (await request.receive())["type"] != "http.disconnect":
+        pass
+
+
+async def run_within_deadline(controller: AdmissionController, query: Callable[[], Awaitable[T]],
+                              deadline: float = constants.QUERY_DEADLINE_SECONDS) -> T:
+    """Run `query` in an admitted slot, within `deadline` seconds (queueing included, 504)"""
+    start = time.perf_counter()
+    admission = await controller.acquire(timeout=deadline)
+    try:
+        return await asyncio.wait_for(query(), deadline - (time.perf_counter() - start))
+    except asyncio.TimeoutError:
+        metrics.SHED_REQUESTS.inc(reason='deadline')
+        raise HTTPException(status_code=504, detail="Query deadline exceeded") from None
+    finally:
+        admission.release()
+
+
+async def run_admitted(controller: AdmissionController, request: Request,
+                       query: Callable[[], Awaitable[T]],
+                       deadline: float = constants.QUERY_DEADLINE_SECONDS) -> T:
+    """
+    Run `query` in an admitted slot, within `deadline` seconds (queueing included, 504 if
+    exceeded). The query is cancelled if the client disconnects meanwhile
+    """
+    task = asyncio.ensure_future(run_within_deadline(controller, query, deadline))
+    disconnect = asyncio.ensure_future(_wait_for_disconnect(request))
+    try:
+        await asyncio.wait({task, disconnect}, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        disconnect.cancel()
+        task.cancel()  # no-op once done
+    if not task.done():
+        await asyncio.wait({task})  # let the query unwind (release its slot)
+    if task.cancelled():
+        metrics.SHED_REQUESTS.inc(reason='disconnect')
+        log.info('Client disconnected, cancelled its query')
+        raise HTTPException(status_code=CLIENT_CLOSED_REQUEST, detail="Client disconnected")
+    return task.result()
@@ -0,0 +1,67 @@
+import asyncio
+from typing import TYPE_CHECKING, AsyncIterator, Dict, List, Tuple, Union
+
+from fastapi import HTTPException
+
+from deploy_chatbot_python.backend.admission import AdmissionController, run_within_deadline
+from deploy_chatbot_python.config import constants
+from deploy_chatbot_python.logging.logger_instance import log
+
+if TYPE_CHECKING:
+    from deploy_chatbot_python.core.index_manager import IndexManager
+
+
+async def iter_batch_results(
+    index_manager: "IndexManager",
+    questions: List[str],
+    concurrency: int = constants.BATCH_QUERY_CONCURRENCY,
+    admission_controller: Union[AdmissionController, None] = None,
+) -> AsyncIterator[dict]:
+    """
+    Yield `{"index": ..., "response": ...}` (or `"error"`) for every question, in completion
+    order. Identical questions are queried once. Pending queries are cancelled when the
+    iteration stops early (e.g. the client disconnected).
+    With `admission_controller`, each question is admitted like a single query (within
+    `QUERY_DEADLINE_SECONDS`), so a batch holds at most `concurrency` slots and is shed under
+    load as well: shed questions have an `"error"` and its HTTP `"status"`
+    """
+    indices: Dict[str, List[int]] = {}
+    for index, question in enumerate(questions):
+        indices.setdefault(question, []).append(index)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def _query(question: str) -> str:
+        if admission_controller is None:
+            return await index_manager.aquery(question)
+        return await run_within_deadline(admission_controller,
+                                         lambda: index_manager.aquery(question))
+
+    async def _answer(question: str) -> Tuple[str, dict]:
+        async with semaphore:
+            try:
+                return question, {"response": await _query(question)}
+            except HTTPException as e:
+                return question, {"error": e.detail, "status": e.status_code}
+            except Exception as e:  # pylint: disable=W0718 # reported per question
+                log.exception('Batch query failed: %s', question)
+                return question, {"error": str(e)}
+
+    tasks = [asyncio.ensure_future(_answer(question)) for question in indices]
+    log.debug('Batch of %d questions (%d unique)', len(questions), len(tasks))
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            question, result = await next_done
+            for index in indices[question]:
+                yield {"index": index, **result}
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def gather_batch_results(index_manager: "IndexManager", questions: List[str],
+                               **kwargs) -> List[dict]:
+    """All results of `iter_batch_results`, in the order of `questions`"""
+    results = [None] * len(questions)
+    async for result in iter_batch_results(index_manager, questions, **kwargs):
+        results[result["index"]] = result
+    return results
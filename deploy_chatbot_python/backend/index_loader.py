@@ -0,0 +1,89 @@
+import time
+import asyncio
+from typing import TYPE_CHECKING, ClassVar, Union
+from dataclasses import dataclass, field
+
+from deploy_chatbot_python.core.index_watcher import IndexWatcher
+from deploy_chatbot_python.config import constants
+from deploy_chatbot_python.logging.logger_instance import log
+
+if TYPE_CHECKING:  # heavy (llama-index) import, deferred to `_load`
+    from deploy_chatbot_python.core.index_manager import IndexManager
+
+
+@dataclass
+class IndexLoader:
+    """
+    Constructs `IndexManager` in a worker thread, so the API is live while the index loads.
+    A manager preloaded before forking the API workers is used as is.
+    With `INDEX_WATCH_ENABLED`, training data changes are hot-reloaded once it is loaded: only
+    the primary process (the first API worker) watches the training data and saves the response
+    cache, the other workers swap in the index it saved
+    """
+    preloaded_index_manager: ClassVar[Union["IndexManager", None]] = None
+    is_primary: ClassVar[bool] = True
+
+    index_manager: Union["IndexManager", None] = field(default=None, init=False)
+    error: Union[BaseException, None] = field(default=None, init=False)
+    _task: Union[asyncio.Task, None] = field(default=None, init=False)
+    _watcher: Union[IndexWatcher, None] = field(default=None, init=False)
+
+    @property
+    def status(self) -> str:
+        if self.index_manager is not None:
+            return 'ready'
+        return 'failed' if self.error is not None else 'loading'
+
+    @property
+    def is_ready(self) -> bool:
+        return self.index_manager is not None
+
+    def _load(self) -> None:
+        # pylint: disable=import-outside-toplevel  # keeps `import backend.server` fast
+        from deploy_chatbot_python.core.index_manager import IndexManager
+
+        start = time.perf_counter()
+        try:
+            self.index_manager = IndexManager()
+        except Exception as e:  # pylint: disable=W0718 # reported by `/ready`
+            self.error = e
+            log.error('Failed to load the index: %s', e)
+            raise
+        log.info('Index loaded in %.2f seconds', time.perf_counter() - start)
+
+    def _start_watcher(self) -> None:
+        if not constants.INDEX_WATCH_ENABLED or self.index_manager is None:
+            return
+        self._watcher = IndexWatcher(self.index_manager, follow=not self.is_primary)
+        self._watcher.start()
+
+    def _load_and_watch(self) -> None:
+        self._load()
+        self._start_watcher()
+
+    @classmethod
+    def preload(cls) -> None:
+        """Load the index in this process, processes forked afterwards share it copy-on-write"""
+        index_loader = cls()
+        index_loader._load()  # pylint: disable=protected-access
+        cls.preloaded_index_manager = index_loader.index_manager
+
+    def start(self, background: bool = True) -> None:
+        if self.preloaded_index_manager is not None:
+            self.index_manager = self.preloaded_index_manager
+            self._start_watcher()
+        elif background:
+            self._task = asyncio.create_task(asyncio.to_thread(self._load_and_watch))
+        else:
+            self._load_and_watch()
+
+    async def wait(self) -> None:
+        if self._task is not None:
+            await asyncio.gather(self._task, return_exceptions=True)
+
+    async def close(self) -> None:
+        await self.wait()  # the loading thread cannot be interrupted
+        if self._watcher is not None:
+            await asyncio.to_thread(self._watcher.stop)  # waits for a reload in progress
+        if self.index_manager is not None and self.is_primary:
+            self.index_manager.close()  # one process saves the response cache
@@ -0,0 +1,129 @@
+import os
+import time
+import signal
+import socket
+import argparse
+from typing import Dict, Tuple, Union
+from dataclasses import dataclass, field
+
+import uvicorn
+
+from deploy_chatbot_python.backend.index_loader import IndexLoader
+from deploy_chatbot_python.utils.restart_backoff import RestartBackoff
+from deploy_chatbot_python.config import constants
+from deploy_chatbot_python.logging.logger_instance import log
+
+
+SUPERVISE_INTERVAL_SECONDS = 0.5
+
+
+@dataclass
+class PreforkServer:  # pylint: disable=too-many-instance-attributes
+    """
+    Serves the API from `num_workers` forked uvicorn processes accepting on one shared socket.
+    The index is loaded once in this (master) process before forking, so its memory is shared
+    copy-on-write by the workers (and the memory-mapped vectors through the page cache).
+    Workers that exit are restarted with exponential backoff.
+    """
+    num_workers: int = constants.PREFORK_NUM_WORKERS
+    host: str = constants.API_HOST_ADDRESS
+    port: int = constants.API_HOST_PORT
+
+    _socket: Union[socket.socket, None] = field(default=None, init=False)
+    # pid: (slot, start time)
+    _workers: Dict[int, Tuple[int, float]] = field(default_factory=dict, init=False)
+    _backoffs: Dict[int, RestartBackoff] = field(default_factory=dict, init=False)
+    _restarts: Dict[int, float] = field(default_factory=dict, init=False)  # slot: restart time
+    _stopping: bool = field(default=False, init=False)
+
+    def run(self) -> None:
+        if not hasattr(os, 'fork'):
+            raise ValueError("Pre-forked API workers require a Unix OS.")
+        IndexLoader.preload()
+        self._socket = self._bind()
+        signal.signal(signal.SIGTERM, self._handle_stop)
+        signal.signal(signal.SIGINT, self._handle_stop)
+        log.info('Serving API on %s:%s with %d workers', self.host, self.port, self.num_workers)
+        for slot in range(self.num_workers):
+            self._spawn(slot)
+        self._supervise()
+        self._socket.close()
+        log.info('All API workers stopped')
+
+    def _bind(self) -> socket.socket:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((self.host, self.port))
+        sock.listen(constants.PREFORK_BACKLOG)
+        sock.set_inheritable(True)
+        return sock
+
+    def _spawn(self, slot: int) -> None:
+        pid = os.fork()
+        if pid == 0:
+            self._run_worker(slot)
+        self._workers[pid] = (slot, time.monotonic())
+        log.info('Started API worker %d (PID: %s)', slot, pid)
+
+    def _run_worker(self, slot: int) -> None:
+        """Worker (child) process body, never returns"""
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        IndexLoader.is_primary = slot == 0  # kept by a restarted first worker
+        exit_code = 0
+        try:
+            # pylint: disable=import-outside-toplevel  # imported in the workers only
+            from deploy_chatbot_python.backend.server import api
+
+            server = uvicorn.Server(uvicorn.Config(api, lifespan="on"))
+            server.run(sockets=[self._socket])
+        except BaseException:  # pylint: disable=W0718 # reported, the master restarts the worker
+            log.exception('API worker (PID: %s) crashed', os.getpid())
+            exit_code = 1
+        finally:
+            os._exit(exit_code)  # pylint: disable=protected-access # skip the master's cleanup
+
+    def _handle_stop(self, signum, frame) -> None:  # pylint: disable=unused-argument
+        if self._stopping:
+            return
+        log.info('Stopping API workers...')
+        self._stopping = True
+        self._restarts.clear()
+        for pid in self._workers:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def _supervise(self) -> None:
+        while self._workers or self._restarts:
+            pid, status = os.waitpid(-1, os.WNOHANG) if self._workers else (0, 0)
+            if pid == 0:
+                self._restart_due_workers()
+                time.sleep(SUPERVISE_INTERVAL_SECONDS)
+                continue
+            slot, started_at = self._workers.pop(pid)
+            if self._stopping:
+                continue
+            backoff = self._backoffs.setdefault(slot, RestartBackoff())
+            delay = backoff.next_delay(time.monotonic() - started_at)
+            self._restarts[slot] = time.monotonic() + delay
+            log.warning('API worker %d (PID: %s) exited with code %s, restarting in %.1f seconds',
+                        slot, pid, os.waitstatus_to_exitcode(status), delay)
+
+    def _restart_due_workers(self) -> None:
+        now = time.monotonic()
+        for slot, restart_at in list(self._restarts.items()):
+            if restart_at <= now:
+                del self._restarts[slot]
+                self._spawn(slot)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Serve the API from pre-forked workers")
+    parser.add_argument("--workers", type=int, default=constants.PREFORK_NUM_WORKERS)
+    args = parser.parse_args()
+    PreforkServer(num_workers=args.workers).run()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,15 @@
+from typing import List, Union
+
+from pydantic import BaseModel, Field
+
+from deploy_chatbot_python.config import constants
+
+
+class Query(BaseModel):
+    text: str
+    namespace: Union[str, None] = None  # a named index, None: the default index
+
+
+class BatchQuery(BaseModel):
+    queries: List[Query] = Field(min_length=1, max_length=constants.BATCH_QUERY_MAX_SIZE)
+    stream: bool = False  # NDJSON lines in completion order instead of one ordered JSON list
@@ -1,30 +1,197 @@
+import json
+import time
+import asyncio
+from typing import TYPE_CHECKING, Union
 from contextlib import asynccontextmanager
 
-from pydantic import BaseModel
-from fastapi import FastAPI
+from fastapi import Depends, FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 
-from deploy_chatbot_python.core.index_manager import IndexManager
+from deploy_chatbot_python.backend.admission import Admission, AdmissionController, run_admitted
+from deploy_chatbot_python.backend.index_loader import IndexLoader
+from deploy_chatbot_python.backend.batch_query import gather_batch_results, iter_batch_results
+from deploy_chatbot_python.backend.schemas import BatchQuery, Query
+from deploy_chatbot_python.core import metrics
+from deploy_chatbot_python.core.index_registry import IndexRegistry
+from deploy_chatbot_python.core.profiling import profiler
 from deploy_chatbot_python.config import constants
 from deploy_chatbot_python.logging.logger_instance import log
 
+if TYPE_CHECKING:
+    from deploy_chatbot_python.core.index_manager import IndexManager
 
-class Query(BaseModel):
-    text: str
 
 @asynccontextmanager
 async def lifespan(api_: FastAPI):
-    """This is used to instantiate `IndexManager` once for the entire lifespan of the API"""
-    api_.state.index_manager = IndexManager()
+    """
+    This is used to instantiate `IndexManager` once for the entire lifespan of the API.
+    It is loaded in the background, so the API is live (`/health`) before it is ready (`/ready`).
+    Named indexes (`Query.namespace`) are loaded on first use by the `IndexRegistry`
+    """
+    api_.state.index_loader = IndexLoader()
+    api_.state.index_loader.start(background=constants.BACKGROUND_INDEX_LOADING)
+    api_.state.index_registry = IndexRegistry()
+    api_.state.admission_controller = AdmissionController()
     yield
+    await api_.state.index_loader.close()
+    if IndexLoader.is_primary:  # one process saves the named indexes' response caches
+        await asyncio.to_thread(api_.state.index_registry.close)
 
 api = FastAPI(lifespan=lifespan)
 
+def get_index_manager() -> "IndexManager":
+    index_loader: IndexLoader = api.state.index_loader
+    if not index_loader.is_ready:
+        raise HTTPException(
+            status_code=503,
+            detail=f"Index is {index_loader.status}",
+            headers={"Retry-After": str(constants.NOT_READY_RETRY_AFTER_SECONDS)},
+        )
+    return index_loader.index_manager
+
+async def resolve_index_manager(namespace: Union[str, None]) -> "IndexManager":
+    """The default index, or the named one (loaded in a thread if it is not resident)"""
+    if namespace is None:
+        return get_index_manager()
+    index_registry: IndexRegistry = api.state.index_registry
+    if not index_registry.exists(namespace):
+        raise HTTPException(status_code=404, detail=f"Unknown namespace: {namespace}")
+    return await asyncio.to_thread(index_registry.get, namespace)
+
+class AdmittedStreamingResponse(StreamingResponse):
+    """Releases the query slot once the response is sent, or abandoned by the client"""
+
+    def __init__(self, admission: Admission, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.admission = admission
+
+    async def __call__(self, scope, receive, send) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self.admission.release()
+
+@api.middleware("http")
+async def observe_request_latency(request: Request, call_next):
+    """Time to the response start, labelled by the route template to bound the label values"""
+    start = time.perf_counter()
+    response = await call_next(request)
+    route = request.scope.get("route")
+    metrics.HTTP_REQUEST_SECONDS.observe(
+        time.perf_counter() - start,
+        method=request.method,
+        path=route.path if route is not None else "unmatched",
+        status=response.status_code,
+    )
+    return response
+
+async def profile_request(request: Request, call_next):
+    """
+    Run the request under cProfile if it has the `PROFILING_HEADER: 1` header, or is sampled.
+    The response names the profile in the same header. Streamed bodies are not included
+    """
+    requested = request.headers.get(constants.PROFILING_HEADER) == "1"
+    if not profiler.should_profile(requested):
+        return await call_next(request)
+    with profiler.profile(f"{request.method} {request.url.path}") as path:
+        response = await call_next(request)
+    if path is not None:
+        response.headers[constants.PROFILING_HEADER] = path.name
+    return response
+
+if constants.PROFILING_ENABLED:  # no middleware at all otherwise
+    api.middleware("http")(profile_request)
+
 @api.get("/")
 async def read_root():
     return {"response": "This is a chatbot"}
 
+@api.get("/health")
+async def get_health():
+    """Liveness: the process serves requests, the index may still be loading"""
+    return {"status": "live"}
+
+@api.get("/ready")
+async def get_ready():
+    """Readiness: 200 once the index is loaded, 503 while loading or if loading failed"""
+    index_loader: IndexLoader = api.state.index_loader
+    content = {"status": index_loader.status}
+    if index_loader.error is not None:
+        content["error"] = str(index_loader.error)
+    return JSONResponse(content, status_code=200 if index_loader.is_ready else 503)
+
+@api.get("/metrics")
+async def get_metrics():
+    """Prometheus scrape endpoint, served while the index is loading as well"""
+    if not constants.METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+    return Response(metrics.REGISTRY.render(), media_type=metrics.REGISTRY.content_type)
+
+@api.get("/cache/stats")
+async def get_cache_stats(index_manager: "IndexManager" = Depends(get_index_manager)):
+    response_cache = index_manager.response_cache
+    return {"response": response_cache.stats if response_cache is not None else {}}
+
 @api.post(f"/{constants.API_POST_ENDPOINT}")
-async def post_query(query: Query):
-    response = api.state.index_manager.query(query.text)
+async def post_query(query: Query, request: Request):
+    """Admitted within `QUERY_DEADLINE_SECONDS`, cancelled if the client disconnects"""
+    index_manager = await resolve_index_manager(query.namespace)
+    response = await run_admitted(
+        api.state.admission_controller, request, lambda: index_manager.aquery(query.text)
+    )
     log.debug('fetched response')
     return {"response": response}
+
+@api.post(f"/{constants.API_BATCH_ENDPOINT}")
+async def post_query_batch(batch: BatchQuery):
+    """
+    Answer many questions (of one namespace) at once, identical ones are queried once. Results
+    are returned in order, or with `stream` as NDJSON lines (with the question `index`) as they
+    finish. Each question is admitted and bounded by `QUERY_DEADLINE_SECONDS` like a `/query`
+    """
+    namespaces = {query.namespace for query in batch.queries}
+    if len(namespaces) > 1:
+        raise HTTPException(status_code=422, detail="A batch must query a single namespace")
+    index_manager = await resolve_index_manager(namespaces.pop())
+    questions = [query.text for query in batch.queries]
+    admission_controller: AdmissionController = api.state.admission_controller
+    if not batch.stream:
+        return {"results": await gather_batch_results(
+            index_manager, questions, admission_controller=admission_controller
+        )}
+
+    async def result_lines():
+        async for result in iter_batch_results(index_manager, questions,
+                                               admission_controller=admission_controller):
+            yield json.dumps(result) + "\n"
+
+    return StreamingResponse(result_lines(), media_type="application/x-ndjson")
+
+@api.post(f"/{constants.API_STREAM_ENDPOINT}")
+async def post_query_stream(query: Query):
+    """
+    Server-Sent-Events variant of `post_query`, one `data:` event per response token.
+    The stream ends with an `error` event once `QUERY_DEADLINE_SECONDS` are exceeded
+    """
+    index_manager = await resolve_index_manager(query.namespace)
+    deadline = time.perf_counter() + constants.QUERY_DEADLINE_SECONDS
+    admission_controller: AdmissionController = api.state.admission_controller
+    admission = await admission_controller.acquire(timeout=constants.QUERY_DEADLINE_SECONDS)
+
+    async def event_stream():
+        tokens = index_manager.astream_query(query.text)
+        try:
+            while True:
+                next_token = tokens.__anext__()  # pylint: disable=C2801 # anext() is 3.10+
+                token = await asyncio.wait_for(next_token, deadline - time.perf_counter())
+                yield f"data: {json.dumps({'token': token})}\n\n"
+        except StopAsyncIteration:
+            log.debug('streamed response')
+        except asyncio.TimeoutError:
+            metrics.SHED_REQUESTS.inc(reason='deadline')
+            yield f"event: error\ndata: {json.dumps({'detail': 'Query deadline exceeded'})}\n\n"
+        finally:
+            await tokens.aclose()
+        yield f"event: {constants.STREAM_END_EVENT}\ndata: {{}}\n\n"
+
+    return AdmittedStreamingResponse(admission, event_stream(), media_type="text/event-stream")
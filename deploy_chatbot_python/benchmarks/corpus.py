@@ -0,0 +1,42 @@
+import os
+from pathlib import Path
+from typing import List
+
+import numpy as np
+
+
+CORPUS_VOCABULARY = (
+    'dog', 'poodle', 'beagle', 'terrier', 'collie', 'cabbage', 'carrot', 'lettuce', 'vegetable',
+    'fruit', 'apple', 'banana', 'green', 'red', 'small', 'large', 'loyal', 'fresh', 'is', 'are',
+    'a', 'the', 'and', 'of', 'with', 'often', 'grows', 'barks', 'eats', 'lives', 'garden', 'home',
+)
+
+
+def _sentence(rng: np.random.Generator) -> str:
+    words = rng.choice(CORPUS_VOCABULARY, rng.integers(6, 16))
+    return ' '.join(words).capitalize() + '.'
+
+
+def generate_corpus(directory: Path, num_files: int, paragraphs_per_file: int,
+                    sentences_per_paragraph: int = 8, seed: int = 0) -> List[Path]:
+    """Write `num_files` deterministic synthetic text files to `directory`"""
+    rng = np.random.default_rng(seed)
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for i in range(num_files):
+        paragraphs = [
+            ' '.join(_sentence(rng) for _ in range(sentences_per_paragraph))
+            for _ in range(paragraphs_per_file)
+        ]
+        path = Path(directory) / f'document_{i:05d}.txt'
+        path.write_text('\n\n'.join(paragraphs), encoding='utf-8')
+        paths.append(path)
+    return paths
+
+
+def generate_questions(num_questions: int, seed: int = 1) -> List[str]:
+    rng = np.random.default_rng(seed)
+    return [
+        f"What do you know about the {' '.join(rng.choice(CORPUS_VOCABULARY, 3))}?"
+        for _ in range(num_questions)
+    ]
@@ -0,0 +1,263 @@
+import os
+import json
+import time
+import asyncio
+import argparse
+import tempfile
+from pathlib import Path
+from contextlib import asynccontextmanager, contextmanager
+from dataclasses import dataclass, asdict, field
+from typing import AsyncIterator, Dict, Iterator, List, Union
+
+import httpx
+import numpy as np
+
+from deploy_chatbot_python.benchmarks.corpus import generate_corpus, generate_questions
+from deploy_chatbot_python.benchmarks.run import (
+    _latency_stats, _offline_constants, _patched_constants, write_results,
+)
+from deploy_chatbot_python.config import constants
+from deploy_chatbot_python.logging.logger_instance import log
+
+
+@dataclass
+class LoadTestConfig:  # pylint: disable=too-many-instance-attributes
+    mode: str = 'closed'  # 'closed' (`concurrency` clients) or 'open' (Poisson arrivals at `qps`)
+    concurrency: int = 16
+    qps: float = 20.0
+    duration: float = 10.0  # seconds of sending requests
+    server: str = 'inprocess'  # 'inprocess' (uvicorn on this event loop) or 'subprocess'
+    workers: int = 1  # API worker processes (subprocess server only)
+    timeout: float = constants.POST_REQUEST_TIMEOUT
+    llm_latency: float = 0.05
+    embedding_latency: float = 0.0
+    response_cache: bool = False
+    max_concurrent_queries: int = constants.MAX_CONCURRENT_QUERIES
+    admission_max_in_flight: int = constants.ADMISSION_MAX_IN_FLIGHT
+    admission_max_queued: int = constants.ADMISSION_MAX_QUEUED
+    num_files: int = 20
+    paragraphs_per_file: int = 10
+    num_questions: int = 100  # distinct questions, sent round-robin
+    seed: int = 0
+
+    def __post_init__(self):
+        if self.mode not in ('closed', 'open'):
+            raise ValueError(f"Unknown load mode: {self.mode}")
+        if self.server not in ('inprocess', 'subprocess'):
+            raise ValueError(f"Unknown server: {self.server}")
+
+
+@dataclass
+class _Outcomes:
+    latencies: List[float] = field(default_factory=list)
+    errors: Dict[str, int] = field(default_factory=dict)
+
+    def error(self, kind: str) -> None:
+        self.errors[kind] = self.errors.get(kind, 0) + 1
+
+
+async def _send(client: httpx.AsyncClient, question: str, outcomes: _Outcomes) -> None:
+    start = time.perf_counter()
+    try:
+        response = await client.post(f"/{constants.API_POST_ENDPOINT}", json={"text": question})
+    except httpx.TimeoutException:
+        outcomes.error('timeout')
+        return
+    except httpx.HTTPError as e:
+        outcomes.error(type(e).__name__)
+        return
+    if response.status_code == 200:
+        outcomes.latencies.append(time.perf_counter() - start)
+    else:
+        outcomes.error(str(response.status_code))
+
+
+async def _closed_loop(client: httpx.AsyncClient, questions: List[str],
+                       config: LoadTestConfig, outcomes: _Outcomes) -> None:
+    """`concurrency` clients, each sending its next request when the previous one completes"""
+    end = time.perf_counter() + config.duration
+    counter = iter(range(10 ** 12))
+
+    async def _client() -> None:
+        while time.perf_counter() < end:
+            await _send(client, questions[next(counter) % len(questions)], outcomes)
+
+    await asyncio.gather(*(_client() for _ in range(config.concurrency)))
+
+
+async def _open_loop(client: httpx.AsyncClient, questions: List[str],
+                     config: LoadTestConfig, outcomes: _Outcomes) -> None:
+    """Requests sent at Poisson arrival times (rate `qps`), whether or not earlier ones are done"""
+    rng = np.random.default_rng(config.seed)
+    start = time.perf_counter()
+    send_at, tasks = 0.0, []
+    while send_at < config.duration:
+        await asyncio.sleep(max(start + send_at - time.perf_counter(), 0))
+        question = questions[len(tasks) % len(questions)]
+        tasks.append(asyncio.ensure_future(_send(client, question, outcomes)))
+        send_at += rng.exponential(1 / config.qps)
+    await asyncio.gather(*tasks)
+
+
+def _summarize(outcomes: _Outcomes, config: LoadTestConfig, elapsed: float) -> dict:
+    num_requests = len(outcomes.latencies) + sum(outcomes.errors.values())
+    results = {
+        "requests": num_requests,
+        "ok": len(outcomes.latencies),
+        "errors": outcomes.errors,
+        "error_rate": (num_requests - len(outcomes.latencies)) / max(num_requests, 1),
+        "timeout_rate": outcomes.errors.get('timeout', 0) / max(num_requests, 1),
+        "seconds": elapsed,
+        "throughput_rps": len(outcomes.latencies) / elapsed,
+    }
+    if config.mode == 'open':
+        results["offered_qps"] = num_requests / config.duration
+    if outcomes.latencies:
+        p90, p999 = np.percentile(outcomes.latencies, [90, 99.9])
+        results["latency"] = {
+            **_latency_stats(outcomes.latencies),
+            "p90_ms": float(p90) * 1000,
+            "p999_ms": float(p999) * 1000,
+            "max_ms": max(outcomes.latencies) * 1000,
+        }
+    return results
+
+
+async def _wait_until_ready(client: httpx.AsyncClient, timeout: float) -> None:
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        try:
+            if (await client.get('/ready')).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass  # not listening yet
+        await asyncio.sleep(0.1)
+    raise TimeoutError(f"The API was not ready within {timeout} seconds")
+
+
+@asynccontextmanager
+async def _inprocess_server() -> AsyncIterator[str]:
+    # pylint: disable=import-outside-toplevel  # constants must be patched before loading
+    import uvicorn
+    from deploy_chatbot_python.backend.server import api
+
+    server = uvicorn.Server(uvicorn.Config(
+        api, host=constants.API_HOST_ADDRESS, port=0, log_level='warning', lifespan='on',
+    ))
+    task = asyncio.ensure_future(server.serve())
+    try:
+        while not server.started:
+            if task.done():
+                task.result()  # raises the startup error
+                raise RuntimeError("The API server stopped during startup")
+            await asyncio.sleep(0.01)
+        port = server.servers[0].sockets[0].getsockname()[1]
+        yield f"http://{constants.API_HOST_ADDRESS}:{port}"
+    finally:
+        server.should_exit = True
+        await task
+
+
+@contextmanager
+def _subprocess_server(config: LoadTestConfig, work_dir: Path) -> Iterator[str]:
+    """
+    The production API (`Launcher`) with fake models, on the data in `work_dir`: its fake index
+    and cached answers must not overwrite the real ones
+    """
+    # pylint: disable=import-outside-toplevel  # only needed for this server
+    from deploy_chatbot_python.launcher import Launcher
+
+    environment = {
+        "CHATBOT_DATA_PATH": str(work_dir),
+        "CHATBOT_FAKE_MODELS": "1",
+        "CHATBOT_FAKE_LLM_LATENCY": str(config.llm_latency),
+        "CHATBOT_FAKE_EMBEDDING_LATENCY": str(config.embedding_latency),
+        "CHATBOT_RESPONSE_CACHE": "1" if config.response_cache else "0",
+        "CHATBOT_RESPONSE_CACHE_PERSIST": "0",
+        "CHATBOT_MAX_CONCURRENT_QUERIES": str(config.max_concurrent_queries),
+        "CHATBOT_ADMISSION_MAX_IN_FLIGHT": str(config.admission_max_in_flight),
+        "CHATBOT_ADMISSION_MAX_QUEUED": str(config.admission_max_queued),
+    }
+    original_environment = {name: os.environ.get(name) for name in environment}
+    os.environ.update(environment)
+    launcher = Launcher(production=True, num_workers=config.workers)
+    try:
+        launcher.start_api()
+        yield f"http://{constants.API_HOST_ADDRESS}:{constants.API_HOST_PORT}"
+    finally:
+        launcher.stop_all()
+        for name, value in original_environment.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+
+async def _drive(base_url: str, questions: List[str], config: LoadTestConfig) -> dict:
+    limits = httpx.Limits(max_connections=config.concurrency if config.mode == 'closed' else None)
+    async with httpx.AsyncClient(base_url=base_url, timeout=config.timeout,
+                                 limits=limits) as client:
+        await _wait_until_ready(client, timeout=max(config.timeout, 60))
+        outcomes = _Outcomes()
+        log.info('Load test: %s loop for %.1f seconds', config.mode, config.duration)
+        start = time.perf_counter()
+        if config.mode == 'closed':
+            await _closed_loop(client, questions, config, outcomes)
+        else:
+            await _open_loop(client, questions, config, outcomes)
+        results = _summarize(outcomes, config, time.perf_counter() - start)
+        results["cache"] = (await client.get('/cache/stats')).json()["response"]  # of one worker
+        return results
+
+
+async def _run_inprocess(config: LoadTestConfig, questions: List[str], work_dir: Path) -> dict:
+    with _patched_constants(
+        **_offline_constants(work_dir, config.llm_latency, config.embedding_latency),
+        RESPONSE_CACHE_ENABLED=config.response_cache,
+        RESPONSE_CACHE_PERSIST=False,
+        MAX_CONCURRENT_QUERIES=config.max_concurrent_queries,
+        ADMISSION_MAX_IN_FLIGHT=config.admission_max_in_flight,
+        ADMISSION_MAX_QUEUED=config.admission_max_queued,
+    ):
+        async with _inprocess_server() as base_url:
+            return await _drive(base_url, questions, config)
+
+
+def run_load_test(config: LoadTestConfig, work_dir: Union[Path, None] = None) -> dict:
+    """
+    Drive `/query` over HTTP with the fake (latency-simulating) models, served from a synthetic
+    corpus indexed in `work_dir` (a temporary directory by default). The in-process server
+    shares the event loop with the load generator
+    """
+    if work_dir is None:
+        with tempfile.TemporaryDirectory() as temporary_dir:
+            return run_load_test(config, Path(temporary_dir))
+    questions = generate_questions(config.num_questions, seed=config.seed + 1)
+    generate_corpus(work_dir / 'training', config.num_files, config.paragraphs_per_file,
+                    seed=config.seed)
+    if config.server == 'subprocess':
+        with _subprocess_server(config, work_dir) as base_url:
+            return asyncio.run(_drive(base_url, questions, config))
+    return asyncio.run(_run_inprocess(config, questions, work_dir))
+
+
+def _parse_bool(text: str) -> bool:
+    return text.lower() in ('1', 'true', 'yes')
+
+
+def main() -> None:
+    defaults = LoadTestConfig()
+    parser = argparse.ArgumentParser(description="HTTP load test of the API with fake models")
+    for name, value in asdict(defaults).items():
+        value_type = _parse_bool if isinstance(value, bool) else type(value)
+        parser.add_argument(f"--{name.replace('_', '-')}", type=value_type, default=value)
+    parser.add_argument("--output", type=Path, default=None, help="results JSON file path")
+    args = vars(parser.parse_args())
+    output = args.pop('output')
+    config = LoadTestConfig(**args)
+    results = run_load_test(config)
+    write_results(config, results, output, kind='load')
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,249 @@
+import sys
+import json
+import time
+import asyncio
+import argparse
+import platform
+import functools
+import tempfile
+from pathlib import Path
+from contextlib import contextmanager
+from dataclasses import dataclass, asdict
+from datetime import datetime, timezone
+from importlib import metadata
+from typing import Any, Dict, Iterator, List, Union
+
+import numpy as np
+
+from deploy_chatbot_python.benchmarks.corpus import generate_corpus, generate_questions
+from deploy_chatbot_python.config import constants
+from deploy_chatbot_python.logging.logger_instance import log
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+@dataclass
+class BenchmarkConfig:  # pylint: disable=too-many-instance-attributes
+    num_files: int = 50
+    paragraphs_per_file: int = 20
+    num_queries: int = 200
+    concurrency: int = 16
+    llm_latency: float = 0.0
+    embedding_latency: float = 0.0
+    embedding_dim: int = constants.FAKE_EMBEDDING_DIM
+    ingestion_workers: int = constants.INGESTION_NUM_WORKERS
+    seed: int = 0
+
+
+def _peak_rss_bytes() -> Union[int, None]:
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024  # kilobytes on Linux
+
+
+def _directory_size(path: Path) -> int:
+    return sum(file.stat().st_size for file in Path(path).rglob('*') if file.is_file())
+
+
+def _latency_stats(latencies: List[float]) -> Dict[str, float]:
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+    return {
+        "count": len(latencies),
+        "mean_ms": float(np.mean(latencies)) * 1000,
+        "p50_ms": float(p50) * 1000,
+        "p95_ms": float(p95) * 1000,
+        "p99_ms": float(p99) * 1000,
+    }
+
+
+def _offline_constants(work_dir: Path, llm_latency: float, embedding_latency: float) -> dict:
+    """
+    Constants of a run on the fake models, with the data paths redirected into `work_dir`
+    (the training data is `work_dir/training`)
+    """
+    return {
+        "USE_FAKE_MODELS": True,
+        "FAKE_LLM_LATENCY_SECONDS": llm_latency,
+        "FAKE_EMBEDDING_LATENCY_SECONDS": embedding_latency,
+        "DATA_PATH": work_dir,
+        "TRAINING_DATA_PATH": work_dir / 'training',
+        "TRAINING_DATA_HASH_PATH": work_dir / 'training_data_hash.txt',
+        "INDEX_STORE_PATH": work_dir / 'index_storage',
+        "INDEX_MANIFEST_PATH": work_dir / 'index_manifest.json',
+        "INDEX_LOCK_PATH": work_dir / 'index.lock',
+        "NAMESPACES_PATH": work_dir / 'namespaces',
+        "RESPONSE_CACHE_PATH": work_dir / 'response_cache.json',
+        "EMBEDDING_CACHE_PATH": work_dir / 'embedding_cache',
+    }
+
+
+@contextmanager
+def _patched_constants(**values) -> Iterator[None]:
+    originals = {name: getattr(constants, name) for name in values}
+    for name, value in values.items():
+        setattr(constants, name, value)
+    try:
+        yield
+    finally:
+        for name, value in originals.items():
+            setattr(constants, name, value)
+
+
+@contextmanager
+def _timed_methods(cls: type, method_names: List[str], timings: Dict[str, float]) -> Iterator[None]:
+    """Accumulate the wall time of `cls`'s `method_names` calls into `timings`"""
+    originals = {name: getattr(cls, name) for name in method_names}
+
+    def _timed(name, method):
+        @functools.wraps(method)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                timings[name] = timings.get(name, 0.0) + time.perf_counter() - start
+        return wrapper
+
+    for name, method in originals.items():
+        setattr(cls, name, _timed(name, method))
+    try:
+        yield
+    finally:
+        for name, method in originals.items():
+            setattr(cls, name, method)
+
+
+async def _run_concurrent_queries(index_manager, questions: List[str],
+                                  concurrency: int) -> List[float]:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def _query(question: str) -> None:
+        async with semaphore:
+            start = time.perf_counter()
+            await index_manager.aquery(question)
+            latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(_query(question) for question in questions))
+    return latencies
+
+
+def _benchmark_queries(index_manager, questions: List[str], concurrency: int) -> dict:
+    latencies = []
+    for question in questions:
+        start = time.perf_counter()
+        index_manager.query(question)
+        latencies.append(time.perf_counter() - start)
+    results = {"query": _latency_stats(latencies)}
+
+    start = time.perf_counter()
+    latencies = asyncio.run(_run_concurrent_queries(index_manager, questions, concurrency))
+    results["concurrent_query"] = {
+        **_latency_stats(latencies),
+        "concurrency": concurrency,
+        "queries_per_second": len(latencies) / (time.perf_counter() - start),
+    }
+    return results
+
+
+def run_benchmark(config: BenchmarkConfig, work_dir: Path) -> dict:
+    """Build, persist, load and query an index of a synthetic corpus using the fake models"""
+    # pylint: disable=import-outside-toplevel  # constants must be patched before loading
+    from deploy_chatbot_python.core.index_manager import IndexManager
+
+    training_path = work_dir / 'training'
+    files = generate_corpus(training_path, config.num_files, config.paragraphs_per_file,
+                            seed=config.seed)
+    corpus_bytes = sum(file.stat().st_size for file in files)
+    questions = generate_questions(config.num_queries, seed=config.seed + 1)
+    results = {}
+    timings: Dict[str, float] = {}
+    with _patched_constants(
+        **_offline_constants(work_dir, config.llm_latency, config.embedding_latency),
+        FAKE_EMBEDDING_DIM=config.embedding_dim,
+        INGESTION_NUM_WORKERS=config.ingestion_workers,
+        RESPONSE_CACHE_ENABLED=False,  # every query goes through the engine
+    ), _timed_methods(IndexManager, ['_rebuild_index', '_save_index', '_load_index'], timings):
+        start = time.perf_counter()
+        index_manager = IndexManager()
+        cold_start = time.perf_counter() - start
+        num_nodes = len(index_manager.llama_indexer.index.docstore.docs)
+        results["build"] = {
+            "files": len(files),
+            "corpus_bytes": corpus_bytes,
+            "nodes": num_nodes,
+            "seconds": timings['_rebuild_index'],
+            "nodes_per_second": num_nodes / timings['_rebuild_index'],
+            "megabytes_per_second": corpus_bytes / 2 ** 20 / timings['_rebuild_index'],
+            "cold_start_seconds": cold_start,
+            "peak_rss_bytes": _peak_rss_bytes(),
+        }
+        results["persist"] = {
+            "seconds": timings['_save_index'],
+            "index_bytes": _directory_size(constants.INDEX_STORE_PATH),
+        }
+        index_manager.close()
+
+        start = time.perf_counter()
+        index_manager = IndexManager()
+        results["load"] = {
+            "seconds": timings['_load_index'],
+            "warm_start_seconds": time.perf_counter() - start,
+            "peak_rss_bytes": _peak_rss_bytes(),
+        }
+
+        results.update(_benchmark_queries(index_manager, questions, config.concurrency))
+        results["peak_rss_bytes"] = _peak_rss_bytes()
+        index_manager.close()
+    return results
+
+
+def _package_version() -> str:
+    try:
+        return metadata.version('deploy_chatbot_python')
+    except metadata.PackageNotFoundError:
+        return 'unknown'
+
+
+def write_results(config: Any, results: dict, output: Union[Path, None] = None,
+                  kind: str = 'benchmark') -> Path:
+    """Save the results of a `kind` run of `config` (a dataclass) as JSON"""
+    timestamp = datetime.now(timezone.utc)
+    version = _package_version()
+    if output is None:
+        name = f"{kind}_{version}_{timestamp.strftime('%Y%m%dT%H%M%SZ')}.json"
+        output = constants.BENCHMARK_RESULTS_PATH / name
+    output.parent.mkdir(parents=True, exist_ok=True)
+    report = {
+        "version": version,
+        "timestamp": timestamp.isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": asdict(config),
+        "results": results,
+    }
+    output.write_text(json.dumps(report, indent=2), encoding='utf-8')
+    log.info('Benchmark results saved at: \n%s\n', output)
+    return output
+
+
+def main() -> None:
+    defaults = BenchmarkConfig()
+    parser = argparse.ArgumentParser(description="Offline benchmark of indexing and querying")
+    for name, value in asdict(defaults).items():
+        parser.add_argument(f"--{name.replace('_', '-')}", type=type(value), default=value)
+    parser.add_argument("--output", type=Path, default=None, help="results JSON file path")
+    args = vars(parser.parse_args())
+    output = args.pop('output')
+    config = BenchmarkConfig(**args)
+    with tempfile.TemporaryDirectory() as work_dir:
+        results = run_benchmark(config, Path(work_dir))
+    write_results(config, results, output)
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
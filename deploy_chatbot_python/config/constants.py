@@ -1,15 +1,22 @@
 from pathlib import Path
 import logging
+import os
 
 
 PKG_DIR = Path(__file__).resolve().parent.parent
 ROOT_DIR = PKG_DIR.parent
 
 # Data paths
-DATA_PATH = ROOT_DIR / 'data'
+DATA_PATH = Path(os.getenv('CHATBOT_DATA_PATH', str(ROOT_DIR / 'data')))  # all paths below
 TRAINING_DATA_PATH = DATA_PATH / 'training'
 TRAINING_DATA_HASH_PATH = DATA_PATH / 'training_data_hash.txt'
 INDEX_STORE_PATH = DATA_PATH / 'index_storage'
+INDEX_MANIFEST_PATH = DATA_PATH / 'index_manifest.json'
+INDEX_LOCK_PATH = DATA_PATH / 'index.lock'  # serializes index builds across processes
+NAMESPACES_PATH = DATA_PATH / 'namespaces'  # a directory (training data, storage) per namespace
+RESPONSE_CACHE_PATH = DATA_PATH / 'response_cache.json'
+EMBEDDING_CACHE_PATH = DATA_PATH / 'embedding_cache'
+BENCHMARK_RESULTS_PATH = DATA_PATH / 'benchmarks'
 
 # Config path
 CONFIG_NAME = 'config.yaml'
@@ -20,6 +27,119 @@ API_HOST_ADDRESS = '127.0.0.1'
 API_HOST_PORT = 8000
 API_POST_ENDPOINT = 'query'
 API_POST_ENDPOINT_URL = f"http://{API_HOST_ADDRESS}:{API_HOST_PORT}/{API_POST_ENDPOINT}"
+API_STREAM_ENDPOINT = f'{API_POST_ENDPOINT}/stream'
+API_STREAM_ENDPOINT_URL = f"http://{API_HOST_ADDRESS}:{API_HOST_PORT}/{API_STREAM_ENDPOINT}"
+STREAM_END_EVENT = 'end'
+API_BATCH_ENDPOINT = f'{API_POST_ENDPOINT}/batch'
+BATCH_QUERY_MAX_SIZE = 10000  # questions per batch request
+BATCH_QUERY_CONCURRENCY = 8  # in-flight queries per batch request, within MAX_CONCURRENT_QUERIES
+# in-flight queries per `IndexManager`
+MAX_CONCURRENT_QUERIES = int(os.getenv('CHATBOT_MAX_CONCURRENT_QUERIES', '32'))
+# Admission control of `/query` and `/query/stream`: excess requests are shed (429/503) with a
+# `Retry-After` instead of piling up behind slow LLM calls
+ADMISSION_MAX_IN_FLIGHT = int(os.getenv('CHATBOT_ADMISSION_MAX_IN_FLIGHT', '64'))  # per API worker
+# queries waiting for a slot, more are rejected at once (429)
+ADMISSION_MAX_QUEUED = int(os.getenv('CHATBOT_ADMISSION_MAX_QUEUED', '128'))
+ADMISSION_QUEUE_TIMEOUT_SECONDS = 10  # longer waits are shed (503)
+QUERY_DEADLINE_SECONDS = 55  # queueing included (504 if exceeded), below POST_REQUEST_TIMEOUT
+BACKGROUND_INDEX_LOADING = True  # serve `/health` while the index loads, queries get 503
+NOT_READY_RETRY_AFTER_SECONDS = 5  # `Retry-After` of the 503 responses sent while loading
+API_IMPORT_TIME_TARGET_SECONDS = 1.5  # budget of `import backend.server` (regression tested)
+METRICS_ENABLED = True  # per-stage latency, token and cache metrics served on `/metrics`
+METRICS_PREFIX = 'chatbot'
+
+# Namespaces: named indexes, each in its own `NAMESPACES_PATH` directory
+MAX_RESIDENT_NAMESPACES = 8  # loaded named indexes, the least recently used ones are evicted
+MAX_RESIDENT_NAMESPACE_BYTES = None  # cap on their summed index storage size, None: no cap
+
+# Production launch
+PREFORK_NUM_WORKERS = os.cpu_count() or 1  # API processes forked after the index is loaded
+PREFORK_BACKLOG = 2048  # pending connections of the shared listening socket
+RESTART_BACKOFF_SECONDS = 1.0  # delay before restarting a crashed process, doubled per crash
+RESTART_BACKOFF_MAX_SECONDS = 60.0
+RESTART_STABLE_SECONDS = 30.0  # a process running this long before crashing resets its backoff
+
+# Index hot reload
+INDEX_WATCH_ENABLED = os.getenv('CHATBOT_WATCH_INDEX', '0') == '1'  # swap in changed training data
+INDEX_WATCH_INTERVAL_SECONDS = 5.0  # training data polling interval
+
+# Ingestion
+INGESTION_NUM_WORKERS = os.cpu_count() or 1  # processes parsing training files
+# files per worker process, fewer files are parsed in-process (spawning a worker and importing
+# llama_index in it takes about a second, more than parsing a few small files)
+INGESTION_MIN_FILES_FOR_POOL = 32
+INGESTION_MAX_IN_FLIGHT_FILES = 64  # files parsed but not yet indexed, bounds peak memory
+INGESTION_BATCH_SIZE = 256  # documents chunked, embedded and inserted together
+# drop duplicate chunks before embedding them: None, 'exact' (the same words, ignoring case
+# and punctuation) or 'near' (opt-in, also MinHash/LSH near-duplicates: lossy, a chunk differing
+# only in a detail such as a number or date is dropped)
+CHUNK_DEDUP = 'exact'
+DEDUP_SIMILARITY_THRESHOLD = 0.9  # estimated Jaccard similarity of word shingles
+DEDUP_NUM_PERMUTATIONS = 128  # MinHash signature length, split into LSH bands
+DEDUP_SHINGLE_SIZE = 3  # words per shingle
+
+# Vector store
+VECTOR_STORE_BACKEND = 'memmap'  # 'memmap' (`.npy` matrix) or 'simple' (llama-index JSON)
+VECTOR_STORE_DTYPE = 'float32'  # 'float32', 'float16' or 'int8' (memmap backend only)
+VECTOR_SEARCH_BLOCK_ROWS = 65536  # rows scored per matrix product, bounds temporary memory
+SIMILARITY_TOP_K = 2
+
+# Docstore
+# 'binary' (one file of compressed nodes, read lazily through a memory map) or 'simple'
+# (llama-index JSON, fully parsed on load)
+DOCSTORE_BACKEND = 'binary'
+DOCSTORE_BINARY_FNAME = 'docstore.bin'  # in the index storage directory
+DOCSTORE_CACHE_SIZE = 1024  # decoded nodes kept in memory (LRU)
+DOCSTORE_COMPRESSION_LEVEL = 6  # zlib level of each node record
+
+# Lexical (BM25) retrieval
+# 'vector', 'hybrid' (fused BM25 and vector scores) or 'lexical_first' (BM25 alone when its best
+# match is confident, skipping the query embedding, else hybrid)
+RETRIEVAL_MODE = 'vector'
+BM25_INDEX_FNAME = 'bm25_index.npz'  # in the index storage directory
+BM25_K1 = 1.2  # term frequency saturation
+BM25_B = 0.75  # document length normalization
+HYBRID_ALPHA = 0.5  # weight of the vector scores, BM25 scores weigh 1 - alpha
+HYBRID_NUM_CANDIDATES = 20  # candidates of each retriever that are fused
+LEXICAL_CONFIDENCE_THRESHOLD = 0.8  # share of the query's IDF weight the best BM25 match needs
+
+# Approximate nearest-neighbour search (memmap backend only)
+ANN_INDEX = None  # None (exact search) or 'ivf'
+ANN_MIN_VECTORS = 10000  # smaller indexes are always searched exactly
+IVF_NUM_LISTS = None  # k-means lists, None: 4 * sqrt(number of vectors)
+IVF_NPROBE = 8  # lists scored per query, higher is slower with better recall
+IVF_KMEANS_ITERATIONS = 20
+IVF_TRAINING_SAMPLE_SIZE = 65536  # vectors the k-means is trained on
+
+# Embeddings
+EMBEDDING_BATCH_SIZE = 512  # texts per embedding API call (OpenAI allows up to 2048)
+EMBEDDING_CACHE_ENABLED = True
+EMBEDDING_CACHE_LOOKUP_BATCH_SIZE = 2048  # texts looked up in the cache before embedding misses
+QUERY_EMBEDDING_BATCHING = True  # embed concurrent questions together (async queries only)
+QUERY_EMBEDDING_BATCH_WAIT_SECONDS = 0.005  # window collecting questions into one batch
+QUERY_EMBEDDING_MAX_BATCH_SIZE = 64  # a full batch is embedded without waiting for the window
+
+# Local models: `sentence_transformers` embedding and reranker run on the CPU, selected in
+# `config.yaml` (`embedding_backend: local`, `reranker_model`)
+LOCAL_EMBEDDING_MODEL = 'sentence-transformers/all-MiniLM-L6-v2'
+LOCAL_EMBEDDING_BATCH_SIZE = 64  # texts per forward pass
+LOCAL_INFERENCE_WORKERS = 2  # concurrent inference calls, torch parallelizes each one
+LOCAL_MODEL_CACHE_SIZE = 2  # loaded models of each kind, the least recently used are dropped
+RERANK_NUM_CANDIDATES = 20  # nodes retrieved for the reranker, which keeps `rerank_top_n`
+
+# Fake models: deterministic local stand-ins of the OpenAI models (offline benchmarks and tests)
+USE_FAKE_MODELS = os.getenv('CHATBOT_FAKE_MODELS', '0') == '1'
+FAKE_LLM_LATENCY_SECONDS = float(os.getenv('CHATBOT_FAKE_LLM_LATENCY', '0'))
+FAKE_EMBEDDING_LATENCY_SECONDS = float(os.getenv('CHATBOT_FAKE_EMBEDDING_LATENCY', '0'))
+FAKE_EMBEDDING_DIM = 256
+
+# Response cache
+RESPONSE_CACHE_ENABLED = os.getenv('CHATBOT_RESPONSE_CACHE', '1') == '1'
+# save to `RESPONSE_CACHE_PATH` on shutdown
+RESPONSE_CACHE_PERSIST = os.getenv('CHATBOT_RESPONSE_CACHE_PERSIST', '1') == '1'
+RESPONSE_CACHE_MAX_SIZE = 1024
+RESPONSE_CACHE_TTL = 24 * 60 * 60  # seconds, `None` to never expire
+RESPONSE_CACHE_SIMILARITY_THRESHOLD = None  # e.g. 0.95 to also serve near-identical questions
 
 # APP
 APP_TITLE = "Chatbot Dashboard"
@@ -28,10 +148,30 @@ BOT_PLACEHOLDER_MESSAGE = 'Typing...'
 USER_PLACEHOLDER_MESSAGE = "Type your message here..."
 SEND_BUTTON_TEXT = 'Send'
 POST_REQUEST_TIMEOUT = 60  # seconds
+STREAM_BOT_RESPONSE = True  # render the bot response token by token
+STREAM_POLL_INTERVAL_MS = 100
+CHAT_HISTORY_WINDOW = 200  # messages kept (and rendered) in the browser, older ones are dropped
+BACKEND_CONNECTION_POOL_SIZE = 16  # pooled keep-alive connections from the frontend to the API
 
 # Logging
 LOGGER_NAME = 'chatbot'
-LOGGER_LEVEL = logging.DEBUG
+# production: handlers write on a background thread, debug records are rate limited
+LOG_PRODUCTION_MODE = os.getenv('CHATBOT_LOG_MODE', 'development') == 'production'
+LOGGER_LEVEL = logging.INFO if LOG_PRODUCTION_MODE else logging.DEBUG
+LOGGER_LEVELS = os.getenv('CHATBOT_LOG_LEVELS', '')  # per-logger levels, e.g. 'httpx=WARNING,...'
+LOG_JSON_FORMAT = os.getenv('CHATBOT_LOG_JSON', '0') == '1'  # one JSON object per line
 LOG_DIR_PATH = ROOT_DIR / 'logs'
 LOG_FILE_PATH = LOG_DIR_PATH / f'{LOGGER_NAME}.log'
 LOG_FILE_MAX_BYTES = 5 * 1024 * 1024
+LOG_QUEUE_SIZE = 10000  # records waiting for the background thread, new records are dropped if full
+LOG_DEBUG_RATE_LIMIT = 10.0  # debug records per second per call site (production mode)
+LOG_DEBUG_RATE_BURST = 50
+
+# Profiling (opt-in): requests sent with the `PROFILING_HEADER: 1` header, and a sampled share of
+# all requests and `IndexManager` queries (sync, async and streamed), are run under cProfile.
+# No overhead when disabled
+PROFILING_ENABLED = os.getenv('CHATBOT_PROFILING', '0') == '1'
+PROFILING_SAMPLE_RATE = float(os.getenv('CHATBOT_PROFILE_SAMPLE_RATE', '0'))  # e.g. 0.001
+PROFILING_HEADER = 'X-Profile'
+PROFILES_DIR_PATH = LOG_DIR_PATH / 'profiles'  # pstats `.prof` files
+PROFILING_MAX_FILES = 100  # the oldest profiles are deleted
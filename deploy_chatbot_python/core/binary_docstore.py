@@ -0,0 +1,249 @@
+import os
+import json
+import mmap
+import zlib
+import struct
+import threading
+from pathlib import Path
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+import numpy as np
+from llama_index.core.storage.docstore.keyval_docstore import (
+    DEFAULT_COLLECTION_DATA_SUFFIX,
+    DEFAULT_NAMESPACE,
+    KVDocumentStore,
+)
+from llama_index.core.storage.docstore.types import DEFAULT_PERSIST_PATH
+from llama_index.core.storage.kvstore.types import (
+    DEFAULT_BATCH_SIZE,
+    DEFAULT_COLLECTION,
+    BaseKVStore,
+)
+
+from deploy_chatbot_python.config import constants
+from deploy_chatbot_python.logging.logger_instance import log
+
+
+MAGIC = b'CHBDOC01'
+# number of records, end of the records (start of the offsets), keys and in-memory data sizes
+TRAILER = struct.Struct('<QQQQ')
+NODE_COLLECTION = f'{DEFAULT_NAMESPACE}{DEFAULT_COLLECTION_DATA_SUFFIX}'
+
+
+class BinaryKVStore(BaseKVStore):  # pylint: disable=too-many-instance-attributes
+    """
+    Key-value store persisted as one binary file: the records of `lazy_collection` (the nodes)
+    are zlib-compressed JSON, read through a memory map only when requested and kept in an LRU
+    of `cache_size`; an offset index locates them. The other collections (document hashes and
+    node lists) are small and kept in memory.
+
+    Layout: `MAGIC`, records, record offsets (int64), '\\n'-joined keys, compressed JSON of the
+    in-memory collections, `TRAILER`, `MAGIC`
+    """
+
+    def __init__(self, lazy_collection: str = NODE_COLLECTION,
+                 cache_size: int = constants.DOCSTORE_CACHE_SIZE) -> None:
+        self.lazy_collection = lazy_collection
+        self.cache_size = cache_size
+        self._data: Dict[str, Dict[str, dict]] = {}  # in-memory collections, new or updated records
+        self._rows: Dict[str, int] = {}  # persisted records of `lazy_collection` (not overridden)
+        self._offsets: np.ndarray = np.zeros(1, dtype=np.int64)
+        self._mmap: Union[mmap.mmap, None] = None
+        self._cache: "OrderedDict[str, dict]" = OrderedDict()
+        self._lock = threading.RLock()
+
+    @property
+    def num_cached(self) -> int:
+        return len(self._cache)
+
+    # ===== Reads =====
+
+    def _record(self, key: str) -> Union[bytes, dict, None]:
+        """The cached record, or its compressed bytes, or None if there is no such record"""
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return self._cache[key]
+            row = self._rows.get(key)
+            if row is None:
+                return None
+            return self._mmap[self._offsets[row]:self._offsets[row + 1]]
+
+    def _read(self, key: str) -> Union[dict, None]:
+        record = self._record(key)
+        if not isinstance(record, bytes):
+            return record
+        value = json.loads(zlib.decompress(record))
+        with self._lock:
+            if key in self._rows:  # not replaced or deleted meanwhile
+                self._cache[key] = value
+                if len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return value
+
+    def get(self, key: str, collection: str = DEFAULT_COLLECTION) -> Optional[dict]:
+        with self._lock:
+            value = self._data.get(collection, {}).get(key)
+        if value is None and collection == self.lazy_collection:
+            value = self._read(key)
+        return value.copy() if value is not None else None
+
+    async def aget(self, key: str, collection: str = DEFAULT_COLLECTION) -> Optional[dict]:
+        return self.get(key, collection)
+
+    def get_all(self, collection: str = DEFAULT_COLLECTION) -> Dict[str, dict]:
+        """All records, the persisted nodes are decoded without filling the cache"""
+        with self._lock:
+            values = {key: value.copy() for key, value in self._data.get(collection, {}).items()}
+            rows = dict(self._rows) if collection == self.lazy_collection else {}
+            records = {
+                key: self._mmap[self._offsets[row]:self._offsets[row + 1]]
+                for key, row in rows.items()
+            }
+        values.update({key: json.loads(zlib.decompress(record)) for key, record in records.items()})
+        return values
+
+    async def aget_all(self, collection: str = DEFAULT_COLLECTION) -> Dict[str, dict]:
+        return self.get_all(collection)
+
+    # ===== Writes =====
+
+    def put(self, key: str, val: dict, collection: str = DEFAULT_COLLECTION) -> None:
+        with self._lock:
+            self._data.setdefault(collection, {})[key] = val.copy()
+            if collection == self.lazy_collection:
+                self._rows.pop(key, None)
+                self._cache.pop(key, None)
+
+    async def aput(self, key: str, val: dict, collection: str = DEFAULT_COLLECTION) -> None:
+        self.put(key, val, collection)
+
+    def put_all(self, kv_pairs: List[Tuple[str, dict]], collection: str = DEFAULT_COLLECTION,
+                batch_size: int = DEFAULT_BATCH_SIZE) -> None:
+        for key, val in kv_pairs:
+            self.put(key, val, collection)
+
+    async def aput_all(self, kv_pairs: List[Tuple[str, dict]],
+                       collection: str = DEFAULT_COLLECTION,
+                       batch_size: int = DEFAULT_BATCH_SIZE) -> None:
+        self.put_all(kv_pairs, collection, batch_size)
+
+    def delete(self, key: str, collection: str = DEFAULT_COLLECTION) -> bool:
+        with self._lock:
+            deleted = self._data.get(collection, {}).pop(key, None) is not None
+            if collection == self.lazy_collection:
+                deleted = self._rows.pop(key, None) is not None or deleted
+                self._cache.pop(key, None)
+            return deleted
+
+    async def adelete(self, key: str, collection: str = DEFAULT_COLLECTION) -> bool:
+        return self.delete(key, collection)
+
+    # ===== Persistence =====
+
+    def persist(self, persist_path: Union[str, Path], fs: Any = None) -> None:  # pylint: disable=unused-argument
+        """Write all records (persisted ones are copied still compressed) and reopen the file"""
+        persist_path = Path(persist_path)
+        tmp_path = persist_path.with_suffix('.tmp')
+        os.makedirs(persist_path.parent, exist_ok=True)
+        with self._lock:
+            in_memory = {
+                collection: records for collection, records in self._data.items()
+                if collection != self.lazy_collection
+            }
+            new_records = self._data.get(self.lazy_collection, {})
+            keys, offsets = [], [len(MAGIC)]
+            with open(tmp_path, 'wb') as file:
+                file.write(MAGIC)
+                for key, row in self._rows.items():
+                    offsets.append(offsets[-1] + file.write(
+                        self._mmap[self._offsets[row]:self._offsets[row + 1]]
+                    ))
+                    keys.append(key)
+                for key, value in new_records.items():
+                    record = zlib.compress(json.dumps(value).encode('utf-8'),
+                                           constants.DOCSTORE_COMPRESSION_LEVEL)
+                    offsets.append(offsets[-1] + file.write(record))
+                    keys.append(key)
+                keys_blob = '\n'.join(keys).encode('utf-8')
+                in_memory_blob = zlib.compress(json.dumps(in_memory).encode('utf-8'))
+                file.write(np.asarray(offsets, dtype=np.int64).tobytes())
+                file.write(keys_blob)
+                file.write(in_memory_blob)
+                file.write(
+                    TRAILER.pack(len(keys), offsets[-1], len(keys_blob), len(in_memory_blob))
+                )
+                file.write(MAGIC)
+            self._close()  # a mapped file cannot be replaced on Windows
+            try:
+                os.replace(tmp_path, persist_path)
+            except OSError:
+                if self._rows:
+                    self._mmap = self._map(persist_path)  # unchanged, still the persisted records
+                raise
+            self._open(persist_path)
+        log.debug('Persisted %d nodes at: \n%s\n', len(keys), persist_path)
+
+    def _close(self) -> None:
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+
+    @staticmethod
+    def _map(path: Path) -> mmap.mmap:
+        with open(path, 'rb') as file:
+            return mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def _open(self, path: Path) -> None:
+        mapped = self._map(path)
+        size = len(mapped)
+        if mapped[:len(MAGIC)] != MAGIC or mapped[size - len(MAGIC):] != MAGIC:
+            mapped.close()
+            raise ValueError(f"Not a binary docstore: {path}")
+        trailer_start = size - len(MAGIC) - TRAILER.size
+        num_records, records_end, keys_size, in_memory_size = TRAILER.unpack(
+            mapped[trailer_start:trailer_start + TRAILER.size]
+        )
+        keys_start = records_end + 8 * (num_records + 1)
+        offsets = np.frombuffer(mapped[records_end:keys_start], dtype=np.int64)
+        keys = mapped[keys_start:keys_start + keys_size].decode('utf-8').split('\n')
+        in_memory_end = keys_start + keys_size + in_memory_size
+        in_memory = json.loads(zlib.decompress(mapped[keys_start + keys_size:in_memory_end]))
+        self._mmap = mapped
+        self._offsets = offsets
+        self._rows = {key: row for row, key in enumerate(keys)} if num_records else {}
+        self._data = in_memory
+        self._cache.clear()
+
+    @classmethod
+    def from_persist_path(cls, persist_path: Union[str, Path], **kwargs: Any) -> "BinaryKVStore":
+        kvstore = cls(**kwargs)
+        kvstore._open(Path(persist_path))  # pylint: disable=protected-access
+        log.debug('Opened %d persisted nodes at: \n%s\n', len(kvstore._rows), persist_path)  # pylint: disable=protected-access
+        return kvstore
+
+
+class BinaryDocumentStore(KVDocumentStore):
+    """
+    Docstore persisted as a `BinaryKVStore` at `DOCSTORE_BINARY_FNAME`: loading maps the file and
+    reads its offset index, node text and metadata are only decoded when the node is retrieved
+    """
+
+    def __init__(self, kvstore: Union[BinaryKVStore, None] = None,
+                 batch_size: int = DEFAULT_BATCH_SIZE) -> None:
+        super().__init__(kvstore or BinaryKVStore(), batch_size=batch_size)
+
+    @staticmethod
+    def persist_path(persist_dir: Union[str, Path]) -> Path:
+        return Path(persist_dir) / constants.DOCSTORE_BINARY_FNAME
+
+    @classmethod
+    def from_persist_dir(cls, persist_dir: Union[str, Path]) -> "BinaryDocumentStore":
+        return cls(BinaryKVStore.from_persist_path(cls.persist_path(persist_dir)))
+
+    def persist(self, persist_path: str = DEFAULT_PERSIST_PATH, fs: Any = None) -> None:
+        """`persist_path` is the JSON docstore path `StorageContext` passes, it is replaced"""
+        self._kvstore.persist(self.persist_path(Path(persist_path).parent), fs=fs)
+        if os.path.exists(persist_path):
+            os.remove(persist_path)  # outdated JSON docstore of the 'simple' backend
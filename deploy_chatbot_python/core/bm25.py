@@ -0,0 +1,169 @@
+import os
+import re
+import math
+from array import array
+from pathlib import Path
+from typing import Dict, Iterable, List, Sequence, Tuple
+from dataclasses import dataclass, field
+
+import numpy as np
+from llama_index.core.schema import BaseNode
+
+from deploy_chatbot_python.config import constants
+from deploy_chatbot_python.logging.logger_instance import log
+
+
+TOKEN_PATTERN = re.compile(r'\w+')
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased word tokens, identifiers such as `snake_case` names are kept whole"""
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+def _join(strings: Sequence[str]) -> np.ndarray:
+    return np.frombuffer('\n'.join(strings).encode('utf-8'), dtype=np.uint8)
+
+
+def _split(data: np.ndarray) -> List[str]:
+    return data.tobytes().decode('utf-8').split('\n') if len(data) else []
+
+
+@dataclass
+class BM25Index:
+    """
+    In-process inverted index of the nodes' text, scored with Okapi BM25.
+    Each term's postings are one flat `uint32` array of interleaved (row, term frequency) pairs,
+    rows index `node_ids` and `doc_lengths`
+    """
+    k1: float = constants.BM25_K1
+    b: float = constants.BM25_B
+    node_ids: List[str] = field(default_factory=list)
+    doc_lengths: array = field(default_factory=lambda: array('I'))
+    postings: Dict[str, array] = field(default_factory=dict)
+
+    _total_length: int = field(default=0, init=False)
+
+    def __post_init__(self):
+        self._total_length = sum(self.doc_lengths)
+
+    @property
+    def num_nodes(self) -> int:
+        return len(self.node_ids)
+
+    @property
+    def average_length(self) -> float:
+        return self._total_length / self.num_nodes if self.num_nodes else 0.0
+
+    def add(self, nodes: Iterable[BaseNode]) -> None:
+        for node in nodes:
+            row = len(self.node_ids)
+            terms = tokenize(node.get_content())
+            frequencies: Dict[str, int] = {}
+            for term in terms:
+                frequencies[term] = frequencies.get(term, 0) + 1
+            for term, frequency in frequencies.items():
+                self.postings.setdefault(term, array('I')).extend((row, frequency))
+            self.node_ids.append(node.node_id)
+            self.doc_lengths.append(len(terms))
+            self._total_length += len(terms)
+
+    def delete(self, node_ids: Iterable[str]) -> None:
+        """Drop the rows of `node_ids` and renumber the remaining rows"""
+        deleted = set(node_ids)
+        keep = np.array([node_id not in deleted for node_id in self.node_ids], dtype=bool)
+        if keep.all():
+            return
+        new_rows = np.cumsum(keep, dtype=np.int64) - 1
+        postings = {}
+        for term, term_postings in self.postings.items():
+            pairs = np.frombuffer(term_postings, dtype=np.uint32).reshape(-1, 2)
+            pairs = pairs[keep[pairs[:, 0]]]
+            if len(pairs):
+                pairs = np.column_stack([new_rows[pairs[:, 0]], pairs[:, 1]]).astype(np.uint32)
+                postings[term] = array('I', pairs.tobytes())
+        self.postings = postings
+        self.node_ids = [node_id for node_id, kept in zip(self.node_ids, keep) if kept]
+        lengths = np.frombuffer(self.doc_lengths, dtype=np.uint32)[keep]
+        self.doc_lengths = array('I', lengths.tobytes())
+        self._total_length = sum(self.doc_lengths)
+        log.debug('Deleted %d nodes from the BM25 index', int((~keep).sum()))
+
+    def _idf(self, term_postings: array) -> float:
+        num_containing = len(term_postings) // 2
+        return math.log(1 + (self.num_nodes - num_containing + 0.5) / (num_containing + 0.5))
+
+    def score(self, query: str) -> Tuple[np.ndarray, float]:
+        """
+        BM25 score of every row, and the query's total IDF weight (the score of a node of
+        average length containing each query term once), to judge how well a score matches
+        """
+        scores = np.zeros(self.num_nodes, dtype=np.float32)
+        query_weight = 0.0
+        if not self.num_nodes:
+            return scores, query_weight
+        lengths = np.frombuffer(self.doc_lengths, dtype=np.uint32)
+        length_norms = self.k1 * (1 - self.b + self.b * lengths / max(self.average_length, 1e-9))
+        for term in set(tokenize(query)):
+            term_postings = self.postings.get(term)
+            if term_postings is None:
+                continue
+            idf = self._idf(term_postings)
+            query_weight += idf
+            pairs = np.frombuffer(term_postings, dtype=np.uint32).reshape(-1, 2)
+            rows, frequencies = pairs[:, 0], pairs[:, 1].astype(np.float32)
+            scores[rows] += idf * frequencies * (self.k1 + 1) / (frequencies + length_norms[rows])
+        return scores, query_weight
+
+    def search(self, query: str, k: int) -> Tuple[List[Tuple[str, float]], float]:
+        """The `k` best (node ID, score) pairs with a positive score, and the query's IDF weight"""
+        scores, query_weight = self.score(query)
+        k = min(k, int(np.count_nonzero(scores)))
+        if k == 0:
+            return [], query_weight
+        rows = np.argpartition(-scores, k - 1)[:k]
+        rows = rows[np.argsort(-scores[rows], kind='stable')]
+        return [(self.node_ids[row], float(scores[row])) for row in rows], query_weight
+
+    # ===== Persistence =====
+
+    def save(self, path: Path) -> None:
+        terms = list(self.postings)
+        lengths = [len(self.postings[term]) for term in terms]
+        offsets = np.concatenate([[0], np.cumsum(lengths, dtype=np.int64)])
+        flat_postings = np.frombuffer(
+            b''.join(self.postings[term].tobytes() for term in terms), dtype=np.uint32
+        )
+        tmp_path = Path(path).with_suffix('.tmp.npz')
+        np.savez(
+            tmp_path,
+            params=np.array([self.k1, self.b]),
+            node_ids=_join(self.node_ids),
+            doc_lengths=np.frombuffer(self.doc_lengths, dtype=np.uint32),
+            terms=_join(terms),
+            offsets=offsets,
+            postings=flat_postings,
+        )
+        os.replace(tmp_path, path)
+        log.debug('Saved BM25 index of %d nodes and %d terms at: \n%s\n',
+                  self.num_nodes, len(terms), path)
+
+    @classmethod
+    def load(cls, path: Path) -> "BM25Index":
+        with np.load(path) as data:
+            arrays = {name: np.asarray(data[name]) for name in data.files}
+        offsets, flat_postings = arrays['offsets'], arrays['postings']
+        postings = {
+            term: array('I', flat_postings[offsets[i]:offsets[i + 1]].tobytes())
+            for i, term in enumerate(_split(arrays['terms']))
+        }
+        k1, b = arrays['params'].tolist()
+        index = cls(
+            k1=k1,
+            b=b,
+            node_ids=_split(arrays['node_ids']),
+            doc_lengths=array('I', arrays['doc_lengths'].tobytes()),
+            postings=postings,
+        )
+        log.debug('Loaded BM25 index of %d nodes from: \n%s\n', index.num_nodes, path)
+        return index
@@ -0,0 +1,143 @@
+import zlib
+import hashlib
+from typing import Dict, Iterable, List, Set, Tuple, Union
+from dataclasses import dataclass, field
+
+import numpy as np
+from llama_index.core.schema import BaseNode
+
+from deploy_chatbot_python.core import metrics
+from deploy_chatbot_python.core.bm25 import tokenize
+from deploy_chatbot_python.config import constants
+from deploy_chatbot_python.logging.logger_instance import log
+
+
+MERSENNE_PRIME = (1 << 31) - 1  # (a * x + b) stays below 2 ** 63, so uint64 does not overflow
+
+
+def lsh_bands(num_permutations: int, threshold: float) -> Tuple[int, int]:
+    """
+    The (bands, rows) split of the signature whose S-curve threshold (1 / bands) ** (1 / rows)
+    is the closest one at or below `threshold`, candidates are verified against it anyway
+    """
+    splits = [
+        (bands, num_permutations // bands)
+        for bands in range(1, num_permutations + 1) if num_permutations % bands == 0
+    ]
+    below = [split for split in splits if (1 / split[0]) ** (1 / split[1]) <= threshold]
+    return min(below or splits, key=lambda split: abs((1 / split[0]) ** (1 / split[1]) - threshold))
+
+
+@dataclass
+class ChunkDeduplicator:  # pylint: disable=too-many-instance-attributes
+    """
+    Drops chunks whose text was already seen: exact copies (the same words, ignoring case and
+    punctuation) by hash and, with `near_duplicates`, texts whose estimated Jaccard similarity
+    of word shingles is at least `threshold` by MinHash signatures bucketed with LSH bands.
+    `duplicate_of` maps each source (file) that had chunks dropped to the sources of the kept ones
+    """
+    near_duplicates: bool = True
+    threshold: float = constants.DEDUP_SIMILARITY_THRESHOLD
+    num_permutations: int = constants.DEDUP_NUM_PERMUTATIONS
+    shingle_size: int = constants.DEDUP_SHINGLE_SIZE
+    seed: int = 0
+
+    num_exact: int = field(default=0, init=False)
+    num_near: int = field(default=0, init=False)
+    duplicate_of: Dict[str, Set[str]] = field(default_factory=dict, init=False)
+    _hashes: Dict[bytes, str] = field(default_factory=dict, init=False)  # text hash: source
+    _signatures: List[np.ndarray] = field(default_factory=list, init=False)
+    _signature_sources: List[str] = field(default_factory=list, init=False)
+    _buckets: Dict[Tuple[int, bytes], List[int]] = field(default_factory=dict, init=False)
+    _bands: int = field(init=False)
+    _rows: int = field(init=False)
+    _coefficients: np.ndarray = field(init=False)
+
+    def __post_init__(self):
+        if not 0 < self.threshold <= 1:
+            raise ValueError(f"Dedup similarity threshold must be in (0, 1]: {self.threshold}")
+        self._bands, self._rows = lsh_bands(self.num_permutations, self.threshold)
+        rng = np.random.default_rng(self.seed)
+        self._coefficients = rng.integers(1, MERSENNE_PRIME, size=(2, self.num_permutations, 1),
+                                          dtype=np.uint64)
+
+    @property
+    def num_dropped(self) -> int:
+        return self.num_exact + self.num_near
+
+    def _signature(self, tokens: List[str]) -> np.ndarray:
+        size = min(self.shingle_size, len(tokens))
+        shingles = {' '.join(tokens[i:i + size]) for i in range(len(tokens) - size + 1)}
+        hashes = np.fromiter((zlib.crc32(shingle.encode('utf-8')) for shingle in shingles),
+                             dtype=np.uint64, count=len(shingles)) % MERSENNE_PRIME
+        multipliers, offsets = self._coefficients
+        return ((multipliers * hashes + offsets) % MERSENNE_PRIME).min(axis=1).astype(np.uint32)
+
+    def _band_keys(self, signature: np.ndarray) -> List[Tuple[int, bytes]]:
+        return [
+            (band, signature[band * self._rows:(band + 1) * self._rows].tobytes())
+            for band in range(self._bands)
+        ]
+
+    def _near_duplicate_row(self, signature: np.ndarray,
+                            band_keys: List[Tuple[int, bytes]]) -> Union[int, None]:
+        candidates = sorted({row for key in band_keys for row in self._buckets.get(key, ())})
+        return next((
+            row for row in candidates
+            if np.mean(self._signatures[row] == signature) >= self.threshold
+        ), None)
+
+    def _find_original(self, text: str, source: str) -> Tuple[Union[str, None], str]:
+        """
+        The source of the text `text` duplicates and the kind of copy ('exact' or 'near'),
+        or (None, '') after remembering `text` as a text of `source`
+        """
+        tokens = tokenize(text)
+        text_hash = hashlib.sha1(' '.join(tokens).encode('utf-8')).digest()
+        if text_hash in self._hashes:
+            return self._hashes[text_hash], 'exact'
+        self._hashes[text_hash] = source
+        if not tokens or not self.near_duplicates:
+            return None, ''
+        signature = self._signature(tokens)
+        band_keys = self._band_keys(signature)
+        row = self._near_duplicate_row(signature, band_keys)
+        if row is not None:
+            return self._signature_sources[row], 'near'
+        row = len(self._signatures)
+        self._signatures.append(signature)
+        self._signature_sources.append(source)
+        for key in band_keys:
+            self._buckets.setdefault(key, []).append(row)
+        return None, ''
+
+    def is_duplicate(self, text: str, source: str = '') -> bool:
+        """Whether `text` duplicates a previously seen text, otherwise it is remembered"""
+        original_source, kind = self._find_original(text, source)
+        if original_source is None:
+            return False
+        if kind == 'exact':
+            self.num_exact += 1
+        else:
+            self.num_near += 1
+        if original_source != source:
+            self.duplicate_of.setdefault(source, set()).add(original_source)
+        return True
+
+    def add(self, nodes: Iterable[BaseNode]) -> None:
+        """Remember the texts of `nodes` (already indexed), none is dropped or counted"""
+        for node in nodes:
+            self._find_original(node.get_content(), node.metadata.get('file_path', ''))
+
+    def filter(self, nodes: Iterable[BaseNode]) -> List[BaseNode]:
+        exact, near = self.num_exact, self.num_near
+        kept = [
+            node for node in nodes
+            if not self.is_duplicate(node.get_content(), node.metadata.get('file_path', ''))
+        ]
+        metrics.DEDUPLICATED_CHUNKS.inc(self.num_exact - exact, kind='exact')
+        metrics.DEDUPLICATED_CHUNKS.inc(self.num_near - near, kind='near')
+        if self.num_dropped > exact + near:
+            log.debug('Dropped %d exact and %d near-duplicate chunks',
+                      self.num_exact - exact, self.num_near - near)
+        return kept
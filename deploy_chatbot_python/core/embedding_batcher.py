@@ -0,0 +1,85 @@
+import asyncio
+from typing import List, Set, Tuple, Union
+from dataclasses import dataclass, field
+
+from llama_index.core.base.embeddings.base import BaseEmbedding, Embedding
+
+from deploy_chatbot_python.config import constants
+from deploy_chatbot_python.logging.logger_instance import log
+
+
+@dataclass
+class EmbeddingBatcher:  # pylint: disable=too-many-instance-attributes
+    """
+    Micro-batches concurrent query embeddings: questions arriving within `max_wait` seconds
+    (or until `max_batch_size` are pending) are embedded by a single batched call, whose results
+    are fanned back out to the awaiting coroutines.
+    A batch goes through the model's query embedding path: its `aget_query_embedding_batch` if
+    it has one, its text embeddings if they are the query embeddings (OpenAI models with the same
+    query and text engine), otherwise concurrent `aget_query_embedding` calls
+    """
+    embedding_model: BaseEmbedding
+    max_batch_size: int = constants.QUERY_EMBEDDING_MAX_BATCH_SIZE
+    max_wait: float = constants.QUERY_EMBEDDING_BATCH_WAIT_SECONDS
+
+    num_batches: int = field(default=0, init=False)
+    num_queries: int = field(default=0, init=False)
+    _pending: List[Tuple[str, asyncio.Future]] = field(default_factory=list, init=False)
+    _flush_handle: Union[asyncio.TimerHandle, None] = field(default=None, init=False)
+    _loop: Union[asyncio.AbstractEventLoop, None] = field(default=None, init=False)
+    _tasks: Set[asyncio.Task] = field(default_factory=set, init=False)
+
+    async def aget_query_embedding(self, query: str) -> Embedding:
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:  # pending futures belong to the loop that created them
+            self._loop, self._pending, self._flush_handle = loop, [], None
+        future = loop.create_future()
+        self._pending.append((query, future))
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.max_wait, self._flush)
+        return await future
+
+    def _flush(self) -> None:
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.ensure_future(self._embed_batch(batch))
+            self._tasks.add(task)  # strong reference until done
+            task.add_done_callback(self._tasks.discard)
+
+    @property
+    def _embeds_queries_as_texts(self) -> bool:
+        # pylint: disable=protected-access  # `OpenAIEmbedding` only exposes its engines privately
+        query_engine = getattr(self.embedding_model, '_query_engine', None)
+        return query_engine is not None and query_engine == self.embedding_model._text_engine
+
+    async def _embed_queries(self, queries: List[str]) -> List[Embedding]:
+        embed_batch = getattr(self.embedding_model, 'aget_query_embedding_batch', None)
+        if embed_batch is not None:
+            return await embed_batch(queries)
+        if self._embeds_queries_as_texts:
+            return await self.embedding_model.aget_text_embedding_batch(queries)
+        return list(await asyncio.gather(
+            *(self.embedding_model.aget_query_embedding(query) for query in queries)
+        ))
+
+    async def _embed_batch(self, batch: List[Tuple[str, asyncio.Future]]) -> None:
+        queries = list(dict.fromkeys(query for query, _ in batch))
+        try:
+            embeddings = await self._embed_queries(queries)
+        except Exception as e:  # pylint: disable=W0718 # raised in every awaiting query
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        self.num_batches += 1
+        self.num_queries += len(batch)
+        embedding_by_query = dict(zip(queries, embeddings))
+        for query, future in batch:
+            if not future.done():  # the awaiting query may have been cancelled
+                future.set_result(embedding_by_query[query])
+        log.debug('Embedded batch of %d queries (%d unique)', len(batch), len(queries))
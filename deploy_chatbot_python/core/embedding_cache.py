@@ -0,0 +1,162 @@
+import os
+import re
+import hashlib
+from pathlib import Path
+from typing import Any, Dict, List, Union
+from dataclasses import dataclass, field
+
+import numpy as np
+from llama_index.core.base.embeddings.base import BaseEmbedding, Embedding
+from llama_index.core.bridge.pydantic import PrivateAttr
+
+from deploy_chatbot_python.core import metrics
+from deploy_chatbot_python.config import constants
+from deploy_chatbot_python.logging.logger_instance import log
+
+
+@dataclass
+class EmbeddingCache:
+    """
+    Content-addressed embedding store of a single embedding model.
+    Saved as one `.npz` per model: `keys` (sha256 digests of the texts, as uint8 rows)
+    and `vectors` (float32 rows).
+    """
+    model_name: str
+    cache_dir: Path
+
+    _rows: Dict[bytes, int] = field(default_factory=dict, init=False)
+    _vectors: np.ndarray = field(default_factory=lambda: np.empty((0, 0), np.float32), init=False)
+    _new_vectors: List[np.ndarray] = field(default_factory=list, init=False)
+
+    def __post_init__(self):
+        self._load()
+
+    @property
+    def path(self) -> Path:
+        safe_model_name = re.sub(r"[^\w.-]", "_", self.model_name)
+        return Path(self.cache_dir) / f'{safe_model_name}.npz'
+
+    @staticmethod
+    def key(text: str) -> bytes:
+        return hashlib.sha256(text.encode('utf-8')).digest()
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def get_many(self, texts: List[str]) -> List[Union[Embedding, None]]:
+        embeddings: List[Union[Embedding, None]] = []
+        for text in texts:
+            row = self._rows.get(self.key(text))
+            if row is None:
+                embeddings.append(None)
+            elif row < len(self._vectors):
+                embeddings.append(self._vectors[row].tolist())
+            else:
+                embeddings.append(self._new_vectors[row - len(self._vectors)].tolist())
+        return embeddings
+
+    def put_many(self, texts: List[str], embeddings: List[Embedding]) -> None:
+        for text, embedding in zip(texts, embeddings):
+            key = self.key(text)
+            if key in self._rows:
+                continue
+            self._rows[key] = len(self._vectors) + len(self._new_vectors)
+            self._new_vectors.append(np.asarray(embedding, dtype=np.float32))
+
+    def _load(self) -> None:
+        if not os.path.exists(self.path):
+            log.debug('No embedding cache found at: \n%s\n', self.path)
+            return
+        with np.load(self.path) as data:
+            keys, self._vectors = data['keys'], data['vectors']
+        self._rows = {key.tobytes(): row for row, key in enumerate(keys)}
+        log.debug('Loaded %d cached embeddings from: \n%s\n', len(self._rows), self.path)
+
+    def save(self) -> None:
+        if not self._new_vectors:
+            return
+        keys = np.frombuffer(b''.join(sorted(self._rows, key=self._rows.get)), dtype=np.uint8)
+        new_vectors = np.stack(self._new_vectors)
+        vectors = (
+            np.concatenate([self._vectors, new_vectors]) if len(self._vectors) else new_vectors
+        )
+        os.makedirs(self.cache_dir, exist_ok=True)
+        # write-then-rename so an interrupted save never corrupts the cache
+        tmp_path = self.path.with_suffix('.tmp.npz')
+        np.savez(tmp_path, keys=keys.reshape(-1, hashlib.sha256().digest_size), vectors=vectors)
+        os.replace(tmp_path, self.path)
+        self._vectors, self._new_vectors = vectors, []
+        log.debug('Saved %d cached embeddings at: \n%s\n', len(self._rows), self.path)
+
+
+class CachedEmbedding(BaseEmbedding):
+    """Consults an `EmbeddingCache` before embedding texts, cache misses are embedded in batches"""
+    _embedding_model: BaseEmbedding = PrivateAttr()
+    _cache: EmbeddingCache = PrivateAttr()
+
+    def __init__(self, embedding_model: BaseEmbedding, cache: EmbeddingCache, **kwargs: Any):
+        # Large outer batches, so that the misses of many nodes are grouped into full API calls
+        super().__init__(
+            model_name=embedding_model.model_name,
+            embed_batch_size=constants.EMBEDDING_CACHE_LOOKUP_BATCH_SIZE,
+            **kwargs,
+        )
+        self._embedding_model = embedding_model
+        self._cache = cache
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "CachedEmbedding"
+
+    @property
+    def cache(self) -> EmbeddingCache:
+        return self._cache
+
+    @property
+    def embedding_model(self) -> BaseEmbedding:
+        return self._embedding_model
+
+    def _get_query_embedding(self, query: str) -> Embedding:
+        return self._embedding_model.get_query_embedding(query)
+
+    async def _aget_query_embedding(self, query: str) -> Embedding:
+        return await self._embedding_model.aget_query_embedding(query)
+
+    def _get_text_embedding(self, text: str) -> Embedding:
+        return self._get_text_embeddings([text])[0]
+
+    async def _aget_text_embedding(self, text: str) -> Embedding:
+        return (await self._aget_text_embeddings([text]))[0]
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[Embedding]:
+        embeddings = self._cache.get_many(texts)
+        missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        if missing:
+            missing_texts = [texts[i] for i in missing]
+            new_embeddings = self._embedding_model.get_text_embedding_batch(missing_texts)
+            self._fill_missing(embeddings, missing, missing_texts, new_embeddings)
+        self._count_lookups(len(texts), len(missing))
+        log.debug('Embedding cache [hits: %d | misses: %d]',
+                  len(texts) - len(missing), len(missing))
+        return embeddings
+
+    async def _aget_text_embeddings(self, texts: List[str]) -> List[Embedding]:
+        embeddings = self._cache.get_many(texts)
+        missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        if missing:
+            missing_texts = [texts[i] for i in missing]
+            new_embeddings = await self._embedding_model.aget_text_embedding_batch(missing_texts)
+            self._fill_missing(embeddings, missing, missing_texts, new_embeddings)
+        self._count_lookups(len(texts), len(missing))
+        return embeddings
+
+    @staticmethod
+    def _count_lookups(num_texts: int, num_missing: int) -> None:
+        metrics.CACHE_LOOKUPS.inc(num_texts - num_missing, cache='embedding', result='hit')
+        metrics.CACHE_LOOKUPS.inc(num_missing, cache='embedding', result='miss')
+
+    def _fill_missing(self, embeddings: List[Union[Embedding, None]], missing: List[int],
+                      missing_texts: List[str], new_embeddings: List[Embedding]) -> None:
+        self._cache.put_many(missing_texts, new_embeddings)
+        for i, embedding in zip(missing, new_embeddings):
+            embeddings[i] = embedding
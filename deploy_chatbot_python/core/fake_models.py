@@ -0,0 +1,135 @@
+import time
+import asyncio
+import hashlib
+from typing import Any, List
+
+import numpy as np
+from llama_index.core.base.embeddings.base import BaseEmbedding, Embedding
+from llama_index.core.base.llms.types import (
+    CompletionResponse,
+    CompletionResponseAsyncGen,
+    CompletionResponseGen,
+    LLMMetadata,
+)
+from llama_index.core.bridge.pydantic import Field, PrivateAttr
+from llama_index.core.llms import CustomLLM
+from llama_index.core.llms.callbacks import llm_completion_callback
+
+
+FAKE_VOCABULARY = ('dog', 'cabbage', 'poodle', 'beagle', 'vegetable', 'green', 'is', 'a', 'the')
+
+
+class FakeEmbedding(BaseEmbedding):
+    """
+    Local stand-in for an embedding API: deterministic unit vectors seeded by the text hash,
+    a fixed `latency` (seconds) per call, and a record of the batch size of every call
+    """
+    embed_dim: int = Field(default=64, gt=0)
+    latency: float = Field(default=0.0, ge=0)
+
+    _batch_sizes: List[int] = PrivateAttr(default_factory=list)
+
+    def __init__(self, **kwargs: Any) -> None:
+        kwargs.setdefault('model_name', 'fake-embedding')
+        kwargs.setdefault('embed_batch_size', 2048)
+        super().__init__(**kwargs)
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "FakeEmbedding"
+
+    @property
+    def batch_sizes(self) -> List[int]:
+        return self._batch_sizes
+
+    def _embed(self, text: str) -> Embedding:
+        seed = int.from_bytes(hashlib.sha256(text.encode('utf-8')).digest()[:8], 'little')
+        vector = np.random.default_rng(seed).normal(size=self.embed_dim)
+        return (vector / np.linalg.norm(vector)).tolist()
+
+    def _get_query_embedding(self, query: str) -> Embedding:
+        return self._get_text_embeddings([query])[0]
+
+    async def _aget_query_embedding(self, query: str) -> Embedding:
+        return (await self._aget_text_embeddings([query]))[0]
+
+    def _get_text_embedding(self, text: str) -> Embedding:
+        return self._get_text_embeddings([text])[0]
+
+    async def aget_query_embedding_batch(self, queries: List[str]) -> List[Embedding]:
+        """Query embeddings of `queries` in one call"""
+        return await self._aget_text_embeddings(queries)
+
+    async def _aget_text_embedding(self, text: str) -> Embedding:
+        return (await self._aget_text_embeddings([text]))[0]
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[Embedding]:
+        self._batch_sizes.append(len(texts))
+        time.sleep(self.latency)
+        return [self._embed(text) for text in texts]
+
+    async def _aget_text_embeddings(self, texts: List[str]) -> List[Embedding]:
+        self._batch_sizes.append(len(texts))
+        await asyncio.sleep(self.latency)
+        return [self._embed(text) for text in texts]
+
+
+class FakeLLM(CustomLLM):
+    """
+    Local stand-in for a completion API: `num_output` deterministic tokens picked by the prompt
+    hash, after a fixed `latency` (seconds) and `token_latency` between streamed tokens
+    """
+    num_output: int = Field(default=32, gt=0)
+    latency: float = Field(default=0.0, ge=0)
+    token_latency: float = Field(default=0.0, ge=0)
+    model: str = Field(default='fake-llm')
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "FakeLLM"
+
+    @property
+    def metadata(self) -> LLMMetadata:
+        return LLMMetadata(num_output=self.num_output, model_name=self.model)
+
+    def _tokens(self, prompt: str) -> List[str]:
+        seed = int.from_bytes(hashlib.sha256(prompt.encode('utf-8')).digest()[:8], 'little')
+        words = np.random.default_rng(seed).choice(FAKE_VOCABULARY, self.num_output)
+        return [f'{word} ' for word in words[:-1]] + [str(words[-1])]
+
+    @llm_completion_callback()
+    def complete(self, prompt: str, formatted: bool = False, **kwargs: Any) -> CompletionResponse:
+        time.sleep(self.latency)
+        return CompletionResponse(text=''.join(self._tokens(prompt)))
+
+    @llm_completion_callback()
+    def stream_complete(self, prompt: str, formatted: bool = False,
+                        **kwargs: Any) -> CompletionResponseGen:
+        def gen() -> CompletionResponseGen:
+            time.sleep(self.latency)
+            text = ''
+            for token in self._tokens(prompt):
+                time.sleep(self.token_latency)
+                text += token
+                yield CompletionResponse(text=text, delta=token)
+
+        return gen()
+
+    @llm_completion_callback()
+    async def acomplete(self, prompt: str, formatted: bool = False,
+                        **kwargs: Any) -> CompletionResponse:
+        await asyncio.sleep(self.latency)
+        return CompletionResponse(text=''.join(self._tokens(prompt)))
+
+    @llm_completion_callback()
+    async def astream_complete(self, prompt: str, formatted: bool = False,
+                               **kwargs: Any) -> CompletionResponseAsyncGen:
+        async def gen() -> CompletionResponseAsyncGen:
+            await asyncio.sleep(self.latency)
+            text = ''
+            for token in self._tokens(prompt):
+                await asyncio.sleep(self.token_latency)
+                text += token
+                yield CompletionResponse(text=text, delta=token)
+
+        return gen()
@@ -0,0 +1,107 @@
+from typing import Awaitable, Callable, Dict, List, Tuple, Union
+
+import numpy as np
+from llama_index.core import QueryBundle
+from llama_index.core.retrievers import BaseRetriever
+from llama_index.core.schema import NodeWithScore
+from llama_index.core.storage.docstore.types import BaseDocumentStore
+
+from deploy_chatbot_python.core import metrics
+from deploy_chatbot_python.core.bm25 import BM25Index
+from deploy_chatbot_python.config import constants
+from deploy_chatbot_python.logging.logger_instance import log
+
+
+def _normalize(scores: Dict[str, float]) -> Dict[str, float]:
+    """Min-max scale to [0, 1], so BM25 and cosine scores can be fused"""
+    if not scores:
+        return {}
+    values = np.fromiter(scores.values(), dtype=np.float64)
+    low, high = values.min(), values.max()
+    if high == low:
+        return {node_id: 1.0 for node_id in scores}
+    return {node_id: (score - low) / (high - low) for node_id, score in scores.items()}
+
+
+class HybridRetriever(BaseRetriever):  # pylint: disable=too-many-instance-attributes
+    """
+    Fuses BM25 and vector scores of both retrievers' candidates: `alpha` * vector + (1 - `alpha`)
+    * BM25, each min-max normalized. With `lexical_first`, a query whose best BM25 match covers
+    at least `confidence_threshold` of its IDF weight is answered from BM25 alone, without
+    embedding the query
+    """
+
+    def __init__(  # pylint: disable=too-many-arguments
+        self,
+        vector_retriever: BaseRetriever,
+        lexical_index: BM25Index,
+        docstore: BaseDocumentStore,
+        *,
+        similarity_top_k: int = constants.SIMILARITY_TOP_K,
+        alpha: float = constants.HYBRID_ALPHA,
+        num_candidates: int = constants.HYBRID_NUM_CANDIDATES,
+        lexical_first: bool = False,
+        confidence_threshold: float = constants.LEXICAL_CONFIDENCE_THRESHOLD,
+        aget_query_embedding: Union[Callable[[str], Awaitable[List[float]]], None] = None,
+    ) -> None:
+        super().__init__()
+        self.vector_retriever = vector_retriever
+        self.lexical_index = lexical_index
+        self.docstore = docstore
+        self.similarity_top_k = similarity_top_k
+        self.alpha = alpha
+        self.num_candidates = num_candidates
+        self.lexical_first = lexical_first
+        self.confidence_threshold = confidence_threshold
+        self._aget_query_embedding = aget_query_embedding
+
+    def _lexical_search(self, query_bundle: QueryBundle) -> Tuple[Dict[str, float], bool]:
+        """BM25 scores of the candidates, and whether the best one is confident enough"""
+        matches, query_weight = self.lexical_index.search(
+            query_bundle.query_str, self.num_candidates
+        )
+        is_confident = (
+            self.lexical_first
+            and bool(matches)
+            and matches[0][1] >= self.confidence_threshold * query_weight
+        )
+        return dict(matches), is_confident
+
+    def _lexical_nodes(self, lexical_scores: Dict[str, float]) -> List[NodeWithScore]:
+        node_ids = list(lexical_scores)[:self.similarity_top_k]
+        metrics.RETRIEVALS.inc(path='lexical')
+        log.debug('Confident lexical match, skipped the query embedding')
+        return [
+            NodeWithScore(node=node, score=lexical_scores[node.node_id])
+            for node in self.docstore.get_nodes(node_ids)
+        ]
+
+    def _fuse(self, lexical_scores: Dict[str, float],
+              vector_nodes: List[NodeWithScore]) -> List[NodeWithScore]:
+        metrics.RETRIEVALS.inc(path='hybrid')
+        nodes = {node.node_id: node.node for node in vector_nodes}
+        vector_scores = _normalize({node.node_id: node.score or 0.0 for node in vector_nodes})
+        lexical_scores = _normalize(lexical_scores)
+        fused = {
+            node_id: self.alpha * vector_scores.get(node_id, 0.0)
+            + (1 - self.alpha) * lexical_scores.get(node_id, 0.0)
+            for node_id in vector_scores.keys() | lexical_scores.keys()
+        }
+        best = sorted(fused, key=lambda node_id: (-fused[node_id], node_id))[:self.similarity_top_k]
+        missing = [node_id for node_id in best if node_id not in nodes]
+        nodes.update({node.node_id: node for node in self.docstore.get_nodes(missing)})
+        return [NodeWithScore(node=nodes[node_id], score=fused[node_id]) for node_id in best]
+
+    def _retrieve(self, query_bundle: QueryBundle) -> List[NodeWithScore]:
+        lexical_scores, is_confident = self._lexical_search(query_bundle)
+        if is_confident:
+            return self._lexical_nodes(lexical_scores)
+        return self._fuse(lexical_scores, self.vector_retriever.retrieve(query_bundle))
+
+    async def _aretrieve(self, query_bundle: QueryBundle) -> List[NodeWithScore]:
+        lexical_scores, is_confident = self._lexical_search(query_bundle)
+        if is_confident:
+            return self._lexical_nodes(lexical_scores)
+        if query_bundle.embedding is None and self._aget_query_embedding is not None:
+            query_bundle.embedding = await self._aget_query_embedding(query_bundle.query_str)
+        return self._fuse(lexical_scores, await self.vector_retriever.aretrieve(query_bundle))
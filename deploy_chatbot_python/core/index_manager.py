@@ -1,87 +1,336 @@
 import os
-import json
-import hashlib
+import asyncio
+import threading
+from typing import AsyncIterator, List, Tuple, Union
 from dataclasses import dataclass, field
 
-from llama_index.core import StorageContext, load_index_from_storage
-from llama_index.core.base.response.schema import Response
+from llama_index.core import QueryBundle, load_index_from_storage
+from llama_index.core.base.base_query_engine import BaseQueryEngine
+from llama_index.core.base.response.schema import Response, AsyncStreamingResponse
 
+from deploy_chatbot_python.core import metrics
+from deploy_chatbot_python.core.ingestion import list_training_files
 from deploy_chatbot_python.core.llama_indexer import LlamaIndexer
+from deploy_chatbot_python.core.index_manifest import IndexManifest
+from deploy_chatbot_python.core.index_paths import IndexPaths
+from deploy_chatbot_python.core.profiling import profiled
+from deploy_chatbot_python.core.response_cache import ResponseCache
+from deploy_chatbot_python.core.storage import create_storage_context, storage_exists
+from deploy_chatbot_python.utils.file_lock import file_lock
 from deploy_chatbot_python.config import constants
 from deploy_chatbot_python.logging.logger_instance import log
 
 
 @dataclass
-class IndexManager:
+class IndexManager:  # pylint: disable=too-many-instance-attributes
+    max_concurrent_queries: int = field(default_factory=lambda: constants.MAX_CONCURRENT_QUERIES)
+    response_cache_enabled: Union[bool, None] = None  # None: `RESPONSE_CACHE_ENABLED`
+    paths: IndexPaths = field(default_factory=IndexPaths.default)
     llama_indexer: LlamaIndexer = field(default_factory=LlamaIndexer, init=False)
     _current_data_hash: str = field(default='', init=False)
+    _manifest: IndexManifest = field(default_factory=IndexManifest, init=False)
+    _saved_manifest: IndexManifest = field(default_factory=IndexManifest, init=False)
+    response_cache: Union[ResponseCache, None] = field(default=None, init=False)
+    _query_semaphore: asyncio.Semaphore = field(init=False)
+    _swap_lock: threading.Lock = field(default_factory=threading.Lock, init=False)
 
     def __post_init__(self):
+        self._query_semaphore = asyncio.Semaphore(self.max_concurrent_queries)
         self._initialize()
+        self._initialize_response_cache()
 
     def _initialize(self):
         log.debug('Initializing IndexManager')
+        with file_lock(self.paths.lock):  # another process may be building the index
+            self._initialize_index()
+
+    def _initialize_index(self):
         self._compute_data_hash()
         if self._is_index_outdated():
-            self._save_data_hash()
-            self._rebuild_index()
+            if self._can_update_incrementally():
+                self._load_index()
+                self._update_index()
+            else:
+                self._rebuild_index()
             self._save_index()
+            self._save_data_hash()
         else:
             self._load_index()
 
+    def _initialize_response_cache(self) -> None:
+        enabled = self.response_cache_enabled
+        if not (constants.RESPONSE_CACHE_ENABLED if enabled is None else enabled):
+            return
+        persist_path = self.paths.response_cache if constants.RESPONSE_CACHE_PERSIST else None
+        self.response_cache = ResponseCache(persist_path=persist_path)
+        self.response_cache.purge_stale(self._current_data_hash)
+
+    def close(self) -> None:
+        if self.response_cache is not None:
+            self.response_cache.save()
+
+    @property
+    def data_hash(self) -> str:
+        """Hash of the training data the served index was built from"""
+        return self._current_data_hash
+
+    def saved_data_hash(self) -> str:
+        """Hash of the training data the saved index was built from, '' if none is saved"""
+        return self._load_data_hash()
+
+    def scan_data_hash(self) -> str:
+        """Hash of the training data now, only files whose mtime or size changed are read"""
+        files = self._get_files_in_training_data_dir()
+        return IndexManifest.scan(
+            files, previous=self._manifest, embedding_model=self.llama_indexer.embedding_model_id
+        ).data_hash
+
+    @metrics.INDEX_OPERATION_SECONDS.timed(operation='reload')
+    def reload(self) -> bool:
+        """
+        Bring the served index up to date without interrupting queries: the updated index is
+        built (or loaded, if another process built it already) next to the served one, and
+        swapped in once complete. In-flight queries finish on the index they started on.
+        Returns whether the index was swapped
+        """
+        staged = IndexManager(self.max_concurrent_queries, response_cache_enabled=False,
+                              paths=self.paths)
+        if staged._current_data_hash == self._current_data_hash:  # pylint: disable=protected-access
+            return False
+        with self._swap_lock:  # the query engine before the data hash, see `_cache_response`
+            self.llama_indexer = staged.llama_indexer
+            self._current_data_hash = staged._current_data_hash  # pylint: disable=protected-access
+            self._manifest = staged._manifest  # pylint: disable=protected-access
+            self._saved_manifest = staged._saved_manifest  # pylint: disable=protected-access
+        if self.response_cache is not None:
+            self.response_cache.purge_stale(self._current_data_hash)
+        log.info('Swapped in the reloaded index')
+        return True
+
     def _is_index_outdated(self) -> bool:
         saved_data_hash = self._load_data_hash()
-        is_outdated: bool = self._current_data_hash != saved_data_hash
+        is_outdated: bool = (
+            self._current_data_hash != saved_data_hash
+            or not storage_exists(self.paths.index_store)
+        )
         log.debug('Index storage is outdated' if is_outdated else 'Index storage is up-to-date')
         return is_outdated
 
+    def _can_update_incrementally(self) -> bool:
+        """Whether the index exists and its vectors were embedded by the current model"""
+        if self._saved_manifest.embedding_model != self._manifest.embedding_model:
+            if self._saved_manifest.files:
+                log.info('Embedding model changed (%s, %s dimensions -> %s), rebuilding the index',
+                         self._saved_manifest.embedding_model or 'unknown',
+                         self._saved_manifest.embedding_dim, self._manifest.embedding_model)
+            return False
+        return (
+            os.path.exists(self.paths.manifest)
+            and storage_exists(self.paths.index_store)
+        )
+
     def _get_files_in_training_data_dir(self) -> dict:
-        return {
-            entry.path: entry.stat().st_mtime
-            for entry in os.scandir(constants.TRAINING_DATA_PATH)
-            if entry.is_file()
-        }
+        """All files (recursively) that are indexed, the ones `SimpleDirectoryReader` reads"""
+        return {path: os.stat(path) for path in list_training_files(self.paths.training_data)}
 
     def _compute_data_hash(self) -> None:
         training_files: dict = self._get_files_in_training_data_dir()
-        # Serialize dictionary with sorted keys to ensure consistency
-        serialized: str = json.dumps(training_files, sort_keys=True)
-        self._current_data_hash = hashlib.sha256(serialized.encode()).hexdigest()
+        self._saved_manifest = IndexManifest.load(self.paths.manifest)
+        self._manifest = IndexManifest.scan(training_files, previous=self._saved_manifest,
+                                            embedding_model=self.llama_indexer.embedding_model_id)
+        self._current_data_hash = self._manifest.data_hash
         log.debug('Current data hash computed')
 
     def _load_data_hash(self) -> str:
-        if not os.path.exists(constants.TRAINING_DATA_HASH_PATH):
-            log.debug('No stored data hash found at: \n%s\n', constants.TRAINING_DATA_HASH_PATH)
+        if not os.path.exists(self.paths.data_hash):
+            log.debug('No stored data hash found at: \n%s\n', self.paths.data_hash)
             return ""
-        with open(constants.TRAINING_DATA_HASH_PATH, "r", encoding='utf-8') as file:
-            log.debug('Stored data hash found at: \n%s\n', constants.TRAINING_DATA_HASH_PATH)
+        with open(self.paths.data_hash, "r", encoding='utf-8') as file:
+            log.debug('Stored data hash found at: \n%s\n', self.paths.data_hash)
             return file.read().strip()
 
     def _save_data_hash(self) -> None:
-        with open(constants.TRAINING_DATA_HASH_PATH, "w", encoding='utf-8') as file:
+        with open(self.paths.data_hash, "w", encoding='utf-8') as file:
             file.write(self._current_data_hash)
-        log.debug('Data hash saved at: \n%s\n', constants.TRAINING_DATA_HASH_PATH)
+        log.debug('Data hash saved at: \n%s\n', self.paths.data_hash)
 
+    @metrics.INDEX_OPERATION_SECONDS.timed(operation='build')
     def _rebuild_index(self):
-        self.llama_indexer.build_query_pipeline()
+        self.llama_indexer.build_query_pipeline(self.paths.training_data)
+
+    @metrics.INDEX_OPERATION_SECONDS.timed(operation='update')
+    def _update_index(self):
+        diff = self._saved_manifest.diff(self._manifest)
+        # unchanged files whose dropped duplicate chunks were kept in a changed file
+        dependents = self._saved_manifest.dependent_files(diff.modified + diff.removed)
+        log.info('Updating index incrementally '
+                 '[added: %d | modified: %d | removed: %d | duplicates reinserted: %d]',
+                 len(diff.added), len(diff.modified), len(diff.removed), len(dependents))
+        stale_files = diff.modified + diff.removed + dependents
+        stale_doc_ids = [
+            doc_id for path in stale_files for doc_id in self._saved_manifest.files[path].doc_ids
+        ]
+        inserted_files = diff.added + diff.modified + dependents
+        unchanged_files = [
+            path for path in self._manifest.files
+            if path in self._saved_manifest.files and path not in stale_files
+        ]
+        self.llama_indexer.duplicate_of = {
+            path: set(self._saved_manifest.files[path].duplicate_of) for path in unchanged_files
+        }
+        self.llama_indexer.delete_documents(stale_doc_ids)
+        self.llama_indexer.insert_files(inserted_files, indexed_node_ids=[
+            node_id for path in unchanged_files
+            for node_id in self._saved_manifest.files[path].node_ids
+        ])
+        self.llama_indexer.set_query_engine()
 
+    @metrics.INDEX_OPERATION_SECONDS.timed(operation='persist')
     def _save_index(self):
-        self.llama_indexer.index.storage_context.persist(constants.INDEX_STORE_PATH)
+        self.llama_indexer.index.storage_context.persist(self.paths.index_store)
+        self.llama_indexer.save_lexical_index(self.paths.index_store)
+        self._manifest.set_file_nodes(self.llama_indexer.get_file_nodes())
+        self._manifest.set_duplicate_sources(self.llama_indexer.duplicate_of)
+        self._manifest.embedding_dim = self.llama_indexer.get_embedding_dim()
+        self._manifest.save(self.paths.manifest)
         log.debug('Saved index storage')
 
+    @metrics.INDEX_OPERATION_SECONDS.timed(operation='load')
     def _load_index(self):
-        storage_context = StorageContext.from_defaults(persist_dir=constants.INDEX_STORE_PATH)
-        self.llama_indexer.index = load_index_from_storage(storage_context)
+        storage_context = create_storage_context(persist_dir=self.paths.index_store)
+        self.llama_indexer.index = load_index_from_storage(
+            storage_context,
+            embed_model=self.llama_indexer.embedding_model,
+        )
+        self.llama_indexer.load_lexical_index(self.paths.index_store)
         self.llama_indexer.set_query_engine()
         log.debug('Loaded index storage')
 
+    @property
+    def _is_semantic_cache(self) -> bool:
+        return self.response_cache is not None and self.response_cache.is_semantic
+
+    def _get_cached_response(self, question: str,
+                             embedding: Union[List[float], None]) -> Union[str, None]:
+        if self.response_cache is None:
+            return None
+        response = self.response_cache.get(question, self._current_data_hash, embedding)
+        if response is not None:
+            log.debug('Response cache hit')
+        return response
+
+    def _lookup_response(self, question: str) -> Tuple[Union[str, None], Union[List[float], None]]:
+        """
+        Cached response and the question embedding, if computed: the question is only embedded
+        (for the semantic tier, and reused by the retriever) when the exact tier misses
+        """
+        if not self._is_semantic_cache:
+            return self._get_cached_response(question, None), None
+        response = self.response_cache.get_exact(question, self._current_data_hash)
+        if response is not None:
+            log.debug('Response cache hit')
+            return response, None
+        embedding = self.llama_indexer.embedding_model.get_query_embedding(question)
+        return self._get_cached_response(question, embedding), embedding
+
+    async def _alookup_response(
+        self, question: str
+    ) -> Tuple[Union[str, None], Union[List[float], None]]:
+        """`_lookup_response` embedding the question with the batcher (if enabled)"""
+        if not self._is_semantic_cache:
+            return self._get_cached_response(question, None), None
+        response = self.response_cache.get_exact(question, self._current_data_hash)
+        if response is not None:
+            log.debug('Response cache hit')
+            return response, None
+        embedding = await self._aget_query_embedding(question)
+        return self._get_cached_response(question, embedding), embedding
+
+    def _cache_response(self, question: str, response: str, embedding: Union[List[float], None],
+                        query_engine: BaseQueryEngine) -> None:
+        """Cache the response, unless the engine that answered it was swapped out meanwhile"""
+        if self.response_cache is None:
+            return
+        with self._swap_lock:
+            if query_engine in self._query_engines:
+                self.response_cache.put(question, self._current_data_hash, response, embedding)
+
+    @property
+    def _query_engines(self) -> tuple:
+        return self.llama_indexer.query_engine, self.llama_indexer.streaming_query_engine
+
+    async def _aget_query_embedding(self, question: str) -> List[float]:
+        batcher = self.llama_indexer.query_embedding_batcher
+        if batcher is not None:
+            return await batcher.aget_query_embedding(question)
+        return await self.llama_indexer.embedding_model.aget_query_embedding(question)
+
+    async def _aget_query_bundle(self, question: str,
+                                 embedding: Union[List[float], None]) -> QueryBundle:
+        """
+        Query with its embedding, embedded by the batcher (if enabled) when not computed yet.
+        The hybrid retriever embeds (with the batcher) only if the lexical match is not enough
+        """
+        if (embedding is None and self.llama_indexer.query_embedding_batcher is not None
+                and self.llama_indexer.lexical_index is None):
+            embedding = await self._aget_query_embedding(question)
+        return QueryBundle(question, embedding=embedding)
+
+    @metrics.QUERY_SECONDS.timed(mode='sync')
+    @profiled('IndexManager.query')
     def query(self, question: str) -> str:
         log.debug('Queried engine')
-        if self.llama_indexer.query_engine is None:
+        query_engine = self.llama_indexer.query_engine  # kept if the index is swapped meanwhile
+        if query_engine is None:
+            raise ValueError("Query engine is not set.")
+        cached_response, embedding = self._lookup_response(question)
+        if cached_response is not None:
+            return cached_response
+        # the question embedding (if computed) is reused by the retriever
+        response: Response = query_engine.query(QueryBundle(question, embedding=embedding))
+        self._cache_response(question, str(response), embedding, query_engine)
+        return str(response)
+
+    @metrics.QUERY_SECONDS.timed(mode='async')
+    @profiled('IndexManager.aquery')
+    async def aquery(self, question: str) -> str:
+        """Non-blocking query, at most `max_concurrent_queries` are in flight at once"""
+        log.debug('Queried engine asynchronously')
+        query_engine = self.llama_indexer.query_engine  # kept if the index is swapped meanwhile
+        if query_engine is None:
             raise ValueError("Query engine is not set.")
-        response: Response = self.llama_indexer.query_engine.query(question)
+        async with self._query_semaphore:
+            cached_response, embedding = await self._alookup_response(question)
+            if cached_response is not None:
+                return cached_response
+            response: Response = await query_engine.aquery(
+                await self._aget_query_bundle(question, embedding)
+            )
+        self._cache_response(question, str(response), embedding, query_engine)
         return str(response)
 
+    @metrics.QUERY_SECONDS.timed(mode='stream')
+    @profiled('IndexManager.astream_query')
+    async def astream_query(self, question: str) -> AsyncIterator[str]:
+        """Yield the response tokens as the LLM produces them"""
+        log.debug('Queried streaming engine')
+        query_engine = self.llama_indexer.streaming_query_engine
+        if query_engine is None:
+            raise ValueError("Query engine is not set.")
+        async with self._query_semaphore:
+            cached_response, embedding = await self._alookup_response(question)
+            if cached_response is not None:
+                yield cached_response
+                return
+            response: AsyncStreamingResponse = await query_engine.aquery(
+                await self._aget_query_bundle(question, embedding)
+            )
+            tokens = []
+            async for token in response.async_response_gen():
+                tokens.append(token)
+                yield token
+        self._cache_response(question, ''.join(tokens), embedding, query_engine)
+
 
 if __name__ == '__main__':
     index_manager = IndexManager()
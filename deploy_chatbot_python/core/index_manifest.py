@@ -0,0 +1,139 @@
+import os
+import json
+import hashlib
+from pathlib import Path
+from typing import Dict, Iterable, List, Set, Union
+from dataclasses import dataclass, field, asdict
+
+from deploy_chatbot_python.logging.logger_instance import log
+
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+@dataclass
+class FileRecord:
+    content_hash: str
+    mtime: float
+    size: int
+    doc_ids: List[str] = field(default_factory=list)
+    node_ids: List[str] = field(default_factory=list)
+    duplicate_of: List[str] = field(default_factory=list)  # files holding its dropped chunks
+
+
+@dataclass
+class ManifestDiff:
+    added: List[str] = field(default_factory=list)
+    modified: List[str] = field(default_factory=list)
+    removed: List[str] = field(default_factory=list)
+
+    @property
+    def is_empty(self) -> bool:
+        return not (self.added or self.modified or self.removed)
+
+
+@dataclass
+class IndexManifest:
+    """
+    Per-file record of the indexed training data (content hash + produced doc/node IDs), and the
+    embedding model the index was built with
+    """
+    files: Dict[str, FileRecord] = field(default_factory=dict)
+    embedding_model: str = ''
+    embedding_dim: Union[int, None] = None
+
+    @classmethod
+    def scan(cls, files: Dict[str, os.stat_result],
+             previous: Union["IndexManifest", None] = None,
+             embedding_model: str = '') -> "IndexManifest":
+        """Hash the given files, reusing the previous hash when mtime and size are unchanged"""
+        previous_files = previous.files if previous is not None else {}
+        records = {}
+        for path, stat in files.items():
+            prev = previous_files.get(path)
+            if prev is not None and prev.mtime == stat.st_mtime and prev.size == stat.st_size:
+                content_hash = prev.content_hash
+            else:
+                content_hash = cls._hash_file(path)
+            records[path] = FileRecord(content_hash, stat.st_mtime, stat.st_size)
+        return cls(records, embedding_model)
+
+    @staticmethod
+    def _hash_file(path: str) -> str:
+        sha = hashlib.sha256()
+        with open(path, "rb") as file:
+            for chunk in iter(lambda: file.read(HASH_CHUNK_SIZE), b""):
+                sha.update(chunk)
+        return sha.hexdigest()
+
+    @property
+    def data_hash(self) -> str:
+        """Hash of the file contents and the embedding model: the version of the index"""
+        content_hashes = {path: record.content_hash for path, record in self.files.items()}
+        # Serialize dictionary with sorted keys to ensure consistency
+        serialized: str = json.dumps(
+            {'files': content_hashes, 'embedding_model': self.embedding_model}, sort_keys=True
+        )
+        return hashlib.sha256(serialized.encode()).hexdigest()
+
+    def diff(self, new: "IndexManifest") -> ManifestDiff:
+        """Files that were added, modified or removed going from `self` to `new`"""
+        diff = ManifestDiff()
+        for path, record in new.files.items():
+            if path not in self.files:
+                diff.added.append(path)
+            elif self.files[path].content_hash != record.content_hash:
+                diff.modified.append(path)
+        diff.removed = [path for path in self.files if path not in new.files]
+        return diff
+
+    def set_file_nodes(self, file_nodes: Dict[str, Dict[str, List[str]]]) -> None:
+        for path, record in self.files.items():
+            nodes = file_nodes.get(path, {})
+            record.doc_ids = nodes.get('doc_ids', [])
+            record.node_ids = nodes.get('node_ids', [])
+
+    def set_duplicate_sources(self, duplicate_of: Dict[str, Set[str]]) -> None:
+        for path, record in self.files.items():
+            record.duplicate_of = sorted(duplicate_of.get(path, ()))
+
+    def dependent_files(self, changed: Iterable[str]) -> List[str]:
+        """
+        Files that had chunks dropped as duplicates of chunks of `changed` files (or of files
+        depending on them): the kept copies are deleted along with `changed`, so are theirs
+        """
+        dependents: Set[str] = set()
+        pending = set(changed)
+        while pending:
+            excluded = set(changed) | dependents
+            pending = {
+                path for path, record in self.files.items()
+                if path not in excluded and pending.intersection(record.duplicate_of)
+            }
+            dependents |= pending
+        return sorted(dependents)
+
+    @classmethod
+    def load(cls, path: Path) -> "IndexManifest":
+        if not os.path.exists(path):
+            log.debug('No stored index manifest found at: \n%s\n', path)
+            return cls()
+        with open(path, "r", encoding='utf-8') as file:
+            raw = json.load(file)
+        log.debug('Stored index manifest found at: \n%s\n', path)
+        if 'files' not in raw:  # saved before the embedding model was recorded
+            raw = {'files': raw}
+        return cls(
+            {file_path: FileRecord(**record) for file_path, record in raw['files'].items()},
+            embedding_model=raw.get('embedding_model', ''),
+            embedding_dim=raw.get('embedding_dim'),
+        )
+
+    def save(self, path: Path) -> None:
+        with open(path, "w", encoding='utf-8') as file:
+            json.dump({
+                'embedding_model': self.embedding_model,
+                'embedding_dim': self.embedding_dim,
+                'files': {file_path: asdict(record) for file_path, record in self.files.items()},
+            }, file)
+        log.debug('Index manifest saved at: \n%s\n', path)
@@ -0,0 +1,46 @@
+import re
+from pathlib import Path
+from dataclasses import dataclass
+
+from deploy_chatbot_python.config import constants
+
+
+NAMESPACE_PATTERN = re.compile(r'^[A-Za-z0-9][A-Za-z0-9_-]{0,63}$')
+
+
+@dataclass(frozen=True)
+class IndexPaths:
+    """Training data and storage locations of one index"""
+    training_data: Path
+    data_hash: Path
+    index_store: Path
+    manifest: Path
+    lock: Path
+    response_cache: Path
+
+    @classmethod
+    def default(cls) -> "IndexPaths":
+        """The paths of the default index, configured in `constants`"""
+        return cls(
+            training_data=constants.TRAINING_DATA_PATH,
+            data_hash=constants.TRAINING_DATA_HASH_PATH,
+            index_store=constants.INDEX_STORE_PATH,
+            manifest=constants.INDEX_MANIFEST_PATH,
+            lock=constants.INDEX_LOCK_PATH,
+            response_cache=constants.RESPONSE_CACHE_PATH,
+        )
+
+    @classmethod
+    def for_namespace(cls, namespace: str) -> "IndexPaths":
+        """The paths of a named index, all in the `NAMESPACES_PATH / namespace` directory"""
+        if not NAMESPACE_PATTERN.match(namespace):
+            raise ValueError(f"Invalid namespace: {namespace!r}")
+        directory = Path(constants.NAMESPACES_PATH) / namespace
+        return cls(
+            training_data=directory / 'training',
+            data_hash=directory / 'training_data_hash.txt',
+            index_store=directory / 'index_storage',
+            manifest=directory / 'index_manifest.json',
+            lock=directory / 'index.lock',
+            response_cache=directory / 'response_cache.json',
+        )
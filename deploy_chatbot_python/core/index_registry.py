@@ -0,0 +1,105 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Dict, List, Tuple, Union
+from dataclasses import dataclass, field
+
+from deploy_chatbot_python.core import metrics
+from deploy_chatbot_python.core.index_paths import IndexPaths, NAMESPACE_PATTERN
+from deploy_chatbot_python.config import constants
+from deploy_chatbot_python.logging.logger_instance import log
+
+if TYPE_CHECKING:  # heavy (llama-index) import, deferred to `get`
+    from deploy_chatbot_python.core.index_manager import IndexManager
+
+
+def _directory_size(path: os.PathLike) -> int:
+    return sum(
+        os.path.getsize(os.path.join(root, name))
+        for root, _, names in os.walk(path) for name in names
+    )
+
+
+@dataclass
+class IndexRegistry:
+    """
+    Named indexes (namespaces), loaded on first use. At most `max_indexes` of them, with at most
+    `max_bytes` of index storage, stay resident: the least recently used ones are evicted
+    (queries in flight on an evicted index still finish)
+    """
+    max_indexes: int = constants.MAX_RESIDENT_NAMESPACES
+    max_bytes: Union[int, None] = constants.MAX_RESIDENT_NAMESPACE_BYTES
+
+    # namespace: (index manager, storage bytes), least recently used first
+    _indexes: "OrderedDict[str, Tuple[IndexManager, int]]" = field(
+        default_factory=OrderedDict, init=False
+    )
+    _loading: Dict[str, threading.Lock] = field(default_factory=dict, init=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, init=False)
+
+    @staticmethod
+    def exists(namespace: str) -> bool:
+        """Whether `namespace` is a valid name with a training data directory"""
+        if not NAMESPACE_PATTERN.match(namespace):
+            return False
+        return os.path.isdir(IndexPaths.for_namespace(namespace).training_data)
+
+    @property
+    def resident(self) -> List[str]:
+        """Loaded namespaces, least recently used first"""
+        with self._lock:
+            return list(self._indexes)
+
+    def _get_resident(self, namespace: str) -> Union["IndexManager", None]:
+        entry = self._indexes.get(namespace)
+        if entry is None:
+            return None
+        self._indexes.move_to_end(namespace)
+        return entry[0]
+
+    def get(self, namespace: str) -> "IndexManager":
+        """The namespace's index manager, loaded (blocking) if it is not resident"""
+        # pylint: disable=import-outside-toplevel  # keeps `import backend.server` fast
+        from deploy_chatbot_python.core.index_manager import IndexManager
+
+        with self._lock:
+            index_manager = self._get_resident(namespace)
+            if index_manager is not None:
+                return index_manager
+            load_lock = self._loading.setdefault(namespace, threading.Lock())
+        with load_lock:  # concurrent requests of the namespace wait for a single load
+            with self._lock:
+                index_manager = self._get_resident(namespace)
+            if index_manager is not None:
+                return index_manager
+            paths = IndexPaths.for_namespace(namespace)
+            index_manager = IndexManager(paths=paths)
+            with self._lock:
+                self._indexes[namespace] = (index_manager, _directory_size(paths.index_store))
+                self._loading.pop(namespace, None)
+                evicted = self._evict()
+                metrics.RESIDENT_NAMESPACES.set(len(self._indexes))
+        log.info('Loaded namespace %s [resident: %d]', namespace, len(self._indexes))
+        for name, evicted_index_manager in evicted:
+            evicted_index_manager.close()
+            log.info('Evicted namespace %s', name)
+        return index_manager
+
+    def _evict(self) -> List[Tuple[str, "IndexManager"]]:
+        """Unload the least recently used namespaces beyond the limits, but the newest one"""
+        evicted = []
+        while len(self._indexes) > 1 and (
+            len(self._indexes) > self.max_indexes
+            or (self.max_bytes is not None
+                and sum(size for _, size in self._indexes.values()) > self.max_bytes)
+        ):
+            name, (index_manager, _) = self._indexes.popitem(last=False)
+            evicted.append((name, index_manager))
+        return evicted
+
+    def close(self) -> None:
+        with self._lock:
+            index_managers = [index_manager for index_manager, _ in self._indexes.values()]
+            self._indexes.clear()
+        for index_manager in index_managers:
+            index_manager.close()
@@ -0,0 +1,62 @@
+import threading
+from typing import TYPE_CHECKING, Union
+from dataclasses import dataclass, field
+
+from deploy_chatbot_python.config import constants
+from deploy_chatbot_python.logging.logger_instance import log
+
+if TYPE_CHECKING:
+    from deploy_chatbot_python.core.index_manager import IndexManager
+
+
+@dataclass
+class IndexWatcher:
+    """
+    Polls the training data (recursively) every `interval` seconds and hot-reloads the
+    `index_manager` once the changed data is the same on two consecutive polls, so files that
+    are still being written are not indexed half-way.
+    A `follow` watcher polls the saved index instead, and swaps in the one another process built
+    """
+    index_manager: "IndexManager"
+    interval: float = constants.INDEX_WATCH_INTERVAL_SECONDS
+    follow: bool = False
+
+    _stop_event: threading.Event = field(default_factory=threading.Event, init=False)
+    _thread: Union[threading.Thread, None] = field(default=None, init=False)
+    _pending_data_hash: Union[str, None] = field(default=None, init=False)
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name='index-watcher', daemon=True)
+        self._thread.start()
+        log.info('Watching the training data for changes every %.1f seconds', self.interval)
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def poll(self) -> bool:
+        """Check the training data once, returns whether the index was reloaded"""
+        if self.follow:
+            return self._poll_saved_index()
+        data_hash = self.index_manager.scan_data_hash()
+        if data_hash == self.index_manager.data_hash or data_hash != self._pending_data_hash:
+            self._pending_data_hash = data_hash
+            return False
+        self._pending_data_hash = None
+        log.info('Training data changed, reloading the index')
+        return self.index_manager.reload()
+
+    def _poll_saved_index(self) -> bool:
+        saved_data_hash = self.index_manager.saved_data_hash()
+        if saved_data_hash in ('', self.index_manager.data_hash):
+            return False
+        log.info('Index saved by another process, reloading it')
+        return self.index_manager.reload()
+
+    def _run(self) -> None:
+        while not self._stop_event.wait(self.interval):
+            try:
+                self.poll()
+            except Exception:  # pylint: disable=W0718 # keep serving the current index
+                log.exception('Failed to reload the index')
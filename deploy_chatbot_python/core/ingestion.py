@@ -0,0 +1,61 @@
+import os
+import multiprocessing
+from itertools import islice
+from typing import Iterable, Iterator, List
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from llama_index.core import Document, SimpleDirectoryReader
+
+from deploy_chatbot_python.config import constants
+from deploy_chatbot_python.logging.logger_instance import log
+
+
+def list_training_files(directory: os.PathLike) -> List[str]:
+    """Files `SimpleDirectoryReader` would read from `directory`, without parsing them"""
+    try:
+        reader = SimpleDirectoryReader(directory, recursive=True)
+    except ValueError:
+        if not os.path.isdir(directory):
+            raise
+        return []  # no (readable) files
+    return [str(path) for path in reader.input_files]
+
+
+def load_file(path: str) -> List[Document]:
+    # module-level so it can be pickled into the worker processes
+    return SimpleDirectoryReader(input_files=[path], filename_as_id=True).load_data()
+
+
+def iter_documents(files: List[str],
+                   num_workers: int = constants.INGESTION_NUM_WORKERS,
+                   max_in_flight: int = constants.INGESTION_MAX_IN_FLIGHT_FILES,
+                   min_files_for_pool: int = constants.INGESTION_MIN_FILES_FOR_POOL,
+                   ) -> Iterator[Document]:
+    """
+    Parse `files` in a process pool and yield their documents as they complete.
+    At most `max_in_flight` files are parsed or waiting to be consumed at any time,
+    so memory is bounded by the window rather than by the corpus size.
+    Each worker gets at least `min_files_for_pool` files, fewer are parsed in-process
+    """
+    num_workers = min(num_workers, len(files) // max(min_files_for_pool, 1))
+    if num_workers <= 1:
+        for path in files:
+            yield from load_file(path)
+        return
+
+    log.debug('Parsing %d files with %d workers', len(files), num_workers)
+    files_iter = iter(files)
+    with ProcessPoolExecutor(num_workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+        pending = {pool.submit(load_file, path) for path in islice(files_iter, max_in_flight)}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield from future.result()
+            pending |= {pool.submit(load_file, path) for path in islice(files_iter, len(done))}
+
+
+def iter_batches(documents: Iterable[Document],
+                 batch_size: int = constants.INGESTION_BATCH_SIZE) -> Iterator[List[Document]]:
+    documents = iter(documents)
+    while batch := list(islice(documents, batch_size)):
+        yield batch
@@ -0,0 +1,96 @@
+import time
+import threading
+from typing import Any, Dict
+
+from llama_index.core import Settings
+from llama_index.core.instrumentation import get_dispatcher
+from llama_index.core.instrumentation.event_handlers import BaseEventHandler
+from llama_index.core.instrumentation.events import BaseEvent
+from llama_index.core.instrumentation.events.embedding import (
+    EmbeddingEndEvent, EmbeddingStartEvent,
+)
+from llama_index.core.instrumentation.events.llm import (
+    LLMChatEndEvent, LLMChatStartEvent, LLMCompletionEndEvent, LLMCompletionStartEvent,
+)
+from llama_index.core.instrumentation.events.retrieval import (
+    RetrievalEndEvent, RetrievalStartEvent,
+)
+from llama_index.core.instrumentation.events.synthesis import (
+    SynthesizeEndEvent, SynthesizeStartEvent,
+)
+from llama_index.core.bridge.pydantic import PrivateAttr
+
+from deploy_chatbot_python.core import metrics
+
+
+MAX_OPEN_STAGES = 10000  # bounds the start times of stages whose end event never arrives
+
+STAGE_EVENTS = {
+    EmbeddingStartEvent: ('embedding', True),
+    EmbeddingEndEvent: ('embedding', False),
+    RetrievalStartEvent: ('retrieval', True),
+    RetrievalEndEvent: ('retrieval', False),
+    SynthesizeStartEvent: ('synthesis', True),
+    SynthesizeEndEvent: ('synthesis', False),
+    LLMCompletionStartEvent: ('llm', True),
+    LLMCompletionEndEvent: ('llm', False),
+    LLMChatStartEvent: ('llm', True),
+    LLMChatEndEvent: ('llm', False),
+}
+
+
+class MetricsEventHandler(BaseEventHandler):
+    """
+    Records llama-index stage latencies (start/end events of the same span), retrieved node
+    counts and LLM token usage into `core.metrics`
+    """
+    _stage_starts: Dict[str, float] = PrivateAttr(default_factory=dict)  # by span id
+    _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)  # events of any thread
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "MetricsEventHandler"
+
+    def handle(self, event: BaseEvent, **kwargs: Any) -> None:
+        stage_event = STAGE_EVENTS.get(type(event))
+        if stage_event is None:
+            return
+        stage, is_start = stage_event
+        now = time.perf_counter()
+        with self._lock:
+            if is_start:
+                if len(self._stage_starts) >= MAX_OPEN_STAGES:
+                    self._stage_starts.clear()
+                self._stage_starts[str(event.span_id)] = now
+                return
+            start = self._stage_starts.pop(str(event.span_id), None)
+        if start is not None:
+            metrics.QUERY_STAGE_SECONDS.observe(now - start, stage=stage)
+        if isinstance(event, RetrievalEndEvent):
+            metrics.RETRIEVED_NODES.observe(len(event.nodes))
+        elif isinstance(event, LLMCompletionEndEvent):
+            self._count_tokens(event.prompt, event.response.text, event.response.additional_kwargs)
+        elif isinstance(event, LLMChatEndEvent) and event.response is not None:
+            prompt = '\n'.join(str(message.content or '') for message in event.messages)
+            completion = str(event.response.message.content or '')
+            self._count_tokens(prompt, completion, event.response.additional_kwargs)
+
+    @staticmethod
+    def _count_tokens(prompt: str, completion: str, usage: Dict[str, Any]) -> None:
+        """Token usage reported by the API, or counted with the configured tokenizer"""
+        prompt_tokens = usage.get('prompt_tokens')
+        completion_tokens = usage.get('completion_tokens')
+        tokenizer = Settings.tokenizer
+        if prompt_tokens is None:
+            prompt_tokens = len(tokenizer(prompt))
+        if completion_tokens is None:
+            completion_tokens = len(tokenizer(completion or ''))
+        metrics.LLM_TOKENS.inc(prompt_tokens, kind='prompt')
+        metrics.LLM_TOKENS.inc(completion_tokens, kind='completion')
+
+
+def register_metrics_handler() -> None:
+    """Attach a `MetricsEventHandler` to the root llama-index dispatcher (once)"""
+    dispatcher = get_dispatcher()
+    if not any(isinstance(handler, MetricsEventHandler) for handler in dispatcher.event_handlers):
+        dispatcher.add_event_handler(MetricsEventHandler())
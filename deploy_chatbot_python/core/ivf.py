@@ -0,0 +1,100 @@
+import os
+from pathlib import Path
+from typing import Union
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from deploy_chatbot_python.config import constants
+from deploy_chatbot_python.logging.logger_instance import log
+
+
+def _normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+@dataclass
+class IVFIndex:
+    """
+    Inverted file index over unit-normalized vectors: a spherical k-means coarse quantizer
+    (`centroids`) and the list (centroid) each stored row is assigned to.
+    A search only scores the rows of the `nprobe` lists closest to the query.
+    """
+    centroids: np.ndarray
+    assignments: np.ndarray
+
+    _order: Union[np.ndarray, None] = field(default=None, init=False)
+    _offsets: Union[np.ndarray, None] = field(default=None, init=False)
+
+    @property
+    def num_lists(self) -> int:
+        return len(self.centroids)
+
+    @classmethod
+    def train(cls, vectors: np.ndarray,
+              num_lists: Union[int, None] = constants.IVF_NUM_LISTS,
+              iterations: int = constants.IVF_KMEANS_ITERATIONS,
+              sample_size: int = constants.IVF_TRAINING_SAMPLE_SIZE,
+              seed: int = 0) -> "IVFIndex":
+        """Cluster a sample of the stored `vectors` and assign all of them to their closest list"""
+        if num_lists is None:
+            num_lists = int(4 * np.sqrt(len(vectors)))
+        num_lists = max(1, min(num_lists, len(vectors)))
+        rng = np.random.default_rng(seed)
+        sample_rows = rng.choice(len(vectors), min(sample_size, len(vectors)), replace=False)
+        # renormalized: int8 rows are stored without their scales
+        sample = _normalize_rows(np.asarray(vectors[np.sort(sample_rows)], dtype=np.float32))
+        centroids = sample[rng.choice(len(sample), num_lists, replace=False)]
+        for _ in range(iterations):
+            labels = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, labels, sample)
+            empty = np.bincount(labels, minlength=num_lists) == 0
+            sums[empty] = centroids[empty]  # keep the previous centroid of an empty list
+            centroids = _normalize_rows(sums)
+        index = cls(centroids, np.empty(0, dtype=np.int32))
+        index.assignments = index.assign(vectors)
+        log.debug('Trained IVF index [lists: %d | vectors: %d | sample: %d]',
+                  num_lists, len(vectors), len(sample))
+        return index
+
+    def assign(self, vectors: np.ndarray) -> np.ndarray:
+        """List of each of the `vectors` (positive row scales do not change the assignment)"""
+        assignments = np.empty(len(vectors), dtype=np.int32)
+        block_rows = constants.VECTOR_SEARCH_BLOCK_ROWS
+        for start in range(0, len(vectors), block_rows):
+            block = np.asarray(vectors[start:start + block_rows], dtype=np.float32)
+            assignments[start:start + block_rows] = np.argmax(block @ self.centroids.T, axis=1)
+        return assignments
+
+    def append(self, vectors: np.ndarray) -> None:
+        self.assignments = np.concatenate([self.assignments, self.assign(vectors)])
+        self._order = self._offsets = None
+
+    def probe(self, query: np.ndarray, nprobe: int = constants.IVF_NPROBE) -> np.ndarray:
+        """Sorted rows of the `nprobe` lists whose centroids are closest to `query`"""
+        if self._order is None:
+            self._order = np.argsort(self.assignments, kind='stable')
+            self._offsets = np.searchsorted(
+                self.assignments[self._order], np.arange(self.num_lists + 1)
+            )
+        nprobe = min(nprobe, self.num_lists)
+        lists = np.argpartition(-(self.centroids @ query), nprobe - 1)[:nprobe]
+        rows = [self._order[self._offsets[i]:self._offsets[i + 1]] for i in lists]
+        # sorted rows read the memory-mapped matrix sequentially
+        return np.sort(np.concatenate(rows))
+
+    def save(self, path: Path) -> None:
+        tmp_path = Path(path).with_suffix('.tmp.npz')
+        np.savez(tmp_path, centroids=self.centroids, assignments=self.assignments)
+        os.replace(tmp_path, path)
+        log.debug('Saved IVF index at: \n%s\n', path)
+
+    @classmethod
+    def load(cls, path: Path) -> "IVFIndex":
+        with np.load(path) as data:
+            index = cls(data['centroids'], data['assignments'])
+        log.debug('Loaded IVF index at: \n%s\n', path)
+        return index
@@ -1,54 +1,282 @@
-from typing import Union
+import os
+from pathlib import Path
+from typing import Dict, List, Sequence, Set, Union
 from dataclasses import dataclass, field
 
-from llama_index.core import VectorStoreIndex, SimpleDirectoryReader
+from llama_index.core import VectorStoreIndex, Settings
 from llama_index.core.base.base_query_engine import BaseQueryEngine
-from llama_index.embeddings.openai import OpenAIEmbedding
-from llama_index.llms.openai import OpenAI
+from llama_index.core.base.embeddings.base import BaseEmbedding
+from llama_index.core.llms import LLM
+from llama_index.core.postprocessor.types import BaseNodePostprocessor
+from llama_index.core.indices.vector_store.retrievers import VectorIndexRetriever
+from llama_index.core.query_engine import RetrieverQueryEngine
+from llama_index.core.retrievers import BaseRetriever
 
 from deploy_chatbot_python.core.openai_params import OpenAIParams
+from deploy_chatbot_python.core.local_models import CrossEncoderReranker, LocalEmbedding
+from deploy_chatbot_python.core.embedding_cache import EmbeddingCache, CachedEmbedding
+from deploy_chatbot_python.core.embedding_batcher import EmbeddingBatcher
+from deploy_chatbot_python.core.bm25 import BM25Index
+from deploy_chatbot_python.core.dedup import ChunkDeduplicator
+from deploy_chatbot_python.core.hybrid_retriever import HybridRetriever
+from deploy_chatbot_python.core.instrumentation import register_metrics_handler
+from deploy_chatbot_python.core.ingestion import iter_batches, iter_documents, list_training_files
+from deploy_chatbot_python.core.storage import create_storage_context
+from deploy_chatbot_python.core.vector_store import MemmapVectorStore
 from deploy_chatbot_python.config import constants
 from deploy_chatbot_python.logging.logger_instance import log
 
 
 @dataclass
-class LlamaIndexer:
+class LlamaIndexer:  # pylint: disable=too-many-instance-attributes
     index: Union[VectorStoreIndex, None] = field(default=None, init=False)
     query_engine: Union[BaseQueryEngine, None] = field(default=None, init=False)
-    llm: Union[OpenAI, None] = field(default=None, init=False)
-    embedding_model: Union[OpenAIEmbedding, None] = field(default=None, init=False)
+    streaming_query_engine: Union[BaseQueryEngine, None] = field(default=None, init=False)
+    llm: Union[LLM, None] = field(default=None, init=False)
+    embedding_model: Union[BaseEmbedding, None] = field(default=None, init=False)
+    embedding_model_id: str = field(default='', init=False)  # the index is only valid for it
+    embedding_cache: Union[EmbeddingCache, None] = field(default=None, init=False)
+    query_embedding_batcher: Union[EmbeddingBatcher, None] = field(default=None, init=False)
+    lexical_index: Union[BM25Index, None] = field(default=None, init=False)
+    reranker: Union[BaseNodePostprocessor, None] = field(default=None, init=False)
+    # file path: the files holding the kept copies of its dropped duplicate chunks
+    duplicate_of: Dict[str, Set[str]] = field(default_factory=dict, init=False)
 
     def __post_init__(self):
-        openai_params = OpenAIParams.from_config_yaml()
-        self._initialize_models_from_params(openai_params)
+        if constants.RETRIEVAL_MODE not in ('vector', 'hybrid', 'lexical_first'):
+            raise ValueError(f"Unknown retrieval mode: {constants.RETRIEVAL_MODE}")
+        if constants.CHUNK_DEDUP not in (None, 'exact', 'near'):
+            raise ValueError(f"Unknown chunk dedup mode: {constants.CHUNK_DEDUP}")
+        if constants.USE_FAKE_MODELS:
+            self._initialize_fake_models()
+        else:
+            openai_params = OpenAIParams.from_config_yaml()
+            self._initialize_models_from_params(openai_params)
+        self.embedding_model_id = self._get_embedding_model_id(self.embedding_model)
+        if constants.QUERY_EMBEDDING_BATCHING:
+            # the uncached model, questions are not worth keeping in the embedding cache
+            self.query_embedding_batcher = EmbeddingBatcher(self.embedding_model)
+        if constants.EMBEDDING_CACHE_ENABLED:
+            self._enable_embedding_cache()
+        if constants.METRICS_ENABLED:
+            register_metrics_handler()
 
     def _initialize_models_from_params(self, params: OpenAIParams) -> None:
+        # pylint: disable=import-outside-toplevel  # the OpenAI SDK is only imported when used
+        from llama_index.embeddings.openai import OpenAIEmbedding
+        from llama_index.llms.openai import OpenAI
+
+        params.validate_api_key()  # the LLM is always OpenAI's, only retrieval can be local
         self.llm = OpenAI(model=params.model, temperature=params.temperature)
-        self.embedding_model = OpenAIEmbedding(model=params.embedding_model)
+        if params.embedding_backend == 'local':
+            self.embedding_model = LocalEmbedding(model_name=params.local_embedding_model)
+        else:
+            self.embedding_model = OpenAIEmbedding(
+                model=params.embedding_model,
+                embed_batch_size=constants.EMBEDDING_BATCH_SIZE,
+            )
+        if params.reranker_model is not None:
+            self.reranker = CrossEncoderReranker(
+                model_name=params.reranker_model, top_n=params.rerank_top_n
+            )
+            log.info('Reranking %d candidates with: %s',
+                     constants.RERANK_NUM_CANDIDATES, params.reranker_model)
         log.info('Initialized Llama indexer [LLM: %s | Embedding Model: %s]',
                     self.llm.model, self.embedding_model.model_name)
 
-    def build_query_pipeline(self) -> None:
-        self._build_index()
+    def _initialize_fake_models(self) -> None:
+        # pylint: disable=import-outside-toplevel  # only used offline
+        from deploy_chatbot_python.core.fake_models import FakeEmbedding, FakeLLM
+
+        self.llm = FakeLLM(latency=constants.FAKE_LLM_LATENCY_SECONDS)
+        self.embedding_model = FakeEmbedding(
+            embed_dim=constants.FAKE_EMBEDDING_DIM,
+            latency=constants.FAKE_EMBEDDING_LATENCY_SECONDS,
+        )
+        log.info('Initialized Llama indexer with fake models [LLM: %s | Embedding Model: %s]',
+                 self.llm.model, self.embedding_model.model_name)
+
+    @staticmethod
+    def _get_embedding_model_id(embedding_model: BaseEmbedding) -> str:
+        """Class, name and dimension (if the model declares it) of the embedding model"""
+        model_id = f"{embedding_model.class_name()}:{embedding_model.model_name}"
+        dim = (
+            getattr(embedding_model, 'embed_dim', None)
+            or getattr(embedding_model, 'dimensions', None)  # OpenAI's reduced dimensions
+        )
+        return f"{model_id}:{dim}" if dim else model_id
+
+    def get_embedding_dim(self) -> Union[int, None]:
+        """Dimension of the indexed vectors, None if there are none"""
+        if self.index is None:
+            raise ValueError("Index is invalid.")
+        vector_store = self.index.vector_store
+        if isinstance(vector_store, MemmapVectorStore):
+            return int(vector_store.vectors.shape[1]) if vector_store.num_vectors else None
+        embeddings = vector_store.data.embedding_dict  # llama-index `SimpleVectorStore`
+        return len(next(iter(embeddings.values()))) if embeddings else None
+
+    def _enable_embedding_cache(self) -> None:
+        self.embedding_cache = EmbeddingCache(
+            model_name=self.embedding_model_id,
+            cache_dir=constants.EMBEDDING_CACHE_PATH,
+        )
+        self.embedding_model = CachedEmbedding(self.embedding_model, self.embedding_cache)
+
+    def _save_embedding_cache(self) -> None:
+        if self.embedding_cache is not None:
+            self.embedding_cache.save()
+
+    def build_query_pipeline(self, training_data_path: Union[Path, None] = None) -> None:
+        self._build_index(training_data_path or constants.TRAINING_DATA_PATH)
         self.set_query_engine()
 
-    def _build_index(self) -> None:
-        documents = SimpleDirectoryReader(
-            constants.TRAINING_DATA_PATH,
-            recursive=True
-        ).load_data()
-        self.index = VectorStoreIndex.from_documents(
-            documents=documents,
+    def _build_index(self, training_data_path: Path) -> None:
+        self.index = VectorStoreIndex(
+            nodes=[],
             embed_model=self.embedding_model,
+            storage_context=create_storage_context(),
         )
+        if constants.RETRIEVAL_MODE != 'vector':
+            self.lexical_index = BM25Index()
+        self.insert_files(list_training_files(training_data_path))
+        self._build_ann_index()
         log.debug('Built index')
 
+    def _build_ann_index(self) -> None:
+        if constants.ANN_INDEX is None:
+            return
+        if constants.ANN_INDEX != 'ivf':
+            raise ValueError(f"Unknown ANN index: {constants.ANN_INDEX}")
+        vector_store = self.index.vector_store
+        if not isinstance(vector_store, MemmapVectorStore):
+            log.warning('ANN index requires the memmap vector store backend, using exact search')
+            return
+        if vector_store.num_vectors < constants.ANN_MIN_VECTORS:
+            log.debug('Index is too small for an ANN index, using exact search')
+            return
+        vector_store.build_ivf_index()
+        log.info('Built IVF index [lists: %d | nprobe: %d]',
+                 vector_store.ivf_index.num_lists, vector_store.nprobe)
+
+    def insert_files(self, files: List[str], indexed_node_ids: Sequence[str] = ()) -> None:
+        """
+        Parse, chunk, embed and insert `files` as a stream of bounded document batches.
+        Chunks duplicating an earlier chunk of `files`, or an indexed node of `indexed_node_ids`,
+        are dropped before they are embedded
+        """
+        if self.index is None:
+            raise ValueError("Index is invalid.")
+        if not files:
+            return
+        num_documents = num_nodes = 0
+        deduplicator = None
+        if constants.CHUNK_DEDUP is not None:
+            deduplicator = ChunkDeduplicator(near_duplicates=constants.CHUNK_DEDUP == 'near')
+            deduplicator.add(self.index.docstore.get_nodes(list(indexed_node_ids)))
+        documents_iter = iter_documents(files, num_workers=constants.INGESTION_NUM_WORKERS,
+                                        min_files_for_pool=constants.INGESTION_MIN_FILES_FOR_POOL)
+        for documents in iter_batches(documents_iter):
+            nodes = Settings.node_parser.get_nodes_from_documents(documents)
+            if deduplicator is not None:
+                nodes = deduplicator.filter(nodes)
+            self.index.insert_nodes(nodes)
+            if self.lexical_index is not None:
+                self.lexical_index.add(nodes)
+            for document in documents:
+                self.index.docstore.set_document_hash(document.id_, document.hash)
+            num_documents += len(documents)
+            num_nodes += len(nodes)
+            log.debug('Inserted batch of %d documents (%d nodes)', len(documents), len(nodes))
+        self._save_embedding_cache()
+        for path in files:
+            self.duplicate_of.pop(path, None)
+        if deduplicator is not None:
+            self.duplicate_of.update(deduplicator.duplicate_of)
+        log.debug('Inserted %d documents (%d nodes) from %d files',
+                  num_documents, num_nodes, len(files))
+        if deduplicator is not None and deduplicator.num_dropped:
+            log.info('Dropped duplicate chunks [exact: %d | near: %d | kept: %d]',
+                     deduplicator.num_exact, deduplicator.num_near, num_nodes)
+
+    def delete_documents(self, doc_ids: List[str]) -> None:
+        if self.index is None:
+            raise ValueError("Index is invalid.")
+        if self.lexical_index is not None:
+            ref_doc_infos = [self.index.docstore.get_ref_doc_info(doc_id) for doc_id in doc_ids]
+            self.lexical_index.delete(
+                node_id for info in ref_doc_infos if info is not None for node_id in info.node_ids
+            )
+        for doc_id in doc_ids:
+            self.index.delete_ref_doc(doc_id, delete_from_docstore=True)
+        log.debug('Deleted %d documents', len(doc_ids))
+
+    def get_file_nodes(self) -> Dict[str, Dict[str, List[str]]]:
+        """Map each source file path to the IDs of its documents and nodes in the index"""
+        if self.index is None:
+            raise ValueError("Index is invalid.")
+        file_nodes: Dict[str, Dict[str, List[str]]] = {}
+        ref_doc_infos = self.index.docstore.get_all_ref_doc_info() or {}
+        for doc_id, ref_doc_info in ref_doc_infos.items():
+            file_path = ref_doc_info.metadata.get('file_path')
+            if file_path is None:
+                continue
+            nodes = file_nodes.setdefault(file_path, {'doc_ids': [], 'node_ids': []})
+            nodes['doc_ids'].append(doc_id)
+            nodes['node_ids'].extend(ref_doc_info.node_ids)
+        return file_nodes
+
+    def save_lexical_index(self, persist_dir: Path) -> None:
+        path = Path(persist_dir) / constants.BM25_INDEX_FNAME
+        if self.lexical_index is not None:
+            self.lexical_index.save(path)
+        elif os.path.exists(path):
+            os.remove(path)  # outdated by the changes persisted without it
+
+    def load_lexical_index(self, persist_dir: Path) -> None:
+        """Load the persisted BM25 index, or build it from the docstore if there is none"""
+        if constants.RETRIEVAL_MODE == 'vector':
+            self.lexical_index = None
+            return
+        path = Path(persist_dir) / constants.BM25_INDEX_FNAME
+        if os.path.exists(path):
+            self.lexical_index = BM25Index.load(path)
+            return
+        self.lexical_index = BM25Index()
+        self.lexical_index.add(self.index.docstore.docs.values())
+        log.info('Built BM25 index of %d persisted nodes', self.lexical_index.num_nodes)
+
+    def _create_retriever(self) -> BaseRetriever:
+        # no `node_ids` restriction, so the vector store searches all of its rows directly
+        top_k = (
+            constants.SIMILARITY_TOP_K if self.reranker is None
+            else constants.RERANK_NUM_CANDIDATES  # narrowed down by the reranker
+        )
+        if self.lexical_index is None:
+            return VectorIndexRetriever(self.index, similarity_top_k=top_k)
+        batcher = self.query_embedding_batcher
+        return HybridRetriever(
+            VectorIndexRetriever(self.index, similarity_top_k=constants.HYBRID_NUM_CANDIDATES),
+            self.lexical_index,
+            self.index.docstore,
+            similarity_top_k=top_k,
+            lexical_first=constants.RETRIEVAL_MODE == 'lexical_first',
+            aget_query_embedding=batcher.aget_query_embedding if batcher is not None else None,
+        )
+
     def set_query_engine(self) -> None:
         if self.index is None:
             raise ValueError("Index is invalid.")
         if self.query_engine is not None:
             log.debug('Query engine is already set')
-        self.query_engine = self.index.as_query_engine(llm=self.llm)
+        retriever = self._create_retriever()
+        node_postprocessors = [self.reranker] if self.reranker is not None else None
+        self.query_engine = RetrieverQueryEngine.from_args(
+            retriever, llm=self.llm, node_postprocessors=node_postprocessors
+        )
+        self.streaming_query_engine = RetrieverQueryEngine.from_args(
+            retriever, llm=self.llm, streaming=True, node_postprocessors=node_postprocessors
+        )
         log.debug('Built query engine')
 
 
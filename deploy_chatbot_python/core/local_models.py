@@ -0,0 +1,134 @@
+import asyncio
+import functools
+from typing import Any, Callable, List, Optional, TypeVar
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from llama_index.core.base.embeddings.base import BaseEmbedding, Embedding
+from llama_index.core.bridge.pydantic import Field, PrivateAttr
+from llama_index.core.postprocessor.types import BaseNodePostprocessor
+from llama_index.core.schema import NodeWithScore, QueryBundle
+
+from deploy_chatbot_python.core import metrics
+from deploy_chatbot_python.config import constants
+from deploy_chatbot_python.logging.logger_instance import log
+
+
+T = TypeVar('T')
+
+# torch releases the GIL during inference, so a few threads keep the event loop free without
+# copying the models into worker processes
+_inference_pool = ThreadPoolExecutor(constants.LOCAL_INFERENCE_WORKERS,
+                                     thread_name_prefix='local-inference')
+
+
+async def _run_inference(function: Callable[..., T], *args: Any) -> T:
+    return await asyncio.get_running_loop().run_in_executor(_inference_pool, function, *args)
+
+
+@functools.lru_cache(maxsize=constants.LOCAL_MODEL_CACHE_SIZE)
+def load_sentence_transformer(model_name: str) -> Any:
+    # pylint: disable=import-outside-toplevel  # torch is only imported when a local model is used
+    from sentence_transformers import SentenceTransformer
+
+    log.info('Loading local embedding model: %s', model_name)
+    return SentenceTransformer(model_name, device='cpu')
+
+
+@functools.lru_cache(maxsize=constants.LOCAL_MODEL_CACHE_SIZE)
+def load_cross_encoder(model_name: str) -> Any:
+    # pylint: disable=import-outside-toplevel  # torch is only imported when a local model is used
+    from sentence_transformers import CrossEncoder
+
+    log.info('Loading local reranker model: %s', model_name)
+    return CrossEncoder(model_name, device='cpu')
+
+
+class LocalEmbedding(BaseEmbedding):
+    """
+    `sentence_transformers` embedding model run on the CPU, texts are encoded in batches of
+    `embed_batch_size` and the async methods run in the local inference thread pool
+    """
+
+    _model: Any = PrivateAttr()
+
+    def __init__(self, **kwargs: Any) -> None:
+        kwargs.setdefault('embed_batch_size', constants.LOCAL_EMBEDDING_BATCH_SIZE)
+        super().__init__(**kwargs)
+        self._model = load_sentence_transformer(self.model_name)
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "LocalEmbedding"
+
+    def _encode(self, texts: List[str]) -> List[Embedding]:
+        vectors = self._model.encode(
+            texts,
+            batch_size=self.embed_batch_size,
+            normalize_embeddings=True,
+            convert_to_numpy=True,
+        )
+        return np.asarray(vectors, dtype=np.float32).tolist()
+
+    def _get_query_embedding(self, query: str) -> Embedding:
+        return self._encode([query])[0]
+
+    async def _aget_query_embedding(self, query: str) -> Embedding:
+        return (await _run_inference(self._encode, [query]))[0]
+
+    async def aget_query_embedding_batch(self, queries: List[str]) -> List[Embedding]:
+        """Query embeddings of `queries` in one inference call"""
+        return await _run_inference(self._encode, queries)
+
+    def _get_text_embedding(self, text: str) -> Embedding:
+        return self._encode([text])[0]
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[Embedding]:
+        return self._encode(texts)
+
+    async def _aget_text_embeddings(self, texts: List[str]) -> List[Embedding]:
+        return await _run_inference(self._encode, texts)
+
+
+class CrossEncoderReranker(BaseNodePostprocessor):
+    """
+    Rescores the retrieved nodes with a `sentence_transformers` cross-encoder run on the CPU and
+    keeps the `top_n` best, so a wide retrieval sends only a few nodes to the LLM
+    """
+    model_name: str = Field(description="Cross-encoder model name or path")
+    top_n: int = Field(default=constants.SIMILARITY_TOP_K, gt=0)
+    batch_size: int = Field(default=constants.LOCAL_EMBEDDING_BATCH_SIZE, gt=0)
+
+    _model: Any = PrivateAttr()
+
+    def __init__(self, **kwargs: Any) -> None:
+        super().__init__(**kwargs)
+        self._model = load_cross_encoder(self.model_name)
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "CrossEncoderReranker"
+
+    def _postprocess_nodes(
+        self,
+        nodes: List[NodeWithScore],
+        query_bundle: Optional[QueryBundle] = None,
+    ) -> List[NodeWithScore]:
+        if query_bundle is None:
+            raise ValueError("Reranking requires the query.")
+        if not nodes:
+            return []
+        with metrics.QUERY_STAGE_SECONDS.time(stage='rerank'):
+            scores = self._model.predict(
+                [(query_bundle.query_str, node.node.get_content()) for node in nodes],
+                batch_size=self.batch_size,
+            )
+        ranked = sorted(zip(nodes, np.asarray(scores).tolist()), key=lambda pair: -pair[1])
+        return [NodeWithScore(node=node.node, score=score) for node, score in ranked[:self.top_n]]
+
+    async def _apostprocess_nodes(
+        self,
+        nodes: List[NodeWithScore],
+        query_bundle: Optional[QueryBundle] = None,
+    ) -> List[NodeWithScore]:
+        return await _run_inference(self._postprocess_nodes, nodes, query_bundle)
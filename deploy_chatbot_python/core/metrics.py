@@ -0,0 +1,225 @@
+import time
+import bisect
+import inspect
+import functools
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Sequence, Tuple
+
+from deploy_chatbot_python.config import constants
+
+
+LabelValues = Tuple[str, ...]
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+COUNT_BUCKETS = (0, 1, 2, 4, 8, 16, 32, 64, 128)
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ''
+    pairs = ','.join(f'{name}="{_escape(str(value))}"' for name, value in zip(names, values))
+    return f'{{{pairs}}}'
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if value != float('inf') else '+Inf'
+
+
+class _Metric:  # pylint: disable=too-few-public-methods
+    metric_type = ''
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._lock = threading.Lock()
+
+    def _label_values(self, labels: Dict[str, str]) -> LabelValues:
+        if set(labels) != set(self.label_names):
+            raise ValueError(f"Metric {self.name} expects labels {self.label_names}, got {labels}")
+        return tuple(str(labels[name]) for name in self.label_names)
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        header = [
+            f'# HELP {self.name} {self.documentation}',
+            f'# TYPE {self.name} {self.metric_type}',
+        ]
+        return '\n'.join(header + self._samples())
+
+
+class Counter(_Metric):
+    metric_type = 'counter'
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._label_values(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._label_values(labels), 0.0)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            values = list(self._values.items())
+        return [
+            f'{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}'
+            for key, value in values
+        ]
+
+
+class Gauge(Counter):
+    metric_type = 'gauge'
+
+    def set(self, value: float, **labels: str) -> None:
+        key = self._label_values(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(_Metric):
+    metric_type = 'histogram'
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS) -> None:
+        super().__init__(name, documentation, label_names)
+        self.buckets = tuple(sorted(buckets))
+        # label values: (per-bucket counts, incl. +Inf, sum)
+        self._values: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._label_values(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._values.setdefault(key, ([0] * (len(self.buckets) + 1), [0.0]))
+            counts[index] += 1
+            total[0] += value
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def timed(self, **labels: str) -> Callable:
+        """Decorator observing the duration of a function, coroutine or async generator"""
+        def decorator(function: Callable) -> Callable:
+            if inspect.isasyncgenfunction(function):
+                @functools.wraps(function)
+                async def async_generator_wrapper(*args, **kwargs):
+                    with self.time(**labels):
+                        async for item in function(*args, **kwargs):
+                            yield item
+                return async_generator_wrapper
+            if inspect.iscoroutinefunction(function):
+                @functools.wraps(function)
+                async def coroutine_wrapper(*args, **kwargs):
+                    with self.time(**labels):
+                        return await function(*args, **kwargs)
+                return coroutine_wrapper
+
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                with self.time(**labels):
+                    return function(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def count(self, **labels: str) -> int:
+        counts, _ = self._values.get(self._label_values(labels), ([0], [0.0]))
+        return sum(counts)
+
+    def _samples(self) -> List[str]:
+        names = self.label_names + ('le',)
+        samples = []
+        with self._lock:
+            values = [
+                (key, list(counts), total[0]) for key, (counts, total) in self._values.items()
+            ]
+        for key, counts, total in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                labels = _format_labels(names, key + (_format_value(bound),))
+                samples.append(f'{self.name}_bucket{labels} {cumulative}')
+            labels = _format_labels(self.label_names, key)
+            samples.append(f'{self.name}_sum{labels} {_format_value(total)}')
+            samples.append(f'{self.name}_count{labels} {cumulative}')
+        return samples
+
+
+class MetricsRegistry:
+    """Process-wide metrics, rendered in the Prometheus text exposition format"""
+    content_type = 'text/plain; version=0.0.4; charset=utf-8'
+
+    def __init__(self) -> None:
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        return '\n'.join(metric.render() for metric in self._metrics.values()) + '\n'
+
+
+REGISTRY = MetricsRegistry()
+_PREFIX = constants.METRICS_PREFIX
+
+HTTP_REQUEST_SECONDS = REGISTRY.register(Histogram(
+    f'{_PREFIX}_http_request_seconds', 'Time to the response start of API requests',
+    ['method', 'path', 'status'],
+))
+QUERY_SECONDS = REGISTRY.register(Histogram(
+    f'{_PREFIX}_query_seconds', 'End-to-end IndexManager query latency', ['mode'],
+))
+QUERY_STAGE_SECONDS = REGISTRY.register(Histogram(
+    f'{_PREFIX}_query_stage_seconds',
+    'Latency of the embedding, retrieval, rerank, synthesis and llm stages', ['stage'],
+))
+RETRIEVED_NODES = REGISTRY.register(Histogram(
+    f'{_PREFIX}_retrieved_nodes', 'Nodes returned per retrieval', buckets=COUNT_BUCKETS,
+))
+LLM_TOKENS = REGISTRY.register(Counter(
+    f'{_PREFIX}_llm_tokens_total', 'LLM prompt and completion tokens', ['kind'],
+))
+INDEX_OPERATION_SECONDS = REGISTRY.register(Histogram(
+    f'{_PREFIX}_index_operation_seconds', 'Duration of index build, update, persist and load',
+    ['operation'],
+))
+DEDUPLICATED_CHUNKS = REGISTRY.register(Counter(
+    f'{_PREFIX}_deduplicated_chunks_total',
+    'Chunks dropped as exact or near-duplicates at ingestion', ['kind'],
+))
+RESIDENT_NAMESPACES = REGISTRY.register(Gauge(
+    f'{_PREFIX}_resident_namespaces', 'Named indexes currently loaded',
+))
+RETRIEVALS = REGISTRY.register(Counter(
+    f'{_PREFIX}_hybrid_retrievals_total',
+    'Hybrid retrievals answered from BM25 alone (lexical) or from fused scores (hybrid)',
+    ['path'],
+))
+SHED_REQUESTS = REGISTRY.register(Counter(
+    f'{_PREFIX}_shed_requests_total',
+    'Queries rejected (queue_full, queue_timeout), timed out (deadline) or cancelled (disconnect)',
+    ['reason'],
+))
+CACHE_LOOKUPS = REGISTRY.register(Counter(
+    f'{_PREFIX}_cache_lookups_total', 'Response and embedding cache lookups by result',
+    ['cache', 'result'],
+))
@@ -1,7 +1,8 @@
 from dataclasses import dataclass
+from typing import Union
 import os
-import yaml
 
+from deploy_chatbot_python.config import constants
 from deploy_chatbot_python.config.constants import CONFIG_PATH
 from deploy_chatbot_python.logging.logger_instance import log
 
@@ -11,18 +12,26 @@ class OpenAIParams:
     model: str
     embedding_model: str
     temperature: float
+    embedding_backend: str = 'openai'  # 'openai' or 'local' (`local_embedding_model` on the CPU)
+    local_embedding_model: str = constants.LOCAL_EMBEDDING_MODEL
+    reranker_model: Union[str, None] = None  # local cross-encoder reranking the retrieved nodes
+    rerank_top_n: int = constants.SIMILARITY_TOP_K
 
     def __post_init__(self) -> None:
-        self.validate_api_key()
+        if self.embedding_backend not in ('openai', 'local'):
+            raise ValueError(f"Unknown embedding backend: {self.embedding_backend}")
 
     @classmethod
     def from_config_yaml(cls) -> "OpenAIParams":
+        import yaml  # pylint: disable=import-outside-toplevel  # only needed to read the config
+
         with open(CONFIG_PATH, "r", encoding='utf-8') as file:
             config = yaml.safe_load(file)
         return cls(**config['openai'])
 
     @staticmethod
     def validate_api_key() -> None:
+        """Required by the OpenAI models only, checked when one is created"""
         api_key = os.getenv("OPENAI_API_KEY")
         if api_key is None:
             raise ValueError("API key not found. Please set `OPENAI_API_KEY` env variable.")
@@ -0,0 +1,100 @@
+import os
+import re
+import time
+import random
+import inspect
+import cProfile
+import functools
+import threading
+from pathlib import Path
+from contextlib import contextmanager
+from typing import Callable, Iterator, Union
+from dataclasses import dataclass, field
+
+from deploy_chatbot_python.config import constants
+from deploy_chatbot_python.logging.logger_instance import log
+
+
+@dataclass
+class RequestProfiler:
+    """
+    Runs selected calls under `cProfile` and writes their stats (pstats `.prof` files, readable by
+    `pstats`, snakeviz or speedscope) to `output_dir`, keeping the newest `max_files`.
+    A call is profiled when requested, or at random with probability `sample_rate`. Only one
+    call is profiled at a time, it includes whatever else runs on its thread meanwhile
+    """
+    enabled: bool = constants.PROFILING_ENABLED
+    sample_rate: float = constants.PROFILING_SAMPLE_RATE
+    output_dir: Path = constants.PROFILES_DIR_PATH
+    max_files: int = constants.PROFILING_MAX_FILES
+
+    _lock: threading.Lock = field(default_factory=threading.Lock, init=False)
+
+    def should_profile(self, requested: bool = False) -> bool:
+        return self.enabled and (requested or random.random() < self.sample_rate)
+
+    @contextmanager
+    def profile(self, name: str) -> Iterator[Union[Path, None]]:
+        """Profile the block, yields the stats file path (None if another block is profiled)"""
+        if not self._lock.acquire(blocking=False):
+            yield None
+            return
+        slug = re.sub(r'[^\w.-]+', '_', name)
+        path = Path(self.output_dir) / f"{time.time_ns()}-{slug}.prof"
+        stats = cProfile.Profile()
+        stats.enable()
+        try:
+            yield path
+        finally:
+            stats.disable()
+            self._lock.release()
+            self._save(stats, path)
+
+    def _save(self, stats: cProfile.Profile, path: Path) -> None:
+        os.makedirs(path.parent, exist_ok=True)
+        stats.dump_stats(path)
+        log.info('Saved profile at: \n%s\n', path)
+        profiles = sorted(path.parent.glob('*.prof'))
+        for stale_path in profiles[:max(len(profiles) - self.max_files, 0)]:
+            os.remove(stale_path)
+
+
+profiler = RequestProfiler()
+
+
+def profiled(name: str, request_profiler: RequestProfiler = profiler) -> Callable:
+    """
+    Decorator sampling calls of a function, coroutine or async generator into `request_profiler`,
+    the function is unchanged if disabled
+    """
+    def decorator(function: Callable) -> Callable:
+        if not request_profiler.enabled:
+            return function
+        if inspect.isasyncgenfunction(function):
+            @functools.wraps(function)
+            async def async_generator_wrapper(*args, **kwargs):
+                if not request_profiler.should_profile():
+                    async for item in function(*args, **kwargs):
+                        yield item
+                    return
+                with request_profiler.profile(name):
+                    async for item in function(*args, **kwargs):
+                        yield item
+            return async_generator_wrapper
+        if inspect.iscoroutinefunction(function):
+            @functools.wraps(function)
+            async def coroutine_wrapper(*args, **kwargs):
+                if not request_profiler.should_profile():
+                    return await function(*args, **kwargs)
+                with request_profiler.profile(name):
+                    return await function(*args, **kwargs)
+            return coroutine_wrapper
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not request_profiler.should_profile():
+                return function(*args, **kwargs)
+            with request_profiler.profile(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,189 @@
+import os
+import re
+import json
+import time
+import threading
+from pathlib import Path
+from collections import OrderedDict
+from typing import Dict, List, Tuple, Union
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from deploy_chatbot_python.core import metrics
+from deploy_chatbot_python.config import constants
+from deploy_chatbot_python.logging.logger_instance import log
+
+
+CacheKey = Tuple[str, str]  # (training data hash, normalized question)
+
+
+@dataclass
+class _CacheEntry:
+    response: str
+    created_at: float
+    embedding: Union[np.ndarray, None] = None
+
+
+@dataclass
+class ResponseCache:  # pylint: disable=too-many-instance-attributes
+    """
+    LRU/TTL cache of query responses with an exact tier (normalized question text) and an optional
+    semantic tier (cosine similarity of question embeddings >= `similarity_threshold`).
+    Keys include the training data hash, so responses of a previous index version are never served.
+    """
+    max_size: int = constants.RESPONSE_CACHE_MAX_SIZE
+    ttl: Union[float, None] = constants.RESPONSE_CACHE_TTL
+    similarity_threshold: Union[float, None] = constants.RESPONSE_CACHE_SIMILARITY_THRESHOLD
+    persist_path: Union[Path, None] = None
+
+    hits: int = field(default=0, init=False)
+    semantic_hits: int = field(default=0, init=False)
+    misses: int = field(default=0, init=False)
+    _entries: "OrderedDict[CacheKey, _CacheEntry]" = field(default_factory=OrderedDict, init=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, init=False)
+
+    def __post_init__(self):
+        self.load()
+
+    @property
+    def is_semantic(self) -> bool:
+        return self.similarity_threshold is not None
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        text = re.sub(r"\s+", " ", text.strip().lower())
+        return text.rstrip(" ?!.")
+
+    def _is_expired(self, entry: _CacheEntry, now: float) -> bool:
+        return self.ttl is not None and now - entry.created_at > self.ttl
+
+    def _get_exact(self, key: CacheKey, now: float) -> Union[str, None]:
+        entry = self._entries.get(key)
+        if entry is not None and self._is_expired(entry, now):
+            del self._entries[key]
+            entry = None
+        if entry is None:
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        metrics.CACHE_LOOKUPS.inc(cache='response', result='hit')
+        return entry.response
+
+    def get_exact(self, question: str, data_hash: str) -> Union[str, None]:
+        """
+        Exact tier only, a miss is not counted: on a miss, `get` follows with the question
+        embedding, so the question is only embedded when the exact tier cannot answer it
+        """
+        with self._lock:
+            return self._get_exact((data_hash, self.normalize(question)), time.time())
+
+    def get(self, question: str, data_hash: str,
+            embedding: Union[List[float], None] = None) -> Union[str, None]:
+        """Cached response for `question` or None. `embedding` enables the semantic tier"""
+        key = (data_hash, self.normalize(question))
+        now = time.time()
+        with self._lock:
+            response = self._get_exact(key, now)
+            if response is not None:
+                return response
+            if embedding is not None and self.is_semantic:
+                key = self._most_similar_key(data_hash, np.asarray(embedding, np.float32), now)
+                if key is not None:
+                    self._entries.move_to_end(key)
+                    self.semantic_hits += 1
+                    metrics.CACHE_LOOKUPS.inc(cache='response', result='semantic_hit')
+                    return self._entries[key].response
+            self.misses += 1
+            metrics.CACHE_LOOKUPS.inc(cache='response', result='miss')
+            return None
+
+    def _most_similar_key(self, data_hash: str, embedding: np.ndarray,
+                          now: float) -> Union[CacheKey, None]:
+        keys, vectors = [], []
+        for key, entry in self._entries.items():
+            if key[0] == data_hash and entry.embedding is not None \
+                    and not self._is_expired(entry, now):
+                keys.append(key)
+                vectors.append(entry.embedding)
+        if not keys:
+            return None
+        matrix = np.stack(vectors)
+        similarities = matrix @ embedding / (
+            np.linalg.norm(matrix, axis=1) * np.linalg.norm(embedding) + 1e-12
+        )
+        best = int(np.argmax(similarities))
+        return keys[best] if similarities[best] >= self.similarity_threshold else None
+
+    def put(self, question: str, data_hash: str, response: str,
+            embedding: Union[List[float], None] = None) -> None:
+        if self.max_size <= 0:
+            return
+        key = (data_hash, self.normalize(question))
+        vector = np.asarray(embedding, np.float32) if embedding is not None else None
+        with self._lock:
+            self._entries[key] = _CacheEntry(response, time.time(), vector)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def purge_stale(self, data_hash: str) -> None:
+        """Drop entries that were cached for another version of the training data"""
+        with self._lock:
+            for key in [key for key in self._entries if key[0] != data_hash]:
+                del self._entries[key]
+
+    @property
+    def stats(self) -> Dict[str, Union[int, float]]:
+        lookups = self.hits + self.semantic_hits + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits + self.semantic_hits) / lookups if lookups else 0.0,
+        }
+
+    @property
+    def _embeddings_path(self) -> Path:
+        return self.persist_path.with_suffix('.npy')
+
+    def load(self) -> None:
+        if self.persist_path is None or not os.path.exists(self.persist_path):
+            return
+        with open(self.persist_path, "r", encoding='utf-8') as file:
+            records = json.load(file)
+        embeddings = (
+            np.load(self._embeddings_path) if os.path.exists(self._embeddings_path) else None
+        )
+        for record in records:
+            row = record.pop('embedding_row')
+            embedding = embeddings[row] if embeddings is not None and row is not None else None
+            key = (record.pop('data_hash'), record.pop('question'))
+            self._entries[key] = _CacheEntry(embedding=embedding, **record)
+        log.debug('Loaded %d cached responses from: \n%s\n', len(self._entries), self.persist_path)
+
+    def save(self) -> None:
+        if self.persist_path is None:
+            return
+        records, embeddings = [], []
+        with self._lock:
+            for (data_hash, question), entry in self._entries.items():
+                row = None
+                if entry.embedding is not None:
+                    row = len(embeddings)
+                    embeddings.append(entry.embedding)
+                records.append({
+                    'data_hash': data_hash, 'question': question, 'response': entry.response,
+                    'created_at': entry.created_at, 'embedding_row': row,
+                })
+        # write-then-rename, several API workers may save the same cache
+        tmp_path = self.persist_path.with_suffix('.tmp')
+        with open(tmp_path, "w", encoding='utf-8') as file:
+            json.dump(records, file)
+        if embeddings:
+            tmp_embeddings_path = self._embeddings_path.with_suffix('.tmp.npy')
+            np.save(tmp_embeddings_path, np.stack(embeddings))
+            os.replace(tmp_embeddings_path, self._embeddings_path)
+        os.replace(tmp_path, self.persist_path)
+        log.debug('Saved %d cached responses at: \n%s\n', len(records), self.persist_path)
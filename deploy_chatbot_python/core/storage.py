@@ -0,0 +1,52 @@
+import os
+from pathlib import Path
+from typing import Union
+
+from llama_index.core import StorageContext
+from llama_index.core.storage.docstore.types import BaseDocumentStore
+from llama_index.core.vector_stores.types import BasePydanticVectorStore
+from llama_index.core.storage.docstore.types import DEFAULT_PERSIST_FNAME as DOCSTORE_FNAME
+
+from deploy_chatbot_python.core.binary_docstore import BinaryDocumentStore
+from deploy_chatbot_python.core.vector_store import MemmapVectorStore
+from deploy_chatbot_python.config import constants
+
+
+def _create_vector_store(persist_dir: Union[Path, None]) -> Union[BasePydanticVectorStore, None]:
+    if constants.VECTOR_STORE_BACKEND == 'simple':
+        return None  # llama-index default (JSON) vector store
+    if constants.VECTOR_STORE_BACKEND != 'memmap':
+        raise ValueError(f"Unknown vector store backend: {constants.VECTOR_STORE_BACKEND}")
+    if persist_dir is None:
+        return MemmapVectorStore(dtype=constants.VECTOR_STORE_DTYPE)
+    return MemmapVectorStore.from_persist_dir(persist_dir)
+
+
+def _create_docstore(persist_dir: Union[Path, None]) -> Union[BaseDocumentStore, None]:
+    if constants.DOCSTORE_BACKEND == 'simple':
+        return None  # llama-index default (JSON) docstore
+    if constants.DOCSTORE_BACKEND != 'binary':
+        raise ValueError(f"Unknown docstore backend: {constants.DOCSTORE_BACKEND}")
+    if persist_dir is None:
+        return BinaryDocumentStore()
+    return BinaryDocumentStore.from_persist_dir(persist_dir)
+
+
+def create_storage_context(persist_dir: Union[Path, None] = None) -> StorageContext:
+    """Empty storage context, or the one persisted at `persist_dir`, of the configured backends"""
+    return StorageContext.from_defaults(
+        persist_dir=persist_dir,
+        docstore=_create_docstore(persist_dir),
+        vector_store=_create_vector_store(persist_dir),
+    )
+
+
+def storage_exists(persist_dir: Path) -> bool:
+    """Whether an index of the configured backends was persisted at `persist_dir`"""
+    docstore_path = (
+        BinaryDocumentStore.persist_path(persist_dir) if constants.DOCSTORE_BACKEND == 'binary'
+        else Path(persist_dir) / DOCSTORE_FNAME
+    )
+    if not os.path.exists(docstore_path):
+        return False
+    return constants.VECTOR_STORE_BACKEND != 'memmap' or MemmapVectorStore.exists(persist_dir)
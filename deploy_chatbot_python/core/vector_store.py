@@ -0,0 +1,365 @@
+import os
+import json
+import uuid
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Sequence, Union
+
+import numpy as np
+from llama_index.core.bridge.pydantic import Field, PrivateAttr
+from llama_index.core.schema import BaseNode
+from llama_index.core.vector_stores.types import (
+    BasePydanticVectorStore,
+    MetadataFilters,
+    VectorStoreQuery,
+    VectorStoreQueryResult,
+)
+from llama_index.core.vector_stores.simple import (
+    DEFAULT_PERSIST_FNAME as VECTOR_STORE_FNAME,
+    DEFAULT_VECTOR_STORE,
+    NAMESPACE_SEP,
+)
+
+from deploy_chatbot_python.core.ivf import IVFIndex
+from deploy_chatbot_python.config import constants
+from deploy_chatbot_python.logging.logger_instance import log
+
+
+SUPPORTED_DTYPES = ('float32', 'float16', 'int8')
+INT8_MAX = 127
+
+
+class MemmapVectorStore(BasePydanticVectorStore):  # pylint: disable=abstract-method,too-many-instance-attributes
+    """
+    Vector store keeping unit-normalized embeddings in one contiguous `.npy` matrix
+    (float32, float16 or per-row scaled int8). Persisted stores are opened memory-mapped,
+    so loading costs no parsing and pages are shared between processes.
+    Search is a (blocked) matrix-vector product followed by `argpartition`, over all rows or,
+    once an IVF index is built, over the rows of the `nprobe` closest lists only.
+    """
+    stores_text: bool = False
+    dtype: str = Field(default=constants.VECTOR_STORE_DTYPE)
+    nprobe: int = Field(default=constants.IVF_NPROBE)
+
+    _vectors: np.ndarray = PrivateAttr()
+    _scales: Union[np.ndarray, None] = PrivateAttr(default=None)
+    _alive: np.ndarray = PrivateAttr()
+    _node_ids: List[str] = PrivateAttr(default_factory=list)
+    _ref_doc_ids: List[str] = PrivateAttr(default_factory=list)
+    _rows: Dict[str, int] = PrivateAttr(default_factory=dict)
+    _pending: List[np.ndarray] = PrivateAttr(default_factory=list)
+    _ivf: Union[IVFIndex, None] = PrivateAttr(default=None)
+    _lock: threading.RLock = PrivateAttr(default_factory=threading.RLock)
+
+    def __init__(self, **kwargs: Any) -> None:
+        super().__init__(**kwargs)
+        if self.dtype not in SUPPORTED_DTYPES:
+            raise ValueError(f"Unsupported vector dtype {self.dtype}, use: {SUPPORTED_DTYPES}")
+        self._vectors = np.empty((0, 0), dtype=self.dtype)
+        self._alive = np.empty(0, dtype=bool)
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "MemmapVectorStore"
+
+    @property
+    def client(self) -> None:
+        return None
+
+    @property
+    def num_vectors(self) -> int:
+        # not `__len__`: llama-index tests vector stores for truthiness
+        return int(self._alive.sum()) + len(self._pending)
+
+    @property
+    def vectors(self) -> np.ndarray:
+        """Stored (possibly quantized) rows, including deleted ones"""
+        self._consolidate()
+        return self._vectors
+
+    @property
+    def ivf_index(self) -> Union[IVFIndex, None]:
+        return self._ivf
+
+    # ===== Mutations =====
+
+    def add(self, nodes: Sequence[BaseNode], **add_kwargs: Any) -> List[str]:  # pylint: disable=unused-argument
+        with self._lock:
+            for node in nodes:
+                embedding = np.asarray(node.get_embedding(), dtype=np.float32)
+                self._pending.append(embedding / (np.linalg.norm(embedding) or 1.0))
+                self._rows[node.node_id] = len(self._node_ids)
+                self._node_ids.append(node.node_id)
+                self._ref_doc_ids.append(node.ref_doc_id or '')
+        return [node.node_id for node in nodes]
+
+    def delete(self, ref_doc_id: str, **delete_kwargs: Any) -> None:
+        node_ids = [
+            node_id for node_id, doc_id in zip(self._node_ids, self._ref_doc_ids)
+            if doc_id == ref_doc_id
+        ]
+        self.delete_nodes(node_ids)
+
+    def delete_nodes(self, node_ids: Union[List[str], None] = None,
+                     filters: Union[MetadataFilters, None] = None, **delete_kwargs: Any) -> None:
+        if filters is not None:
+            raise ValueError("Metadata filters are not supported by MemmapVectorStore.")
+        with self._lock:
+            self._consolidate()
+            for node_id in node_ids or []:
+                row = self._rows.pop(node_id, None)
+                if row is not None:
+                    self._alive[row] = False
+
+    def clear(self) -> None:
+        with self._lock:
+            self._vectors = np.empty((0, 0), dtype=self.dtype)
+            self._scales = None
+            self._alive = np.empty(0, dtype=bool)
+            self._node_ids, self._ref_doc_ids, self._rows, self._pending = [], [], {}, []
+            self._ivf = None
+
+    def _encode(self, vectors: np.ndarray) -> tuple:
+        if self.dtype == 'int8':
+            scales = np.abs(vectors).max(axis=1) / INT8_MAX
+            scales[scales == 0] = 1.0
+            return np.round(vectors / scales[:, None]).astype(np.int8), scales.astype(np.float32)
+        return vectors.astype(self.dtype), None
+
+    def _consolidate(self) -> None:
+        """Append the pending (in-memory, float32) rows to the stored matrix"""
+        with self._lock:
+            if not self._pending:
+                return
+            pending = np.stack(self._pending)
+            if self._ivf is not None:
+                self._ivf.append(pending)
+            vectors, scales = self._encode(pending)
+            if len(self._vectors):
+                vectors = np.concatenate([self._vectors, vectors])
+                if scales is not None:
+                    scales = np.concatenate([self._scales, scales])
+            self._vectors, self._scales = vectors, scales
+            self._alive = np.concatenate([self._alive, np.ones(len(self._pending), dtype=bool)])
+            self._pending = []
+
+    def build_ivf_index(self, num_lists: Union[int, None] = constants.IVF_NUM_LISTS) -> None:
+        """Train the IVF coarse quantizer on the stored rows, later rows join their closest list"""
+        with self._lock:
+            self._consolidate()
+            self._ivf = IVFIndex.train(self._vectors, num_lists)
+
+    # ===== Search =====
+
+    @staticmethod
+    def _normalize(query_embedding: Sequence[float]) -> np.ndarray:
+        query = np.asarray(query_embedding, dtype=np.float32)
+        return query / (np.linalg.norm(query) or 1.0)
+
+    def scores(self, query_embedding: Sequence[float],
+               rows: Union[np.ndarray, None] = None) -> np.ndarray:
+        """
+        Cosine similarity of the query with the stored `rows` (default: every row),
+        -inf for deleted rows
+        """
+        self._consolidate()
+        query = self._normalize(query_embedding)
+        vectors, scales, alive = self._vectors, self._scales, self._alive
+        if rows is None:
+            rows = slice(None)
+            num_rows = len(vectors)
+        else:
+            num_rows = len(rows)
+        scores = np.empty(num_rows, dtype=np.float32)
+        block_rows = constants.VECTOR_SEARCH_BLOCK_ROWS
+        for start in range(0, num_rows, block_rows):
+            block_index = slice(start, start + block_rows)
+            if isinstance(rows, np.ndarray):
+                block_index = rows[block_index]
+            block = vectors[block_index].astype(np.float32, copy=False)
+            scores[start:start + block_rows] = block @ query
+        if scales is not None:
+            scores *= scales[rows]
+        scores[~alive[rows]] = -np.inf
+        return scores
+
+    def _excluded(self, query: VectorStoreQuery) -> Union[np.ndarray, None]:
+        """Mask of the rows filtered out by the `node_ids` / `doc_ids` of `query`"""
+        excluded = None
+        if query.node_ids is not None:
+            allowed = [self._rows[node_id] for node_id in query.node_ids if node_id in self._rows]
+            excluded = np.ones(len(self._node_ids), dtype=bool)
+            excluded[allowed] = False
+        if query.doc_ids is not None:
+            doc_ids = set(query.doc_ids)
+            mask = np.array([doc_id not in doc_ids for doc_id in self._ref_doc_ids], dtype=bool)
+            excluded = mask if excluded is None else excluded | mask
+        return excluded
+
+    def top_k(self, scores: np.ndarray, k: int) -> np.ndarray:
+        """Row indices of the `k` best finite scores, best first"""
+        k = min(k, int(np.isfinite(scores).sum()))
+        if k <= 0:
+            return np.empty(0, dtype=np.int64)
+        rows = np.argpartition(-scores, k - 1)[:k]
+        return rows[np.argsort(-scores[rows])]
+
+    def query(self, query: VectorStoreQuery, **kwargs: Any) -> VectorStoreQueryResult:
+        if query.filters is not None:
+            raise ValueError("Metadata filters are not supported by MemmapVectorStore.")
+        if query.query_embedding is None:
+            raise ValueError("Query embedding is required.")
+        scores, rows = self._search(query.query_embedding, query.similarity_top_k,
+                                    kwargs.get('nprobe', self.nprobe), self._excluded(query))
+        return VectorStoreQueryResult(
+            similarities=scores.tolist(),
+            ids=[self._node_ids[row] for row in rows],
+        )
+
+    def _search(self, query_embedding: Sequence[float], k: int, nprobe: Union[int, None],
+                excluded: Union[np.ndarray, None] = None) -> tuple:
+        """(scores, rows) of the `k` best rows, exhaustive when `nprobe` is None or no IVF"""
+        self._consolidate()
+        candidates = None
+        if self._ivf is not None and nprobe is not None:
+            candidates = self._ivf.probe(self._normalize(query_embedding), nprobe)
+        scores = self.scores(query_embedding, candidates)
+        if excluded is not None:
+            scores[excluded if candidates is None else excluded[candidates]] = -np.inf
+        best = self.top_k(scores, k)
+        rows = best if candidates is None else candidates[best]
+        return scores[best], rows
+
+    def recall_at_k(self, query_embeddings: Sequence[Sequence[float]], k: int,
+                    nprobe: Union[int, None] = None) -> float:
+        """Mean fraction of the exact top `k` rows that the IVF search also returns"""
+        nprobe = self.nprobe if nprobe is None else nprobe
+        found = 0
+        for query_embedding in query_embeddings:
+            _, exact = self._search(query_embedding, k, nprobe=None)
+            _, approximate = self._search(query_embedding, k, nprobe=nprobe)
+            found += len(set(exact.tolist()) & set(approximate.tolist()))
+        return found / (k * len(query_embeddings)) if len(query_embeddings) else 1.0
+
+    # ===== Persistence =====
+
+    @staticmethod
+    def _paths(persist_path: Union[str, Path], generation: Union[str, None] = None) -> tuple:
+        """Meta (JSON), vectors, scales and IVF paths, the arrays of each `persist` are separate"""
+        persist_path = Path(persist_path)
+        prefix = f'.{generation}' if generation else ''  # no generation: saved before they were
+        return (
+            persist_path,
+            persist_path.with_suffix(f'{prefix}.npy'),
+            persist_path.with_suffix(f'{prefix}.scales.npy'),
+            persist_path.with_suffix(f'{prefix}.ivf.npz'),
+        )
+
+    @staticmethod
+    def _read_meta(meta_path: Path) -> Union[dict, None]:
+        if not os.path.exists(meta_path):
+            return None
+        with open(meta_path, "r", encoding='utf-8') as file:
+            return json.load(file)
+
+    def persist(self, persist_path: str, fs: Any = None) -> None:
+        """
+        Compact deleted rows and write vectors (`.npy`) of a new generation next to
+        `persist_path`, then the ids (JSON) naming it. The meta is replaced last, so a crash
+        leaves the previous generation in use. Arrays of other generations are removed afterwards
+        """
+        generation = uuid.uuid4().hex
+        meta_path, vectors_path, scales_path, ivf_path = self._paths(persist_path, generation)
+        with self._lock:
+            self._consolidate()
+            alive = self._alive
+            vectors = self._vectors[alive] if len(self._vectors) else self._vectors
+            scales = self._scales[alive] if self._scales is not None else None
+            node_ids = [node_id for node_id, keep in zip(self._node_ids, alive) if keep]
+            ref_doc_ids = [doc_id for doc_id, keep in zip(self._ref_doc_ids, alive) if keep]
+            ivf = (
+                IVFIndex(self._ivf.centroids, self._ivf.assignments[alive])
+                if self._ivf is not None else None
+            )
+        os.makedirs(meta_path.parent, exist_ok=True)
+        self._save_array(vectors_path, vectors)
+        if scales is not None:
+            self._save_array(scales_path, scales)
+        if ivf is not None:
+            ivf.save(ivf_path)
+        self._write_meta(meta_path, {
+            'dtype': self.dtype, 'generation': generation, 'num_rows': len(node_ids),
+            'has_ivf': ivf is not None, 'node_ids': node_ids, 'ref_doc_ids': ref_doc_ids,
+        })
+        self._remove_stale_arrays(meta_path, generation)
+        log.debug('Persisted %d vectors at: \n%s\n', len(node_ids), vectors_path)
+
+    @staticmethod
+    def _write_meta(meta_path: Path, meta: dict) -> None:
+        tmp_path = meta_path.with_suffix('.tmp')
+        with open(tmp_path, "w", encoding='utf-8') as file:
+            json.dump(meta, file)
+        os.replace(tmp_path, meta_path)
+
+    @classmethod
+    def _remove_stale_arrays(cls, meta_path: Path, generation: str) -> None:
+        current_paths = set(cls._paths(meta_path, generation)[1:])
+        for path in meta_path.parent.glob(f'{meta_path.stem}.*'):
+            if path.suffix not in ('.npy', '.npz') or path in current_paths:
+                continue
+            try:
+                os.remove(path)
+            except OSError as e:  # e.g. still memory-mapped on Windows, removed next time
+                log.warning('Could not remove stale vectors file %s: %s', path, e)
+
+    @staticmethod
+    def _save_array(path: Path, array: np.ndarray) -> None:
+        # write-then-rename, a partially written file is never loaded
+        tmp_path = path.with_suffix('.tmp.npy')
+        np.save(tmp_path, array)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def from_persist_path(cls, persist_path: Union[str, Path]) -> "MemmapVectorStore":
+        meta = cls._read_meta(Path(persist_path))
+        if meta is None:
+            raise FileNotFoundError(f"No vector store at: {persist_path}")
+        meta_path, vectors_path, scales_path, ivf_path = cls._paths(
+            persist_path, meta.get('generation')
+        )
+        store = cls(dtype=meta['dtype'])
+        store._vectors = np.load(vectors_path, mmap_mode='r')
+        if meta['dtype'] == 'int8':
+            store._scales = np.load(scales_path)
+        store._node_ids, store._ref_doc_ids = meta['node_ids'], meta['ref_doc_ids']
+        store._rows = {node_id: row for row, node_id in enumerate(store._node_ids)}
+        store._alive = np.ones(len(store._node_ids), dtype=bool)
+        if meta.get('has_ivf', os.path.exists(ivf_path)):
+            store._ivf = IVFIndex.load(ivf_path)
+        store._validate(meta.get('num_rows', len(store._node_ids)), meta_path)
+        log.debug('Memory-mapped %d vectors from: \n%s\n', len(store._node_ids), vectors_path)
+        return store
+
+    def _validate(self, num_rows: int, meta_path: Path) -> None:
+        row_counts = {
+            'ids': len(self._node_ids),
+            'vectors': len(self._vectors),
+            'scales': len(self._scales) if self._scales is not None else num_rows,
+            'ivf': len(self._ivf.assignments) if self._ivf is not None else num_rows,
+        }
+        if any(count != num_rows for count in row_counts.values()):
+            raise ValueError(f"Inconsistent vector store at {meta_path}: {num_rows} rows expected, "
+                             f"found {row_counts}")
+
+    @staticmethod
+    def default_persist_path(persist_dir: Union[str, Path]) -> Path:
+        return Path(persist_dir) / f'{DEFAULT_VECTOR_STORE}{NAMESPACE_SEP}{VECTOR_STORE_FNAME}'
+
+    @classmethod
+    def from_persist_dir(cls, persist_dir: Union[str, Path]) -> "MemmapVectorStore":
+        return cls.from_persist_path(cls.default_persist_path(persist_dir))
+
+    @classmethod
+    def exists(cls, persist_dir: Union[str, Path]) -> bool:
+        """The meta is written last, it names complete arrays"""
+        return os.path.exists(cls.default_persist_path(persist_dir))
@@ -1,101 +1,213 @@
 import json
-from dataclasses import dataclass
+import time
+import uuid
+import threading
+from typing import Dict, Union
+from dataclasses import dataclass, field
 
 import dash
-from dash import Input, Output, State
+from dash import Input, Output, State, Patch
 import requests
+from requests.adapters import HTTPAdapter
 
-from deploy_chatbot_python.frontend.layout import make_chat_element
+from deploy_chatbot_python.frontend.layout import make_message_element
 from deploy_chatbot_python.logging.logger_instance import log
-from deploy_chatbot_python.backend.server import Query
+from deploy_chatbot_python.backend.schemas import Query
 from deploy_chatbot_python.config import constants
 
 
+@dataclass
+class _Reply:
+    text: str = ''
+    done: bool = False
+    rendered_text: Union[str, None] = None
+    updated_at: float = field(default_factory=time.monotonic)  # start, last token or completion
+
+    def is_abandoned(self, now: float) -> bool:
+        """
+        Not collected for `POST_REQUEST_TIMEOUT` (the backend times out sooner than that between
+        tokens), its tab was closed or reloaded
+        """
+        return now - self.updated_at > constants.POST_REQUEST_TIMEOUT
+
+
+def _create_session() -> requests.Session:
+    """HTTP session keeping (up to the pool size) keep-alive connections to the backend API"""
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=1,
+        pool_maxsize=constants.BACKEND_CONNECTION_POOL_SIZE,
+    )
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def append_messages(chat_state: dict, *messages: tuple) -> Patch:
+    """
+    Patch appending (sender, message) bubbles to the chat history, dropping the oldest bubbles
+    beyond `CHAT_HISTORY_WINDOW`. Updates `chat_state["num_messages"]` in place
+    """
+    chat_history = Patch()
+    for sender, message in messages:
+        chat_history.append(make_message_element(sender, message))
+    num_messages = chat_state["num_messages"] + len(messages)
+    while num_messages > constants.CHAT_HISTORY_WINDOW:
+        del chat_history[0]
+        num_messages -= 1
+    chat_state["num_messages"] = num_messages
+    return chat_history
+
+
+def replace_last_message(sender: str, message: str) -> Patch:
+    chat_history = Patch()
+    chat_history[-1] = make_message_element(sender, message)
+    return chat_history
+
+
 @dataclass
 class Callbacks:
     app: dash.Dash
+    session: requests.Session = field(default_factory=_create_session, init=False)
+    _replies: Dict[str, _Reply] = field(default_factory=dict, init=False)
 
     def __post_init__(self):
         self._register_callbacks()
 
+    def _request_bot_response(self, user_message: str) -> str:
+        try:
+            # Send POST request to backend API
+            response = self.session.post(
+                url=constants.API_POST_ENDPOINT_URL,
+                json=Query(text=user_message).model_dump(),
+                timeout=constants.POST_REQUEST_TIMEOUT,
+            )
+            response.raise_for_status()
+            data = response.json()
+            bot_reply = data.get("response", "No response received.")
+        except requests.exceptions.RequestException as e:
+            bot_reply = f"An error occurred: {str(e)}"
+            log.error(bot_reply)
+        except json.JSONDecodeError:
+            bot_reply = "Received an invalid JSON response from the server."
+            log.error(bot_reply)
+        return bot_reply
+
+    def _stream_bot_response(self, reply: _Reply, user_message: str) -> None:
+        """Consume the backend's Server-Sent-Events into `reply`"""
+        try:
+            with self.session.post(
+                url=constants.API_STREAM_ENDPOINT_URL,
+                json=Query(text=user_message).model_dump(),
+                timeout=constants.POST_REQUEST_TIMEOUT,
+                stream=True,
+            ) as response:
+                response.raise_for_status()
+                event = "message"
+                for line in response.iter_lines(decode_unicode=True):
+                    if not line:
+                        event = "message"  # a blank line ends the event
+                    elif line.startswith("event:"):
+                        event = line[len("event:"):].strip()
+                    elif line.startswith("data:"):
+                        data = json.loads(line[len("data:"):])
+                        if event == "error":
+                            reply.text = f"An error occurred: {data.get('detail', '')}"
+                            log.error(reply.text)
+                        else:
+                            reply.text += data.get("token", "")
+                        reply.updated_at = time.monotonic()
+        except requests.exceptions.RequestException as e:
+            reply.text = f"An error occurred: {str(e)}"
+            log.error(reply.text)
+        except json.JSONDecodeError:
+            reply.text = "Received an invalid JSON response from the server."
+            log.error(reply.text)
+
+    def _fetch_bot_response(self, reply: _Reply, user_message: str) -> None:
+        try:
+            if constants.STREAM_BOT_RESPONSE:
+                self._stream_bot_response(reply, user_message)
+            else:
+                reply.text = self._request_bot_response(user_message)
+        except Exception:  # pylint: disable=W0718 # runs in a thread, report to the user instead
+            reply.text = "An error has occured. Please contact the creator of this Chatbot"
+            log.exception(reply.text)
+        finally:
+            reply.done = True
+            reply.updated_at = time.monotonic()
+
+    def _evict_abandoned_replies(self) -> None:
+        now = time.monotonic()
+        abandoned = [reply_id for reply_id, reply in list(self._replies.items())
+                     if reply.is_abandoned(now)]
+        for reply_id in abandoned:
+            self._replies.pop(reply_id, None)
+        if abandoned:
+            log.debug('Evicted %d abandoned replies', len(abandoned))
+
+    def _start_reply(self, user_message: str) -> str:
+        """Fetch the bot response in a thread, so no Dash worker waits on the backend"""
+        self._evict_abandoned_replies()
+        reply_id = uuid.uuid4().hex
+        self._replies[reply_id] = _Reply()
+        threading.Thread(
+            target=self._fetch_bot_response,
+            args=(self._replies[reply_id], user_message),
+            daemon=True,
+        ).start()
+        return reply_id
+
     def _register_callbacks(self) -> None:
-        # Callback to handle user input and update chat history with user's message and placeholder
+        # Callback to append the user's message and a placeholder, and request the bot response
         @self.app.callback(
+            Output("chat-history", "children"),
             Output("chat-store", "data"),
             Output("user-input", "value"),
             Output("error-message", "children"),
+            Output("stream-interval", "disabled"),
             Input("send-button", "n_clicks"),
             Input("user-input", "n_submit"),
             State("user-input", "value"),
             State("chat-store", "data"),
             prevent_initial_call=True,
         )
-        def update_chat(n_clicks, n_submit, user_message, chat_data):  # pylint: disable=unused-argument
+        def send_message(n_clicks, n_submit, user_message, chat_state):  # pylint: disable=unused-argument
             if not user_message:
-                return dash.no_update, dash.no_update, "Please enter a message before sending."
-
-            if not chat_data:
-                chat_data = []
-
-            # Append user's message
-            chat_data.append({"sender": "user", "message": user_message})
+                return (dash.no_update, dash.no_update, dash.no_update,
+                        "Please enter a message before sending.", dash.no_update)
+            if chat_state["reply_id"] in self._replies:
+                return (dash.no_update, dash.no_update, dash.no_update,
+                        "Please wait for the current response.", dash.no_update)
 
-            # Append placeholder for bot's response
-            chat_data.append({"sender": "bot", "message": constants.BOT_PLACEHOLDER_MESSAGE})
+            chat_history = append_messages(
+                chat_state,
+                ("user", user_message),
+                ("bot", constants.BOT_PLACEHOLDER_MESSAGE),
+            )
+            # The placeholder is replaced by `poll_bot_response`
+            chat_state["reply_id"] = self._start_reply(user_message)
+            return chat_history, chat_state, "", "", False
 
-            return chat_data, "", ""
-
-        # Callback to fetch bot response and update the placeholder
+        # Callback to render the bot's response (as far as it arrived) in place of the placeholder
         @self.app.callback(
+            Output("chat-history", "children", allow_duplicate=True),
             Output("chat-store", "data", allow_duplicate=True),
-            Input("chat-store", "data"),
+            Output("stream-interval", "disabled", allow_duplicate=True),
+            Input("stream-interval", "n_intervals"),
+            State("chat-store", "data"),
             prevent_initial_call=True,
         )
-        def fetch_bot_response(chat_data):
-            if not chat_data or (chat_data[-1]["sender"] != "bot"):
-                return chat_data
-            # Check if the last message is a placeholder
-            if chat_data[-1]["message"] == constants.BOT_PLACEHOLDER_MESSAGE:
-                # Extract the user's message
-                user_message = chat_data[-2]["message"]
-
-                try:
-                    # Send POST request to backend API
-                    response = requests.post(
-                        url=constants.API_POST_ENDPOINT_URL,
-                        json=Query(text=user_message).model_dump(),
-                        timeout=constants.POST_REQUEST_TIMEOUT,
-                    )
-                    response.raise_for_status()
-                    data = response.json()
-                    bot_reply = data.get("response", "No response received.")
-                except requests.exceptions.RequestException as e:
-                    bot_reply = f"An error occurred: {str(e)}"
-                    log.error(bot_reply)
-                except json.JSONDecodeError:
-                    bot_reply = "Received an invalid JSON response from the server."
-                    log.error(bot_reply)
-                except Exception:
-                    bot_reply = "An error has occured. Please contact the creator of this Chatbot"
-                    log.error(bot_reply)
-                    raise
-
-                # Update the placeholder with the actual bot response
-                chat_data[-1]["message"] = bot_reply
-
-            return chat_data
-
-        # Callback to render chat history
-        @self.app.callback(
-            Output("chat-history", "children"),
-            Input("chat-store", "data"),
-        )
-        def render_chat_history(chat_data):
-            chat_elements = []
-            for msg in chat_data:
-                is_user = msg["sender"] == 'user'
-                text_align = "right" if is_user else "left"
-                bubble_color = "#DCF8C6" if text_align == 'right' else "#FFFFFF"
-                chat_element = make_chat_element(msg['message'], text_align, bubble_color)
-                chat_elements.append(chat_element)
-            return chat_elements
+        def poll_bot_response(n_intervals, chat_state):  # pylint: disable=unused-argument
+            reply = self._replies.get(chat_state["reply_id"])
+            if reply is None:
+                return dash.no_update, dash.no_update, True
+            if not reply.done:
+                if not reply.text or reply.text == reply.rendered_text:
+                    return dash.no_update, dash.no_update, False
+                reply.rendered_text = reply.text
+                return replace_last_message("bot", reply.text), dash.no_update, False
+            self._replies.pop(chat_state["reply_id"], None)
+            chat_state["reply_id"] = None
+            chat_history = replace_last_message("bot", reply.text or "No response received.")
+            return chat_history, chat_state, True
@@ -13,6 +13,7 @@ layout = dbc.Container(
                     # Chat history display
                     html.Div(
                         id="chat-history",
+                        children=[],
                         style={
                             "height": "600px",
                             "overflowY": "auto",
@@ -43,8 +44,14 @@ layout = dbc.Container(
                     ),
                     # Error message display
                     html.Div(id="error-message", className="text-danger"),
-                    # Hidden store for chat history
-                    dcc.Store(id="chat-store", data=[]),
+                    # Hidden store for the chat state (history lives in the rendered bubbles)
+                    dcc.Store(id="chat-store", data={"num_messages": 0, "reply_id": None}),
+                    # Polls streamed bot responses, enabled only while a response is streaming
+                    dcc.Interval(
+                        id="stream-interval",
+                        interval=constants.STREAM_POLL_INTERVAL_MS,
+                        disabled=True,
+                    ),
                 ]
             )
         ),
@@ -72,3 +79,9 @@ def make_chat_element(message: str, text_align: str, bubble_color: str) -> html.
         },
     )
     return chat_element
+
+def make_message_element(sender: str, message: str) -> html.Div:
+    is_user = sender == 'user'
+    text_align = "right" if is_user else "left"
+    bubble_color = "#DCF8C6" if text_align == 'right' else "#FFFFFF"
+    return make_chat_element(message, text_align, bubble_color)
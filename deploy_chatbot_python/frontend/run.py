@@ -1,3 +1,5 @@
+import argparse
+
 import dash
 import dash_bootstrap_components as dbc
 
@@ -13,4 +15,6 @@ app.layout = layout
 Callbacks(app)
 
 if __name__ == "__main__":
-    app.run(debug=True)
+    parser = argparse.ArgumentParser(description="Serve the chat dashboard")
+    parser.add_argument("--production", action="store_true", help="disable debug and hot-reload")
+    app.run(debug=not parser.parse_args().production)
@@ -5,13 +5,26 @@ import sys
 import time
 import platform
 
+from deploy_chatbot_python.utils.restart_backoff import RestartBackoff
 from deploy_chatbot_python.config import constants
 from deploy_chatbot_python.logging.logger_instance import log
 
 
 class Launcher:
-    def __init__(self) -> None:
+    def __init__(self, production: bool = False,
+                 num_workers: int = constants.PREFORK_NUM_WORKERS) -> None:
+        """
+        Development mode hot-reloads a single API process and stops everything if a process dies.
+        Production mode serves `num_workers` pre-forked API workers without reload, and restarts
+        crashed processes with backoff
+        """
+        self.production = production
+        self.num_workers = num_workers
         self.processes = {}
+        self._commands = {}
+        self._started_at = {}
+        self._backoffs = {}
+        self._restarts = {}
 
     @property
     def is_windows_os(self) -> None:
@@ -23,6 +36,13 @@ class Launcher:
             return {"creationflags": subprocess.CREATE_NEW_PROCESS_GROUP}
         return {"start_new_session": True}
 
+    @property
+    def _subprocess_env(self) -> dict:
+        """Production mode also selects the queued, rate-limited logging of the processes"""
+        if self.production:
+            return {"CHATBOT_LOG_MODE": "production", **os.environ}
+        return dict(os.environ)
+
     def _launch_subprocess(self, cmd: list, name: str) -> None:
         log.info('Launcing process %s: \n%s\n', name, ' '.join(cmd))
         try:
@@ -30,9 +50,12 @@ class Launcher:
                 cmd,
                 stdout=None,
                 stderr=None,
+                env=self._subprocess_env,
                 **self._new_process_kwarg,
             )
             self.processes[name] = process
+            self._commands[name] = cmd
+            self._started_at[name] = time.monotonic()
             log.info('process %s was launched successfully', name)
         except Exception as e:  # pylint: disable=W0718 # critical on any exception
             log.error('Failed to launch %s: %s', name, e)
@@ -40,6 +63,13 @@ class Launcher:
             raise
 
     def start_api(self) -> None:
+        if self.production:
+            cmd = [
+                sys.executable, "-m", "deploy_chatbot_python.backend.prefork",
+                "--workers", str(self.num_workers),
+            ]
+            self._launch_subprocess(cmd, "FastAPI")
+            return
         cmd = [
             sys.executable, "-m", "uvicorn",
             "deploy_chatbot_python.backend.run:api",
@@ -53,6 +83,8 @@ class Launcher:
         cmd = [
             sys.executable, "-m", "deploy_chatbot_python.frontend.run"
         ]
+        if self.production:
+            cmd.append("--production")
         self._launch_subprocess(cmd, "Dash")
 
     def start_all(self) -> None:
@@ -88,12 +120,26 @@ class Launcher:
     def _monitor(self) -> None:
         """Monitor subprocesses for failure."""
         while True:
-            for name, proc in self.processes.items():
-                retcode = proc.poll()
-                if retcode is not None:
-                    raise RuntimeError(f"Process {name} exited unexpectedly with code {retcode}")
+            self._check_processes()
             time.sleep(1)
 
+    def _check_processes(self) -> None:
+        for name, proc in self.processes.items():
+            retcode = proc.poll()
+            if retcode is None or name in self._restarts:
+                continue
+            if not self.production:
+                raise RuntimeError(f"Process {name} exited unexpectedly with code {retcode}")
+            backoff = self._backoffs.setdefault(name, RestartBackoff())
+            delay = backoff.next_delay(time.monotonic() - self._started_at[name])
+            self._restarts[name] = time.monotonic() + delay
+            log.warning('Process %s exited with code %s, restarting in %.1f seconds',
+                        name, retcode, delay)
+        for name, restart_at in list(self._restarts.items()):
+            if restart_at <= time.monotonic():
+                del self._restarts[name]
+                self._launch_subprocess(self._commands[name], name)
+
     def run(self) -> None:
         try:
             self.start_all()
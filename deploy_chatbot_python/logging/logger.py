@@ -1,9 +1,15 @@
 import logging
 import os
 import sys
-from typing import ClassVar, Optional
+import json
+import time
+import queue
+import atexit
+import threading
+from datetime import datetime, timezone
+from typing import ClassVar, Dict, List, Optional, Tuple
 from dataclasses import dataclass, field
-from logging.handlers import RotatingFileHandler
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 from colorama import Fore, Style, init as colorama_init
 
 from deploy_chatbot_python.config import constants
@@ -26,14 +32,84 @@ class _ColorFormatter(logging.Formatter):
         return f"{color}{message}{Style.RESET_ALL}"
 
 
+class _JsonFormatter(logging.Formatter):
+    """One JSON object per line"""
+    def format(self, record):
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "location": f"{record.filename}:{record.lineno}",
+            "process": record.process,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:  # the `QueueHandler` already appended it to the message
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class _RateLimitFilter(logging.Filter):  # pylint: disable=too-few-public-methods
+    """Token bucket per call site (file and line) for records at or below `max_level`"""
+    def __init__(self, rate: float, burst: float, max_level: int = logging.DEBUG) -> None:
+        super().__init__()
+        self.rate = rate
+        self.burst = burst
+        self.max_level = max_level
+        self.dropped = 0
+        self._buckets: Dict[Tuple[str, int], Tuple[float, float]] = {}  # tokens, last update
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if record.levelno > self.max_level:
+            return True
+        key = (record.pathname, record.lineno)
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated_at = self._buckets.get(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated_at) * self.rate)
+            allowed = tokens >= 1
+            self._buckets[key] = (tokens - 1 if allowed else tokens, now)
+            if not allowed:
+                self.dropped += 1
+        return allowed
+
+
+class _DroppingQueueHandler(QueueHandler):
+    """Never blocks the logging thread, records are dropped while the queue is full"""
+    def __init__(self, queue_: queue.Queue) -> None:
+        super().__init__(queue_)
+        self.dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def parse_logger_levels(spec: str) -> Dict[str, int]:
+    """Parse 'name=LEVEL,other.name=LEVEL' into {name: level}"""
+    levels = {}
+    for item in filter(None, (part.strip() for part in spec.split(','))):
+        name, sep, level = item.partition('=')
+        if not sep or not isinstance(logging.getLevelName(level.strip().upper()), int):
+            raise ValueError(f"Invalid logger level '{item}', expected 'name=LEVEL'")
+        levels[name.strip()] = logging.getLevelName(level.strip().upper())
+    return levels
+
+
 @dataclass
-class Logger:
+class Logger:  # pylint: disable=too-many-instance-attributes
     name: str
     level: str = constants.LOGGER_LEVEL
     max_bytes: int = constants.LOG_FILE_MAX_BYTES
     capture_external: bool = True
+    production: bool = constants.LOG_PRODUCTION_MODE
+    json_format: bool = constants.LOG_JSON_FORMAT
+    logger_levels: str = constants.LOGGER_LEVELS
 
     logger: logging.Logger = field(init=False)
+    listener: Optional[QueueListener] = field(default=None, init=False)
 
     _instance: ClassVar[Optional["Logger"]] = None
     _initialized: ClassVar[bool] = False
@@ -52,34 +128,89 @@ class Logger:
         self.logger = logging.getLogger(self.name)
         self.logger.setLevel(self.level)
         self.logger.propagate = False
+        for name, level in parse_logger_levels(self.logger_levels).items():
+            logging.getLogger(name).setLevel(level)
 
-        self._configure_handlers()
+        handlers = self._create_handlers()
+        if self.production:
+            self._start_queue_listener(handlers)
+        else:
+            for handler in handlers:
+                self.logger.addHandler(handler)
 
         if self.capture_external:
             self._capture_external_loggers()
 
-    def _configure_handlers(self):
+    def _create_handlers(self) -> List[logging.Handler]:
+        """Levels are left to the loggers, so per-logger levels may be lower than `level`"""
         log_format = (
             "%(asctime)s | %(levelname)-s | %(name)s | "
             "%(filename)s:%(lineno)d | %(message)s"
         )
         date_format = "%Y-%m-%d %H:%M:%S"
+        json_formatter = _JsonFormatter()
 
         # Console handler with colors
         color_formatter = _ColorFormatter(log_format, date_format)
         stream_handler = logging.StreamHandler(sys.stdout)
-        stream_handler.setLevel(self.level)
-        stream_handler.setFormatter(color_formatter)
-        self.logger.addHandler(stream_handler)
+        stream_handler.setFormatter(json_formatter if self.json_format else color_formatter)
 
         # File handler with rotation
         file_formatter = logging.Formatter(log_format, date_format)
         file_handler = RotatingFileHandler(
             constants.LOG_FILE_PATH, maxBytes=self.max_bytes, backupCount=0, encoding="utf-8"
         )
-        file_handler.setLevel(self.level)
-        file_handler.setFormatter(file_formatter)
-        self.logger.addHandler(file_handler)
+        file_handler.setFormatter(json_formatter if self.json_format else file_formatter)
+        return [stream_handler, file_handler]
+
+    def _start_queue_listener(self, handlers: List[logging.Handler]) -> None:
+        """
+        The logging call only enqueues the record, formatting and I/O run on the listener's
+        thread. Noisy debug call sites are rate limited before anything is enqueued
+        """
+        queue_handler = _DroppingQueueHandler(queue.Queue(constants.LOG_QUEUE_SIZE))
+        queue_handler.addFilter(
+            _RateLimitFilter(constants.LOG_DEBUG_RATE_LIMIT, constants.LOG_DEBUG_RATE_BURST)
+        )
+        self.logger.addHandler(queue_handler)
+        self.listener = QueueListener(queue_handler.queue, *handlers)
+        self.listener.start()
+        atexit.register(self.stop)
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(before=self._acquire_listener_handlers,
+                                after_in_parent=self._release_listener_handlers,
+                                after_in_child=self._restart_listener_in_child)
+
+    def _acquire_listener_handlers(self) -> None:
+        """
+        Wait for the listener thread to finish writing a record, or the fork may copy the lock
+        of `sys.stdout`'s buffer held, and the child's first write to it would hang
+        """
+        for handler in self.listener.handlers:
+            handler.acquire()
+
+    def _release_listener_handlers(self) -> None:
+        for handler in reversed(self.listener.handlers):
+            handler.release()
+
+    def _restart_listener_in_child(self) -> None:
+        """
+        A forked process has no listener thread, and the queue's lock may be held. `logging`
+        has already reset the handlers' locks (acquired before forking)
+        """
+        if self.listener._thread is None:  # pylint: disable=protected-access # stopped
+            return
+        self.listener.queue = queue.Queue(constants.LOG_QUEUE_SIZE)
+        self.listener._thread = None  # pylint: disable=protected-access
+        for handler in self.logger.handlers:
+            if isinstance(handler, QueueHandler):
+                handler.queue = self.listener.queue
+        self.listener.start()
+
+    def stop(self) -> None:
+        """Write the queued records and stop the listener thread"""
+        if self.listener is not None and self.listener._thread is not None:  # pylint: disable=protected-access
+            self.listener.stop()
 
     def _capture_external_loggers(self):
         all_external_loggers_names = logging.Logger.manager.loggerDict.keys()
@@ -0,0 +1,24 @@
+import os
+from pathlib import Path
+from typing import Iterator, Union
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+
+@contextmanager
+def file_lock(path: Union[str, Path]) -> Iterator[None]:
+    """Exclusive advisory lock of `path` across processes (Unix only, a no-op elsewhere)"""
+    if fcntl is None:
+        yield
+        return
+    os.makedirs(Path(path).parent, exist_ok=True)
+    with open(path, "a", encoding='utf-8') as file:
+        fcntl.flock(file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(file, fcntl.LOCK_UN)
@@ -0,0 +1,17 @@
+from dataclasses import dataclass, field
+
+from deploy_chatbot_python.config import constants
+
+
+@dataclass
+class RestartBackoff:
+    """Exponential restart delay of a supervised process, reset once it ran for `stable_after`"""
+    base: float = constants.RESTART_BACKOFF_SECONDS
+    maximum: float = constants.RESTART_BACKOFF_MAX_SECONDS
+    stable_after: float = constants.RESTART_STABLE_SECONDS
+    failures: int = field(default=0, init=False)
+
+    def next_delay(self, lifetime: float) -> float:
+        """Delay before restarting a process that crashed after running `lifetime` seconds"""
+        self.failures = 1 if lifetime >= self.stable_after else self.failures + 1
+        return min(self.maximum, self.base * 2 ** (self.failures - 1))
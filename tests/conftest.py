@@ -0,0 +1,46 @@
+from typing import ClassVar, List
+
+import pytest
+from llama_index.core.embeddings import MockEmbedding
+from llama_index.core.llms import MockLLM
+
+from deploy_chatbot_python.config import constants
+from deploy_chatbot_python.core.llama_indexer import LlamaIndexer
+
+
+class CountingEmbedding(MockEmbedding):
+    embedded_texts: ClassVar[List[str]] = []
+
+    def _get_text_embedding(self, text: str) -> List[float]:
+        CountingEmbedding.embedded_texts.append(text)
+        return super()._get_text_embedding(text)
+
+
+@pytest.fixture
+def offline_models(monkeypatch):
+    """Replace the OpenAI models with local mocks so no network calls are made"""
+    def _initialize_mock_models(self, params):  # pylint: disable=unused-argument
+        self.llm = MockLLM()
+        self.embedding_model = CountingEmbedding(embed_dim=8)
+
+    CountingEmbedding.embedded_texts = []
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+    monkeypatch.setattr(LlamaIndexer, '_initialize_models_from_params', _initialize_mock_models)
+    return CountingEmbedding
+
+
+@pytest.fixture
+def training_data(tmp_path, monkeypatch):
+    """Point all data paths at a temporary directory and return its training folder"""
+    training_path = tmp_path / 'training'
+    training_path.mkdir()
+    monkeypatch.setattr(constants, 'DATA_PATH', tmp_path)
+    monkeypatch.setattr(constants, 'TRAINING_DATA_PATH', training_path)
+    monkeypatch.setattr(constants, 'TRAINING_DATA_HASH_PATH', tmp_path / 'training_data_hash.txt')
+    monkeypatch.setattr(constants, 'INDEX_STORE_PATH', tmp_path / 'index_storage')
+    monkeypatch.setattr(constants, 'INDEX_MANIFEST_PATH', tmp_path / 'index_manifest.json')
+    monkeypatch.setattr(constants, 'INDEX_LOCK_PATH', tmp_path / 'index.lock')
+    monkeypatch.setattr(constants, 'NAMESPACES_PATH', tmp_path / 'namespaces')
+    monkeypatch.setattr(constants, 'RESPONSE_CACHE_PATH', tmp_path / 'response_cache.json')
+    monkeypatch.setattr(constants, 'EMBEDDING_CACHE_PATH', tmp_path / 'embedding_cache')
+    return training_path
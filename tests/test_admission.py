@@ -0,0 +1,68 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException, Request
+
+from deploy_chatbot_python.backend.admission import AdmissionController, run_admitted
+from deploy_chatbot_python.core import metrics
+
+
+def _request(disconnect_after: float = 60.0) -> Request:
+    async def receive():
+        await asyncio.sleep(disconnect_after)
+        return {"type": "http.disconnect"}
+    return Request({"type": "http", "method": "POST", "headers": []}, receive)
+
+
+@pytest.mark.asyncio
+async def test_full_queue_is_rejected_and_waiting_is_bounded():
+    controller = AdmissionController(max_in_flight=1, max_queued=1, queue_timeout=0.05)
+    admission = await controller.acquire()
+    waiting = asyncio.ensure_future(controller.acquire())
+    await asyncio.sleep(0)
+
+    with pytest.raises(HTTPException) as rejected:
+        await controller.acquire()
+    assert rejected.value.status_code == 429
+    assert int(rejected.value.headers["Retry-After"]) >= 1
+
+    with pytest.raises(HTTPException) as timed_out:
+        await waiting
+    assert timed_out.value.status_code == 503
+
+    admission.release()
+    admission.release()
+    assert controller.in_flight == 0
+    (await controller.acquire(timeout=0.05)).release()
+
+
+@pytest.mark.asyncio
+async def test_query_is_cancelled_when_the_client_disconnects():
+    controller = AdmissionController()
+    cancelled = asyncio.Event()
+    shed = metrics.SHED_REQUESTS.value(reason='disconnect')
+
+    async def slow_query():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    with pytest.raises(HTTPException) as disconnected:
+        await run_admitted(controller, _request(disconnect_after=0.01), slow_query)
+
+    assert disconnected.value.status_code == 499
+    assert cancelled.is_set()
+    assert controller.in_flight == 0
+    assert metrics.SHED_REQUESTS.value(reason='disconnect') == shed + 1
+
+
+@pytest.mark.asyncio
+async def test_query_deadline():
+    controller = AdmissionController()
+
+    assert await run_admitted(controller, _request(), lambda: asyncio.sleep(0, 'ok')) == 'ok'
+    with pytest.raises(HTTPException) as timed_out:
+        await run_admitted(controller, _request(), lambda: asyncio.sleep(1), deadline=0.01)
+    assert timed_out.value.status_code == 504
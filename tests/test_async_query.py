@@ -0,0 +1,36 @@
+import time
+import asyncio
+
+import pytest
+
+from deploy_chatbot_python.core.index_manager import IndexManager
+
+
+class _SlowQueryEngine:  # pylint: disable=too-few-public-methods
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def aquery(self, question: str) -> str:
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(self.delay)
+        self.in_flight -= 1
+        return str(question).upper()
+
+
+@pytest.mark.asyncio
+async def test_aquery_runs_concurrently_up_to_limit(offline_models, training_data):  # pylint: disable=unused-argument
+    (training_data / 'dogs.txt').write_text('Poodles and beagles are dogs.', encoding='utf-8')
+    index_manager = IndexManager(max_concurrent_queries=4)
+    engine = _SlowQueryEngine(delay=0.2)
+    index_manager.llama_indexer.query_engine = engine
+
+    start = time.perf_counter()
+    responses = await asyncio.gather(*(index_manager.aquery(f'q{i}') for i in range(8)))
+    elapsed = time.perf_counter() - start
+
+    assert responses == [f'Q{i}' for i in range(8)]
+    assert engine.max_in_flight == 4
+    assert elapsed < 8 * engine.delay / 2
@@ -15,6 +15,7 @@ async def test_get_root():
 @pytest.mark.asyncio
 async def test_post_query():
     with TestClient(api) as client:
+        client.portal.call(api.state.index_loader.wait)
         response = client.post(
             f"/{constants.API_POST_ENDPOINT}",
             json=Query(text='What is Cabbage?').model_dump(),
@@ -0,0 +1,92 @@
+import json
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+from deploy_chatbot_python.backend.admission import AdmissionController
+from deploy_chatbot_python.backend.batch_query import gather_batch_results, iter_batch_results
+from deploy_chatbot_python.backend.server import api
+from deploy_chatbot_python.config import constants
+
+
+class _FakeIndexManager:  # pylint: disable=too-few-public-methods
+    def __init__(self):
+        self.questions = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def aquery(self, question: str) -> str:
+        self.questions.append(question)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(0.01 if question.startswith('slow') else 0)
+        self.in_flight -= 1
+        if question == 'fail':
+            raise ValueError('no answer')
+        return question.upper()
+
+
+@pytest.mark.asyncio
+async def test_batch_results_are_deduplicated_and_ordered():
+    index_manager = _FakeIndexManager()
+    questions = ['slow a', 'b', 'fail', 'b', 'slow a']
+
+    results = await gather_batch_results(index_manager, questions)
+
+    assert sorted(index_manager.questions) == ['b', 'fail', 'slow a']
+    assert results == [
+        {"index": 0, "response": 'SLOW A'},
+        {"index": 1, "response": 'B'},
+        {"index": 2, "error": 'no answer'},
+        {"index": 3, "response": 'B'},
+        {"index": 4, "response": 'SLOW A'},
+    ]
+
+
+@pytest.mark.asyncio
+async def test_batch_concurrency_is_bounded():
+    index_manager = _FakeIndexManager()
+    questions = [f'slow {i}' for i in range(20)]
+
+    indices = [result["index"] async for result in iter_batch_results(index_manager, questions, 4)]
+
+    assert sorted(indices) == list(range(20))
+    assert index_manager.max_in_flight == 4
+
+
+def test_post_query_batch(offline_models, training_data):  # pylint: disable=unused-argument
+    (training_data / 'dogs.txt').write_text('Poodles and beagles are dogs.', encoding='utf-8')
+    queries = [{"text": text} for text in ('Which dogs?', 'Poodles?', 'Which dogs?')]
+    with TestClient(api) as client:
+        client.portal.call(api.state.index_loader.wait)
+        ordered = client.post(f"/{constants.API_BATCH_ENDPOINT}", json={"queries": queries})
+        streamed = client.post(f"/{constants.API_BATCH_ENDPOINT}",
+                               json={"queries": queries, "stream": True})
+
+    assert ordered.status_code == 200
+    results = ordered.json()["results"]
+    assert [result["index"] for result in results] == [0, 1, 2]
+    assert results[0]["response"] == results[2]["response"]
+    assert streamed.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in streamed.text.splitlines()]
+    assert sorted(line["index"] for line in lines) == [0, 1, 2]
+    assert all("response" in line for line in lines)
+
+
+@pytest.mark.asyncio
+async def test_batch_questions_are_admitted_and_shed():
+    index_manager = _FakeIndexManager()
+    controller = AdmissionController(max_in_flight=1, max_queued=0)
+    held = await controller.acquire()
+
+    results = await gather_batch_results(index_manager, ['a', 'b'], admission_controller=controller)
+
+    assert [result["status"] for result in results] == [429, 429]
+    assert not index_manager.questions
+    held.release()
+
+    results = await gather_batch_results(index_manager, [f'slow {i}' for i in range(6)],
+                                         admission_controller=controller)
+    assert all("response" in result for result in results)
+    assert index_manager.max_in_flight == 1 and controller.in_flight == 0
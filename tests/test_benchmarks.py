@@ -0,0 +1,66 @@
+import json
+
+from deploy_chatbot_python.benchmarks.load import LoadTestConfig, run_load_test
+from deploy_chatbot_python.benchmarks.run import BenchmarkConfig, run_benchmark, write_results
+from deploy_chatbot_python.config import constants
+from deploy_chatbot_python.core.fake_models import FakeLLM
+
+
+def test_benchmark_runs_offline_and_writes_machine_readable_results(tmp_path, monkeypatch):
+    monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+    config = BenchmarkConfig(num_files=3, paragraphs_per_file=2, num_queries=5, concurrency=2,
+                             embedding_dim=16, ingestion_workers=1)
+
+    results = run_benchmark(config, tmp_path / 'work')
+    output = write_results(config, results, tmp_path / 'results.json')
+
+    report = json.loads(output.read_text(encoding='utf-8'))
+    assert report["config"]["num_files"] == 3
+    assert report["results"]["build"]["files"] == 3
+    assert report["results"]["build"]["nodes"] >= 3
+    assert report["results"]["query"]["count"] == 5
+    assert 0 < report["results"]["query"]["p50_ms"] <= report["results"]["query"]["p99_ms"]
+    assert report["results"]["load"]["seconds"] > 0
+    assert not constants.USE_FAKE_MODELS  # patched constants are restored
+
+
+def test_fake_llm_is_deterministic_and_streams_its_completion():
+    llm = FakeLLM(num_output=8)
+    text = llm.complete('What is a cabbage?').text
+    assert text == llm.complete('What is a cabbage?').text
+    assert ''.join(r.delta for r in llm.stream_complete('What is a cabbage?')) == text
+
+
+def test_load_test_drives_the_api_over_http(tmp_path, monkeypatch):
+    monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+    config = LoadTestConfig(concurrency=4, duration=0.5, llm_latency=0.01, num_files=2,
+                            paragraphs_per_file=2, num_questions=5)
+
+    results = run_load_test(config, tmp_path / 'work')
+    output = write_results(config, results, tmp_path / 'load.json', kind='load')
+
+    report = json.loads(output.read_text(encoding='utf-8'))
+    assert report["config"]["mode"] == 'closed'
+    assert report["results"]["ok"] == report["results"]["requests"] > 0
+    assert report["results"]["error_rate"] == 0
+    assert 0 < report["results"]["latency"]["p50_ms"] <= report["results"]["latency"]["p99_ms"]
+    assert not constants.USE_FAKE_MODELS
+
+    open_loop = run_load_test(LoadTestConfig(mode='open', qps=20, duration=0.5, llm_latency=0.01,
+                                             num_files=2, paragraphs_per_file=2),
+                              tmp_path / 'open')
+    assert open_loop["offered_qps"] > 0 and open_loop["errors"] == {}
+
+
+def test_subprocess_load_test_applies_the_config_to_the_server(tmp_path, monkeypatch):
+    monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+    config = LoadTestConfig(server='subprocess', concurrency=2, duration=0.5, llm_latency=0.01,
+                            num_files=2, paragraphs_per_file=2, num_questions=2,
+                            admission_max_in_flight=1, admission_max_queued=0)
+
+    results = run_load_test(config, tmp_path / 'work')
+
+    assert results["ok"] > 0
+    assert results["errors"].get('429', 0) > 0  # only one query admitted, none queued
+    assert results["cache"] == {}  # no cached answers, each request reaches the engine
+    assert not (tmp_path / 'work' / 'response_cache.json').exists()
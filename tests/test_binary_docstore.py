@@ -0,0 +1,52 @@
+from llama_index.core.schema import TextNode
+
+from deploy_chatbot_python.config import constants
+from deploy_chatbot_python.core.binary_docstore import BinaryDocumentStore, BinaryKVStore
+from deploy_chatbot_python.core.index_manager import IndexManager
+
+
+def _nodes(*texts: str):
+    return [
+        TextNode(id_=f'node-{i}', text=text, metadata={'file_name': f'{i}.txt'})
+        for i, text in enumerate(texts)
+    ]
+
+
+def test_nodes_are_read_lazily_and_cached(tmp_path):
+    docstore = BinaryDocumentStore()
+    docstore.add_documents(_nodes('Poodles are dogs.', 'Siamese are cats.', 'Cabbage is green.'))
+    docstore.set_document_hash('doc', 'hash')
+    docstore.persist(str(tmp_path / 'docstore.json'))
+
+    loaded = BinaryDocumentStore(
+        BinaryKVStore.from_persist_path(BinaryDocumentStore.persist_path(tmp_path), cache_size=1)
+    )
+    kvstore = loaded._kvstore  # pylint: disable=protected-access
+    assert kvstore.num_cached == 0
+    assert loaded.get_document_hash('doc') == 'hash'
+    node = loaded.get_node('node-1')
+    assert (node.get_content(), node.metadata) == ('Siamese are cats.', {'file_name': '1.txt'})
+    loaded.get_node('node-2')
+    assert kvstore.num_cached == 1
+
+    loaded.delete_document('node-0')
+    loaded.add_documents([TextNode(id_='node-3', text='Beagles are dogs.')])
+    loaded.persist(str(tmp_path / 'docstore.json'))
+    reloaded = BinaryDocumentStore.from_persist_dir(tmp_path)
+    assert sorted(reloaded.docs) == ['node-1', 'node-2', 'node-3']
+    assert reloaded.get_node('node-3').get_content() == 'Beagles are dogs.'
+    assert not (tmp_path / 'docstore.json').exists()
+
+
+def test_index_is_persisted_in_the_binary_docstore(offline_models, training_data):  # pylint: disable=unused-argument
+    (training_data / 'dogs.txt').write_text('Poodles and beagles are dogs.', encoding='utf-8')
+    IndexManager().close()
+
+    index_manager = IndexManager()  # loads the persisted index
+    docstore = index_manager.llama_indexer.index.docstore
+
+    assert (constants.INDEX_STORE_PATH / constants.DOCSTORE_BINARY_FNAME).exists()
+    assert isinstance(docstore, BinaryDocumentStore)
+    assert docstore._kvstore.num_cached == 0  # pylint: disable=protected-access
+    assert index_manager.query('Which dogs are there?')
+    assert docstore._kvstore.num_cached == 1  # pylint: disable=protected-access
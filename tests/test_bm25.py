@@ -0,0 +1,64 @@
+import pytest
+from llama_index.core.schema import TextNode
+
+from deploy_chatbot_python.config import constants
+from deploy_chatbot_python.core.bm25 import BM25Index
+from deploy_chatbot_python.core.index_manager import IndexManager
+
+TEXTS = {
+    'config': 'Set MAX_RETRY_COUNT in the config file to limit retries.',
+    'dogs': 'Poodles and beagles are dogs. Beagles are hounds.',
+    'cats': 'Siamese cats are cats.',
+}
+
+
+@pytest.fixture(name='bm25_index')
+def fixture_bm25_index():
+    index = BM25Index()
+    index.add(TextNode(id_=node_id, text=text) for node_id, text in TEXTS.items())
+    return index
+
+
+def test_bm25_ranks_keyword_matches(bm25_index, tmp_path):
+    matches, _ = bm25_index.search('what is max_retry_count?', k=3)
+    assert [node_id for node_id, _ in matches] == ['config']
+    matches, _ = bm25_index.search('beagles', k=3)
+    assert [node_id for node_id, _ in matches] == ['dogs']
+
+    bm25_index.save(tmp_path / 'bm25.npz')
+    loaded = BM25Index.load(tmp_path / 'bm25.npz')
+    assert loaded.search('cats and dogs', k=3) == bm25_index.search('cats and dogs', k=3)
+
+
+def test_bm25_delete_renumbers_rows(bm25_index):
+    bm25_index.delete(['config'])
+
+    assert bm25_index.node_ids == ['dogs', 'cats']
+    assert not bm25_index.search('max_retry_count', k=3)[0]
+    assert [node_id for node_id, _ in bm25_index.search('siamese', k=3)[0]] == ['cats']
+
+
+def test_lexical_first_retrieval_skips_the_query_embedding(offline_models, training_data,
+                                                           monkeypatch):
+    monkeypatch.setattr(constants, 'RETRIEVAL_MODE', 'lexical_first')
+    embedded_queries = []
+    original = offline_models._get_query_embedding  # pylint: disable=protected-access
+
+    def _get_query_embedding(self, query):
+        embedded_queries.append(query)
+        return original(self, query)
+
+    monkeypatch.setattr(offline_models, '_get_query_embedding', _get_query_embedding)
+    for name, text in TEXTS.items():
+        (training_data / f'{name}.txt').write_text(text, encoding='utf-8')
+    IndexManager()
+    assert (constants.INDEX_STORE_PATH / constants.BM25_INDEX_FNAME).exists()
+
+    (training_data / 'config.txt').unlink()
+    index_manager = IndexManager()  # loaded and updated incrementally
+    assert index_manager.llama_indexer.lexical_index.num_nodes == 2
+
+    assert index_manager.query('Siamese cats')
+    assert not embedded_queries
+    assert index_manager.query('Which animals bark?')  # no confident match, fused with vectors
+    assert embedded_queries == ['Which animals bark?']
@@ -0,0 +1,83 @@
+import pytest
+
+from deploy_chatbot_python.core import metrics
+from deploy_chatbot_python.core.dedup import ChunkDeduplicator, lsh_bands
+from deploy_chatbot_python.core.index_manager import IndexManager
+from deploy_chatbot_python.config import constants
+
+POLICY = (
+    'Refunds are issued within 14 days of the return being received at our warehouse. '
+    'Items must be unused and in their original packaging, with the receipt attached. '
+    'Shipping costs are not refunded unless the item arrived damaged or was sent in error. '
+    'Contact support with your order number to start a return.'
+)
+
+
+def test_lsh_bands_threshold_is_at_most_the_similarity_threshold():
+    bands, rows = lsh_bands(128, 0.9)
+    assert bands * rows == 128
+    assert (1 / bands) ** (1 / rows) <= 0.9
+
+
+def test_deduplicator_drops_exact_and_near_duplicates():
+    deduplicator = ChunkDeduplicator(threshold=0.8)
+
+    assert not deduplicator.is_duplicate(POLICY)
+    assert deduplicator.is_duplicate(POLICY.upper().replace('. ', '.\n\n'))
+    assert deduplicator.is_duplicate(POLICY.replace('14 days', '30 days'))
+    assert not deduplicator.is_duplicate('Poodles and beagles are dogs.')
+    assert (deduplicator.num_exact, deduplicator.num_near) == (1, 1)
+
+    exact_only = ChunkDeduplicator(near_duplicates=False)
+    assert not exact_only.is_duplicate(POLICY)
+    assert not exact_only.is_duplicate(POLICY.replace('14 days', '30 days'))
+
+
+@pytest.mark.parametrize('chunk_dedup, num_indexed', [('exact', 3), ('near', 2)])
+def test_index_skips_duplicated_files(offline_models, training_data, monkeypatch,  # pylint: disable=unused-argument
+                                      chunk_dedup, num_indexed):
+    monkeypatch.setattr(constants, 'CHUNK_DEDUP', chunk_dedup)
+    (training_data / 'policy.txt').write_text(POLICY, encoding='utf-8')
+    (training_data / 'policy_v2.txt').write_text(POLICY + ' Thank you!', encoding='utf-8')
+    (training_data / 'dogs.txt').write_text('Poodles and beagles are dogs.', encoding='utf-8')
+    dropped = metrics.DEDUPLICATED_CHUNKS.value(kind='near')
+
+    index_manager = IndexManager()
+
+    assert len(index_manager.llama_indexer.index.docstore.docs) == num_indexed
+    assert metrics.DEDUPLICATED_CHUNKS.value(kind='near') == dropped + 3 - num_indexed
+    assert len(offline_models.embedded_texts) == num_indexed
+
+
+def _indexed_texts(index_manager: IndexManager) -> list:
+    return [node.get_content() for node in index_manager.llama_indexer.index.docstore.docs.values()]
+
+
+def test_duplicates_are_reinserted_when_the_kept_copy_changes(offline_models, training_data):  # pylint: disable=unused-argument
+    (training_data / 'a.txt').write_text(POLICY, encoding='utf-8')
+    (training_data / 'b.txt').write_text(POLICY, encoding='utf-8')
+    (training_data / 'dogs.txt').write_text('Poodles and beagles are dogs.', encoding='utf-8')
+    assert _indexed_texts(IndexManager()).count(POLICY) == 1
+
+    (training_data / 'a.txt').write_text('A cabbage is a leafy vegetable.', encoding='utf-8')
+    assert _indexed_texts(IndexManager()).count(POLICY) == 1
+
+    (training_data / 'b.txt').unlink()
+    (training_data / 'c.txt').write_text(POLICY, encoding='utf-8')
+    (training_data / 'd.txt').write_text(POLICY, encoding='utf-8')  # a duplicate of c.txt
+    assert _indexed_texts(IndexManager()).count(POLICY) == 1
+
+    (training_data / 'c.txt').unlink()
+    assert _indexed_texts(IndexManager()).count(POLICY) == 1
+
+
+def test_added_files_are_deduplicated_against_the_index(offline_models, training_data):
+    (training_data / 'a.txt').write_text(POLICY, encoding='utf-8')
+    IndexManager()
+
+    offline_models.embedded_texts.clear()
+    (training_data / 'b.txt').write_text(POLICY, encoding='utf-8')
+    index_manager = IndexManager()
+
+    assert not offline_models.embedded_texts
+    assert _indexed_texts(index_manager).count(POLICY) == 1
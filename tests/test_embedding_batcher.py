@@ -0,0 +1,80 @@
+import asyncio
+from typing import List
+
+import pytest
+from llama_index.core.embeddings import MockEmbedding
+
+from deploy_chatbot_python.core.embedding_batcher import EmbeddingBatcher
+from deploy_chatbot_python.core.fake_models import FakeEmbedding
+from deploy_chatbot_python.core.index_manager import IndexManager
+
+
+@pytest.mark.asyncio
+async def test_concurrent_queries_share_one_embedding_call():
+    model = FakeEmbedding(embed_dim=8, latency=0.01)
+    batcher = EmbeddingBatcher(model, max_batch_size=64, max_wait=0.01)
+    questions = [f'question {i % 15}' for i in range(20)]
+
+    embeddings = await asyncio.gather(*(batcher.aget_query_embedding(q) for q in questions))
+
+    assert model.batch_sizes == [15]  # duplicates are embedded once
+    assert embeddings == [model.get_query_embedding(q) for q in questions]
+
+
+@pytest.mark.asyncio
+async def test_full_batches_are_embedded_without_waiting():
+    model = FakeEmbedding(embed_dim=8)
+    batcher = EmbeddingBatcher(model, max_batch_size=4, max_wait=10)
+
+    await asyncio.wait_for(
+        asyncio.gather(*(batcher.aget_query_embedding(f'q{i}') for i in range(8))), timeout=1
+    )
+    assert model.batch_sizes == [4, 4]
+
+
+@pytest.mark.asyncio
+async def test_embedding_errors_reach_every_waiting_query(monkeypatch):
+    model = FakeEmbedding(embed_dim=8)
+    batcher = EmbeddingBatcher(model, max_wait=0.001)
+
+    async def _failing_embeddings(self, texts):  # pylint: disable=unused-argument
+        raise RuntimeError(f'rate limited ({len(texts)} texts)')
+
+    monkeypatch.setattr(FakeEmbedding, '_aget_text_embeddings', _failing_embeddings)
+    results = await asyncio.gather(
+        *(batcher.aget_query_embedding(f'q{i}') for i in range(3)), return_exceptions=True
+    )
+    assert [str(result) for result in results] == ['rate limited (3 texts)'] * 3
+
+
+@pytest.mark.asyncio
+async def test_index_manager_batches_concurrent_query_embeddings(offline_models, training_data):  # pylint: disable=unused-argument
+    (training_data / 'dogs.txt').write_text('Poodles and beagles are dogs.', encoding='utf-8')
+    index_manager = IndexManager()
+    model = FakeEmbedding(embed_dim=8)
+    index_manager.llama_indexer.query_embedding_batcher = EmbeddingBatcher(model, max_wait=0.05)
+
+    await asyncio.gather(*(index_manager.aquery(f'Which dog is number {i}?') for i in range(10)))
+    assert model.batch_sizes == [10]
+
+
+class AsymmetricEmbedding(MockEmbedding):
+    """Embeds queries unlike texts, as instruction-prefixed models do"""
+
+    def _get_query_embedding(self, query: str) -> List[float]:
+        return [-value for value in self._get_text_embedding(query)]
+
+    async def _aget_query_embedding(self, query: str) -> List[float]:
+        return self._get_query_embedding(query)
+
+
+@pytest.mark.asyncio
+async def test_queries_are_batched_through_the_query_embedding():
+    model = AsymmetricEmbedding(embed_dim=8)
+    batcher = EmbeddingBatcher(model, max_wait=0.001)
+
+    embeddings = await asyncio.gather(*(batcher.aget_query_embedding(q) for q in ['a', 'b', 'a']))
+
+    assert embeddings == [model.get_query_embedding(q) for q in ['a', 'b', 'a']]
+    assert embeddings[0] != model.get_text_embedding('a')
+    assert batcher.num_batches == 1
@@ -0,0 +1,31 @@
+import shutil
+
+from deploy_chatbot_python.config import constants
+from deploy_chatbot_python.core.index_manager import IndexManager
+from deploy_chatbot_python.core.embedding_cache import EmbeddingCache
+
+
+def test_cache_round_trip_is_keyed_by_model(tmp_path):
+    cache = EmbeddingCache(model_name='model-a', cache_dir=tmp_path)
+    cache.put_many(['dogs', 'cats'], [[1.0, 0.0], [0.0, 1.0]])
+    cache.save()
+
+    reloaded = EmbeddingCache(model_name='model-a', cache_dir=tmp_path)
+    assert reloaded.get_many(['cats', 'cabbage', 'dogs']) == [[0.0, 1.0], None, [1.0, 0.0]]
+    assert not EmbeddingCache(model_name='model-b', cache_dir=tmp_path)
+
+
+def test_full_rebuild_reuses_cached_embeddings(offline_models, training_data):
+    (training_data / 'birds.txt').write_text('Sparrows and robins are birds.', encoding='utf-8')
+    (training_data / 'carrot.txt').write_text('A carrot is an orange root.', encoding='utf-8')
+    IndexManager()
+    assert len(offline_models.embedded_texts) == 2
+
+    offline_models.embedded_texts.clear()
+    shutil.rmtree(constants.INDEX_STORE_PATH)
+    constants.INDEX_MANIFEST_PATH.unlink()
+    (training_data / 'cats.txt').write_text('Siamese cats are cats.', encoding='utf-8')
+    IndexManager()
+
+    assert len(offline_models.embedded_texts) == 1
+    assert 'Siamese' in offline_models.embedded_texts[0]
@@ -0,0 +1,87 @@
+import json
+import time
+
+import dash
+
+from deploy_chatbot_python.frontend.callbacks import Callbacks, _Reply, append_messages
+from deploy_chatbot_python.config import constants
+
+
+def test_chat_history_is_patched_within_a_bounded_window(monkeypatch):
+    monkeypatch.setattr(constants, 'CHAT_HISTORY_WINDOW', 3)
+    chat_state = {"num_messages": 2, "reply_id": None}
+
+    patch = append_messages(chat_state, ("user", "hi"), ("bot", "Typing..."))
+
+    operations = [operation["operation"] for operation in patch.to_plotly_json()["operations"]]
+    assert operations == ["Append", "Append", "Delete"]
+    assert chat_state["num_messages"] == 3
+
+
+def _token_events(*tokens):
+    return [line for token in tokens for line in (f"data: {json.dumps({'token': token})}", "")]
+
+
+class _FakeStreamResponse:
+    def __init__(self, lines):
+        self.lines = lines + ["event: end", "data: {}", ""]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def raise_for_status(self):
+        pass
+
+    def iter_lines(self, decode_unicode):  # pylint: disable=unused-argument
+        return iter(self.lines)
+
+
+class _FakeSession:  # pylint: disable=too-few-public-methods
+    def __init__(self, lines=None):
+        self.lines = _token_events("Poodles", " and", " beagles") if lines is None else lines
+        self.num_requests = 0
+
+    def post(self, **kwargs):  # pylint: disable=unused-argument
+        self.num_requests += 1
+        return _FakeStreamResponse(self.lines)
+
+
+def test_replies_are_fetched_in_a_thread_through_the_shared_session():
+    callbacks = Callbacks(dash.Dash(__name__))
+    callbacks.session = _FakeSession()
+
+    reply_ids = [callbacks._start_reply('Which dogs?') for _ in range(2)]  # pylint: disable=protected-access
+    replies = [callbacks._replies[reply_id] for reply_id in reply_ids]  # pylint: disable=protected-access
+    deadline = time.monotonic() + 5
+    while not all(reply.done for reply in replies) and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    assert [reply.text for reply in replies] == ["Poodles and beagles"] * 2
+    assert callbacks.session.num_requests == 2
+
+
+def test_stream_error_events_are_shown_in_the_reply():
+    callbacks = Callbacks(dash.Dash(__name__))
+    callbacks.session = _FakeSession(_token_events("Poodles") + [
+        "event: error", f"data: {json.dumps({'detail': 'Query deadline exceeded'})}", "",
+    ])
+    reply = _Reply()
+
+    callbacks._stream_bot_response(reply, 'Which dogs?')  # pylint: disable=protected-access
+
+    assert reply.text == "An error occurred: Query deadline exceeded"
+
+
+def test_uncollected_replies_are_evicted(monkeypatch):
+    callbacks = Callbacks(dash.Dash(__name__))
+    callbacks.session = _FakeSession()
+    abandoned_id = callbacks._start_reply('Which dogs?')  # pylint: disable=protected-access
+
+    monkeypatch.setattr(constants, 'POST_REQUEST_TIMEOUT', -1)  # every reply is abandoned
+    reply_id = callbacks._start_reply('Which cats?')  # pylint: disable=protected-access
+
+    assert abandoned_id not in callbacks._replies  # pylint: disable=protected-access
+    assert reply_id in callbacks._replies  # pylint: disable=protected-access
@@ -0,0 +1,59 @@
+from llama_index.core.llms import MockLLM
+
+from deploy_chatbot_python.core.index_manager import IndexManager
+from deploy_chatbot_python.core.llama_indexer import LlamaIndexer
+
+
+def test_only_changed_files_are_reembedded(offline_models, training_data):
+    (training_data / 'dogs.txt').write_text('Poodles and beagles are dogs.', encoding='utf-8')
+    (training_data / 'cabbage.txt').write_text('A cabbage is a leafy vegetable.', encoding='utf-8')
+    IndexManager()
+    assert len(offline_models.embedded_texts) == 2
+
+    offline_models.embedded_texts.clear()
+    (training_data / 'cabbage.txt').write_text('A cabbage is a green vegetable.', encoding='utf-8')
+    (training_data / 'cats.txt').write_text('Siamese cats are cats.', encoding='utf-8')
+    index_manager = IndexManager()
+
+    embedded = ' '.join(offline_models.embedded_texts)
+    assert 'green vegetable' in embedded and 'Siamese' in embedded
+    assert 'Poodles' not in embedded
+    file_nodes = index_manager.llama_indexer.get_file_nodes()
+    indexed_files = sorted(path.rsplit('/', 1)[-1] for path in file_nodes)
+    assert indexed_files == ['cabbage.txt', 'cats.txt', 'dogs.txt']
+
+
+def test_removed_files_are_deleted_from_index(offline_models, training_data):
+    (training_data / 'dogs.txt').write_text('Poodles and beagles are dogs.', encoding='utf-8')
+    (training_data / 'cabbage.txt').write_text('A cabbage is a leafy vegetable.', encoding='utf-8')
+    IndexManager()
+
+    offline_models.embedded_texts.clear()
+    (training_data / 'cabbage.txt').unlink()
+    index_manager = IndexManager()
+
+    assert not offline_models.embedded_texts
+    file_nodes = index_manager.llama_indexer.get_file_nodes()
+    assert [path.rsplit('/', 1)[-1] for path in file_nodes] == ['dogs.txt']
+    assert index_manager.query('What dogs do you know?')
+
+
+def test_changing_the_embedding_model_rebuilds_the_index(offline_models, training_data,
+                                                         monkeypatch):
+    (training_data / 'dogs.txt').write_text('Poodles and beagles are dogs.', encoding='utf-8')
+    index_manager = IndexManager(response_cache_enabled=True)
+    index_manager.query('What dogs do you know?')
+    index_manager.close()
+
+    def _initialize_larger_models(self, params):  # pylint: disable=unused-argument
+        self.llm = MockLLM()
+        self.embedding_model = offline_models(embed_dim=16)
+
+    monkeypatch.setattr(LlamaIndexer, '_initialize_models_from_params', _initialize_larger_models)
+    offline_models.embedded_texts.clear()
+    index_manager = IndexManager(response_cache_enabled=True)
+
+    assert len(offline_models.embedded_texts) == 1
+    assert index_manager.llama_indexer.get_embedding_dim() == 16
+    assert index_manager.response_cache.stats['size'] == 0
+    assert index_manager.query('What dogs do you know?')
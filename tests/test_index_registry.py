@@ -0,0 +1,43 @@
+from fastapi.testclient import TestClient
+
+from deploy_chatbot_python.backend.server import api
+from deploy_chatbot_python.config import constants
+from deploy_chatbot_python.core.index_registry import IndexRegistry
+
+
+def _create_namespaces(*names: str) -> None:
+    for name in names:
+        training_path = constants.NAMESPACES_PATH / name / 'training'
+        training_path.mkdir(parents=True)
+        (training_path / f'{name}.txt').write_text(f'{name} products are great.', encoding='utf-8')
+
+
+def test_registry_evicts_the_least_recently_used_namespace(offline_models, training_data):  # pylint: disable=unused-argument
+    _create_namespaces('phones', 'laptops', 'tablets')
+    registry = IndexRegistry(max_indexes=2)
+
+    phones = registry.get('phones')
+    registry.get('laptops')
+    assert registry.get('phones') is phones
+    registry.get('tablets')
+
+    assert registry.resident == ['phones', 'tablets']
+    assert phones.paths.training_data == constants.NAMESPACES_PATH / 'phones' / 'training'
+    assert not registry.exists('watches')
+    assert not registry.exists('../training')
+    registry.close()
+    assert not registry.resident
+
+
+def test_query_namespace(offline_models, training_data):  # pylint: disable=unused-argument
+    _create_namespaces('phones')
+    (training_data / 'dogs.txt').write_text('Poodles and beagles are dogs.', encoding='utf-8')
+    with TestClient(api) as client:
+        response = client.post(f"/{constants.API_POST_ENDPOINT}",
+                               json={"text": "Which products?", "namespace": "phones"})
+        unknown = client.post(f"/{constants.API_POST_ENDPOINT}",
+                              json={"text": "Which products?", "namespace": "watches"})
+        assert api.state.index_registry.resident == ['phones']
+
+    assert response.status_code == 200 and response.json()["response"]
+    assert unknown.status_code == 404
@@ -0,0 +1,57 @@
+from deploy_chatbot_python.core.index_manager import IndexManager
+from deploy_chatbot_python.core.index_watcher import IndexWatcher
+
+
+def test_nested_training_files_are_indexed(offline_models, training_data):  # pylint: disable=unused-argument
+    (training_data / 'dogs.txt').write_text('Poodles and beagles are dogs.', encoding='utf-8')
+    (training_data / 'pets' / 'cats').mkdir(parents=True)
+    (training_data / 'pets' / 'cats' / 'cats.txt').write_text('Siamese cats.', encoding='utf-8')
+    index_manager = IndexManager()
+
+    file_nodes = index_manager.llama_indexer.get_file_nodes()
+    assert sorted(path.rsplit('/', 1)[-1] for path in file_nodes) == ['cats.txt', 'dogs.txt']
+
+
+def test_watcher_swaps_in_the_reloaded_index(offline_models, training_data):
+    (training_data / 'dogs.txt').write_text('Poodles and beagles are dogs.', encoding='utf-8')
+    index_manager = IndexManager()
+    old_query_engine = index_manager.llama_indexer.query_engine
+    old_data_hash = index_manager.data_hash
+    watcher = IndexWatcher(index_manager)
+    assert not watcher.poll()
+
+    (training_data / 'pets').mkdir()
+    (training_data / 'pets' / 'cats.txt').write_text('Siamese cats are cats.', encoding='utf-8')
+    offline_models.embedded_texts.clear()
+    assert not watcher.poll()  # the change must be stable for one more poll
+    assert index_manager.llama_indexer.query_engine is old_query_engine
+    assert watcher.poll()
+
+    assert len(offline_models.embedded_texts) == 1  # updated incrementally
+    assert 'Siamese' in offline_models.embedded_texts[0]
+    assert index_manager.data_hash != old_data_hash
+    assert index_manager.llama_indexer.query_engine is not old_query_engine
+    assert len(index_manager.llama_indexer.get_file_nodes()) == 2
+    assert old_query_engine.query('Which dogs?')  # in-flight queries finish on the old index
+    assert index_manager.query('Which cats?')
+    assert not watcher.poll()
+
+
+def test_following_watcher_swaps_in_the_index_saved_by_another_process(offline_models,
+                                                                       training_data):
+    (training_data / 'dogs.txt').write_text('Poodles and beagles are dogs.', encoding='utf-8')
+    index_manager = IndexManager()
+    follower_index_manager = IndexManager()
+    watcher = IndexWatcher(index_manager)
+    follower = IndexWatcher(follower_index_manager, follow=True)
+
+    (training_data / 'cats.txt').write_text('Siamese cats are cats.', encoding='utf-8')
+    assert not watcher.poll() and not follower.poll()  # the follower waits for the saved index
+    assert watcher.poll()
+    offline_models.embedded_texts.clear()
+
+    assert follower.poll()
+    assert not offline_models.embedded_texts  # loaded, not indexed again
+    assert follower_index_manager.data_hash == index_manager.data_hash
+    assert len(follower_index_manager.llama_indexer.get_file_nodes()) == 2
+    assert not follower.poll()
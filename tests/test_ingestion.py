@@ -0,0 +1,33 @@
+from deploy_chatbot_python.core import ingestion
+from deploy_chatbot_python.core.ingestion import iter_batches, iter_documents, list_training_files
+
+
+def test_parallel_ingestion_yields_every_document_in_bounded_batches(tmp_path):
+    nested_path = tmp_path / 'nested'
+    nested_path.mkdir()
+    for i in range(12):
+        (nested_path if i % 2 else tmp_path).joinpath(f'doc_{i}.txt').write_text(
+            f'Document number {i}.', encoding='utf-8'
+        )
+    files = list_training_files(tmp_path)
+    assert len(files) == 12
+
+    documents = iter_documents(files, num_workers=2, max_in_flight=3, min_files_for_pool=6)
+    batches = list(iter_batches(documents, 5))
+
+    assert [len(batch) for batch in batches] == [5, 5, 2]
+    assert sorted(doc.id_ for batch in batches for doc in batch) == sorted(files)
+
+
+def test_few_files_are_parsed_without_a_process_pool(tmp_path, monkeypatch):
+    def _no_pool(*args, **kwargs):
+        raise AssertionError("spawned a process pool")
+
+    monkeypatch.setattr(ingestion, 'ProcessPoolExecutor', _no_pool)
+    for i in range(3):
+        tmp_path.joinpath(f'doc_{i}.txt').write_text(f'Document number {i}.', encoding='utf-8')
+    files = list_training_files(tmp_path)
+
+    documents = list(iter_documents(files, num_workers=8, min_files_for_pool=2))
+
+    assert sorted(doc.id_ for doc in documents) == sorted(files)
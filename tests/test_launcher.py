@@ -0,0 +1,50 @@
+import pytest
+
+from deploy_chatbot_python.launcher import Launcher
+from deploy_chatbot_python.utils.restart_backoff import RestartBackoff
+
+
+class _ExitedProcess:
+    pid = 1234
+
+    def poll(self):
+        return 1
+
+    def kill(self):
+        pass
+
+
+def test_restart_backoff_doubles_until_the_process_is_stable():
+    backoff = RestartBackoff(base=1, maximum=5, stable_after=30)
+    assert [backoff.next_delay(lifetime=0) for _ in range(5)] == [1, 2, 4, 5, 5]
+    assert backoff.next_delay(lifetime=60) == 1
+
+
+def test_production_mode_forks_workers_without_reload(monkeypatch):
+    launched = {}
+    monkeypatch.setattr(Launcher, '_launch_subprocess',
+                        lambda self, cmd, name: launched.setdefault(name, cmd))
+    Launcher(production=True, num_workers=3).start_all()
+
+    assert launched['FastAPI'][-3:] == ["deploy_chatbot_python.backend.prefork", "--workers", "3"]
+    assert "--reload" not in launched['FastAPI']
+    assert launched['Dash'][-1] == "--production"
+
+
+def test_crashed_processes_are_restarted_in_production_mode_only(monkeypatch):
+    relaunched = []
+    monkeypatch.setattr(Launcher, '_launch_subprocess',
+                        lambda self, cmd, name: relaunched.append(name))
+    monkeypatch.setattr('deploy_chatbot_python.launcher.RestartBackoff',
+                        lambda: RestartBackoff(base=0))
+
+    launcher = Launcher(production=True)
+    launcher.processes = {'Dash': _ExitedProcess()}
+    launcher._commands = {'Dash': ['dash']}  # pylint: disable=protected-access
+    launcher._started_at = {'Dash': 0.0}  # pylint: disable=protected-access
+    launcher._check_processes()  # pylint: disable=protected-access
+    assert relaunched == ['Dash']
+
+    launcher.production = False
+    with pytest.raises(RuntimeError):
+        launcher._check_processes()  # pylint: disable=protected-access
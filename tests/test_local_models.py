@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+from llama_index.core.schema import NodeWithScore, QueryBundle, TextNode
+
+from deploy_chatbot_python.core import local_models
+from deploy_chatbot_python.core.local_models import CrossEncoderReranker, LocalEmbedding
+from deploy_chatbot_python.core.openai_params import OpenAIParams
+
+
+class _FakeSentenceModel:  # pylint: disable=too-few-public-methods
+    """Offline stand-in of the `sentence_transformers` models: scores are word overlaps"""
+    def __init__(self):
+        self.batch_sizes = []
+
+    def encode(self, texts, batch_size, **kwargs):  # pylint: disable=unused-argument
+        self.batch_sizes.append(len(texts))
+        return np.array([[len(text), 1.0] for text in texts]) / 10
+
+    def predict(self, pairs, batch_size):  # pylint: disable=unused-argument
+        return np.array([len(set(query.split()) & set(text.split())) for query, text in pairs])
+
+
+@pytest.fixture(name='fake_model')
+def fixture_fake_model(monkeypatch):
+    model = _FakeSentenceModel()
+    monkeypatch.setattr(local_models, 'load_sentence_transformer', lambda name: model)
+    monkeypatch.setattr(local_models, 'load_cross_encoder', lambda name: model)
+    return model
+
+
+@pytest.mark.asyncio
+async def test_local_embedding_encodes_batches(fake_model):
+    embedding = LocalEmbedding(model_name='local-test', embed_batch_size=2)
+
+    vectors = await embedding.aget_text_embedding_batch(['a', 'bb', 'ccc'])
+
+    assert fake_model.batch_sizes == [2, 1]
+    assert vectors[2] == pytest.approx([0.3, 0.1])
+    assert embedding.get_query_embedding('dd') == pytest.approx([0.2, 0.1])
+
+
+@pytest.mark.asyncio
+async def test_reranker_keeps_the_best_nodes(fake_model):  # pylint: disable=unused-argument
+    reranker = CrossEncoderReranker(model_name='local-test', top_n=2)
+    texts = ['cats are cats', 'poodles are dogs', 'beagles and poodles are dogs']
+    nodes = [NodeWithScore(node=TextNode(text=text), score=1.0) for text in texts]
+
+    reranked = await reranker.apostprocess_nodes(nodes, QueryBundle('are poodles dogs'))
+
+    assert [node.node.get_content() for node in reranked] == texts[1:]
+    assert [node.score for node in reranked] == [3, 3]
+
+
+def test_params_reject_unknown_embedding_backend(monkeypatch):
+    monkeypatch.delenv("OPENAI_API_KEY", raising=False)  # only required to create OpenAI models
+    OpenAIParams(model='m', embedding_model='e', temperature=0, embedding_backend='local')
+    with pytest.raises(ValueError):
+        OpenAIParams(model='m', embedding_model='e', temperature=0, embedding_backend='gpu')
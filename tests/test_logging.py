@@ -0,0 +1,49 @@
+import json
+import logging
+
+import pytest
+
+from deploy_chatbot_python.config import constants
+from deploy_chatbot_python.logging.logger import Logger, _RateLimitFilter, parse_logger_levels
+
+
+def _record(level: int, lineno: int) -> logging.LogRecord:
+    return logging.LogRecord('chatbot', level, 'module.py', lineno, 'message', None, None)
+
+
+def test_parse_logger_levels():
+    assert not parse_logger_levels('')
+    assert parse_logger_levels('httpx=warning, chatbot.core=DEBUG') == {
+        'httpx': logging.WARNING, 'chatbot.core': logging.DEBUG,
+    }
+    with pytest.raises(ValueError):
+        parse_logger_levels('httpx=LOUD')
+
+
+def test_debug_records_are_rate_limited_per_call_site():
+    rate_limit = _RateLimitFilter(rate=0, burst=2)
+
+    assert [rate_limit.filter(_record(logging.DEBUG, 1)) for _ in range(3)] == [True, True, False]
+    assert rate_limit.filter(_record(logging.DEBUG, 2))
+    assert rate_limit.filter(_record(logging.INFO, 1))
+    assert rate_limit.dropped == 1
+
+
+def test_production_logger_writes_json_lines_on_a_background_thread(tmp_path, monkeypatch):
+    monkeypatch.setattr(constants, 'LOG_FILE_PATH', tmp_path / 'test.log')
+    monkeypatch.setattr(Logger, '_instance', None)
+    monkeypatch.setattr(Logger, '_initialized', False)
+    logger = Logger(name='chatbot-production-test', production=True, json_format=True,
+                    logger_levels='chatbot-production-test=INFO')
+
+    logger.logger.debug('not written')
+    logger.logger.info('answered in %d ms', 12)
+    logger.stop()
+    for handler in logger.listener.handlers:
+        handler.close()
+
+    entries = [json.loads(line) for line in (tmp_path / 'test.log').read_text().splitlines()]
+    assert [(entry['level'], entry['message']) for entry in entries] == [
+        ('INFO', 'answered in 12 ms'),
+    ]
+    assert logger.listener._thread is None  # pylint: disable=protected-access
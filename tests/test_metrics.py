@@ -0,0 +1,76 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from fastapi.testclient import TestClient
+from llama_index.core.instrumentation.events.retrieval import RetrievalEndEvent, RetrievalStartEvent
+
+from deploy_chatbot_python.backend.server import api
+from deploy_chatbot_python.core import metrics
+from deploy_chatbot_python.core.index_manager import IndexManager
+from deploy_chatbot_python.core.instrumentation import MetricsEventHandler
+
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = metrics.Histogram('test_seconds', 'Test latency', ['stage'], buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 5.0):
+        histogram.observe(value, stage='a')
+
+    lines = histogram.render().splitlines()
+    assert lines[:2] == ['# HELP test_seconds Test latency', '# TYPE test_seconds histogram']
+    assert lines[2:] == [
+        'test_seconds_bucket{stage="a",le="0.1"} 1',
+        'test_seconds_bucket{stage="a",le="1.0"} 2',
+        'test_seconds_bucket{stage="a",le="+Inf"} 3',
+        'test_seconds_sum{stage="a"} 5.55',
+        'test_seconds_count{stage="a"} 3',
+    ]
+    with pytest.raises(ValueError):
+        histogram.observe(1.0, mode='a')
+
+
+def test_query_records_stage_latencies_and_tokens(offline_models, training_data):  # pylint: disable=unused-argument
+    (training_data / 'dogs.txt').write_text('Poodles and beagles are dogs.', encoding='utf-8')
+    index_manager = IndexManager()
+    stages = ('embedding', 'retrieval', 'synthesis', 'llm')
+    stage_counts = {stage: metrics.QUERY_STAGE_SECONDS.count(stage=stage) for stage in stages}
+    queries = metrics.QUERY_SECONDS.count(mode='sync')
+    prompt_tokens = metrics.LLM_TOKENS.value(kind='prompt')
+    misses = metrics.CACHE_LOOKUPS.value(cache='response', result='miss')
+
+    index_manager.query('Which dogs are there?')
+
+    assert metrics.QUERY_SECONDS.count(mode='sync') == queries + 1
+    for stage in stages:
+        assert metrics.QUERY_STAGE_SECONDS.count(stage=stage) > stage_counts[stage]
+    assert metrics.LLM_TOKENS.value(kind='prompt') > prompt_tokens
+    assert metrics.CACHE_LOOKUPS.value(cache='response', result='miss') == misses + 1
+    assert metrics.INDEX_OPERATION_SECONDS.count(operation='build') >= 1
+
+
+def test_stage_events_of_concurrent_threads_are_all_recorded():
+    handler = MetricsEventHandler()
+    retrievals = metrics.QUERY_STAGE_SECONDS.count(stage='retrieval')
+
+    def _retrieve(span_id: str) -> None:
+        handler.handle(RetrievalStartEvent(str_or_query_bundle='q', span_id=span_id))
+        handler.handle(RetrievalEndEvent(str_or_query_bundle='q', nodes=[], span_id=span_id))
+
+    with ThreadPoolExecutor(8) as pool:
+        list(pool.map(_retrieve, (f'span-{i}' for i in range(1000))))
+
+    assert metrics.QUERY_STAGE_SECONDS.count(stage='retrieval') == retrievals + 1000
+    assert not handler._stage_starts  # pylint: disable=protected-access
+
+
+def test_metrics_endpoint_is_served_before_the_index_is_ready(monkeypatch):
+    monkeypatch.setattr('deploy_chatbot_python.backend.index_loader.IndexLoader.start',
+                        lambda self, background: None)
+    with TestClient(api) as client:
+        client.get('/health')
+        response = client.get('/metrics')
+
+    assert response.status_code == 200
+    assert response.headers['content-type'].startswith('text/plain; version=0.0.4')
+    assert 'chatbot_http_request_seconds_count{method="GET",path="/health",status="200"}' in (
+        response.text
+    )
@@ -0,0 +1,59 @@
+import pstats
+import asyncio
+
+from deploy_chatbot_python.core.profiling import RequestProfiler, profiled
+
+
+def _fibonacci(n: int) -> int:
+    return n if n < 2 else _fibonacci(n - 1) + _fibonacci(n - 2)
+
+
+def test_profile_is_written_and_rotated(tmp_path):
+    request_profiler = RequestProfiler(enabled=True, output_dir=tmp_path, max_files=2)
+
+    paths = []
+    for _ in range(3):
+        with request_profiler.profile('GET /query') as path:
+            with request_profiler.profile('nested') as nested_path:
+                _fibonacci(15)
+        assert nested_path is None
+        paths.append(path)
+
+    assert sorted(tmp_path.iterdir()) == paths[1:]
+    assert paths[0].name.endswith('-GET_query.prof')
+    stats = pstats.Stats(str(paths[-1]))
+    assert any(function[2] == '_fibonacci' for function in stats.stats)  # pylint: disable=no-member
+
+
+def test_profiled_is_a_no_op_when_disabled(tmp_path):
+    disabled = RequestProfiler(enabled=False, sample_rate=1.0, output_dir=tmp_path)
+    assert profiled('fib', disabled)(_fibonacci) is _fibonacci
+
+    sampled = RequestProfiler(enabled=True, sample_rate=1.0, output_dir=tmp_path)
+    assert profiled('fib', sampled)(_fibonacci)(10) == 55
+    assert len(list(tmp_path.glob('*-fib.prof'))) == 1
+    assert not RequestProfiler(enabled=True, sample_rate=0.0).should_profile()
+
+
+def test_profiled_samples_coroutines_and_async_generators(tmp_path):
+    sampled = RequestProfiler(enabled=True, sample_rate=1.0, output_dir=tmp_path)
+
+    @profiled('afib', sampled)
+    async def _afibonacci(n: int) -> int:
+        await asyncio.sleep(0)
+        return _fibonacci(n)
+
+    @profiled('fibs', sampled)
+    async def _fibonaccis(n: int):
+        for i in range(n):
+            await asyncio.sleep(0)
+            yield _fibonacci(i)
+
+    async def _collect():
+        return await _afibonacci(10), [number async for number in _fibonaccis(5)]
+
+    assert asyncio.run(_collect()) == (55, [0, 1, 1, 2, 3])
+    for name in ('afib', 'fibs'):
+        path, = tmp_path.glob(f'*-{name}.prof')
+        stats = pstats.Stats(str(path))
+        assert any(function[2] == '_fibonacci' for function in stats.stats)  # pylint: disable=no-member
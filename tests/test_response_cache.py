@@ -0,0 +1,99 @@
+import asyncio
+
+from deploy_chatbot_python.backend.index_loader import IndexLoader
+from deploy_chatbot_python.core.index_manager import IndexManager
+from deploy_chatbot_python.core.response_cache import ResponseCache
+
+
+def test_exact_hits_are_normalized_and_scoped_to_data_hash():
+    cache = ResponseCache(similarity_threshold=None)
+    cache.put('What is a Cabbage?', 'hash-1', 'A vegetable.')
+
+    assert cache.get('  what is a   cabbage ', 'hash-1') == 'A vegetable.'
+    assert cache.get('What is a cabbage?', 'hash-2') is None
+    assert cache.stats['hits'] == 1 and cache.stats['misses'] == 1
+
+
+def test_semantic_hits_respect_threshold():
+    cache = ResponseCache(similarity_threshold=0.9)
+    cache.put('What is a cabbage?', 'hash-1', 'A vegetable.', embedding=[1.0, 0.0])
+
+    assert cache.get('Tell me about cabbages', 'hash-1', embedding=[0.99, 0.05]) == 'A vegetable.'
+    assert cache.get('What are dogs?', 'hash-1', embedding=[0.0, 1.0]) is None
+    assert cache.stats['semantic_hits'] == 1
+
+
+def test_lru_and_ttl_eviction():
+    cache = ResponseCache(max_size=2, ttl=None, similarity_threshold=None)
+    cache.put('a', 'h', '1')
+    cache.put('b', 'h', '2')
+    cache.get('a', 'h')
+    cache.put('c', 'h', '3')
+    assert cache.get('b', 'h') is None
+    assert cache.get('a', 'h') == '1'
+
+    expiring_cache = ResponseCache(ttl=-1, similarity_threshold=None)
+    expiring_cache.put('a', 'h', '1')
+    assert expiring_cache.get('a', 'h') is None
+
+
+def test_persistence_round_trip(tmp_path):
+    cache = ResponseCache(similarity_threshold=0.9, persist_path=tmp_path / 'cache.json')
+    cache.put('What is a cabbage?', 'hash-1', 'A vegetable.', embedding=[1.0, 0.0])
+    cache.save()
+
+    reloaded = ResponseCache(similarity_threshold=0.9, persist_path=tmp_path / 'cache.json')
+    assert reloaded.get('what is a cabbage', 'hash-1') == 'A vegetable.'
+    assert reloaded.get('cabbages?', 'hash-1', embedding=[1.0, 0.01]) == 'A vegetable.'
+
+
+def test_index_manager_serves_repeated_questions_from_cache(offline_models, training_data):
+    (training_data / 'dogs.txt').write_text('Poodles and beagles are dogs.', encoding='utf-8')
+    index_manager = IndexManager()
+    first = index_manager.query('What dogs do you know?')
+    offline_models.embedded_texts.clear()
+
+    assert index_manager.query('what dogs do you know') == first
+    assert index_manager.response_cache.stats['hits'] == 1
+    index_manager.close()
+
+    (training_data / 'dogs.txt').write_text('Huskies are dogs.', encoding='utf-8')
+    reindexed_manager = IndexManager()
+    assert reindexed_manager.response_cache.stats['size'] == 0
+
+
+def test_exact_hits_do_not_embed_the_question(offline_models, training_data, monkeypatch):
+    embedded_questions = []
+    get_query_embedding = offline_models._get_query_embedding  # pylint: disable=protected-access
+
+    def _get_query_embedding(self, query):
+        embedded_questions.append(query)
+        return get_query_embedding(self, query)
+
+    monkeypatch.setattr(offline_models, '_get_query_embedding', _get_query_embedding)
+    (training_data / 'dogs.txt').write_text('Poodles and beagles are dogs.', encoding='utf-8')
+    index_manager = IndexManager(response_cache_enabled=True)
+    index_manager.response_cache.similarity_threshold = 0.95  # semantic tier on
+    first = index_manager.query('What dogs do you know?')
+    assert embedded_questions == ['What dogs do you know?']
+
+    assert index_manager.query('what dogs do you know') == first
+    assert asyncio.run(index_manager.aquery('What dogs do you know?')) == first
+    assert embedded_questions == ['What dogs do you know?']
+    assert index_manager.response_cache.stats == {
+        "size": 1, "hits": 2, "semantic_hits": 0, "misses": 1, "hit_rate": 2 / 3,
+    }
+
+
+def test_only_the_primary_worker_saves_the_cache(offline_models, training_data, monkeypatch):  # pylint: disable=unused-argument
+    (training_data / 'dogs.txt').write_text('Poodles and beagles are dogs.', encoding='utf-8')
+    index_manager = IndexManager()
+    index_manager.query('What dogs do you know?')
+    monkeypatch.setattr(IndexLoader, 'preloaded_index_manager', index_manager)
+
+    for is_primary in (False, True):
+        monkeypatch.setattr(IndexLoader, 'is_primary', is_primary)
+        index_loader = IndexLoader()
+        index_loader.start()
+        asyncio.run(index_loader.close())
+        assert index_manager.paths.response_cache.exists() == is_primary
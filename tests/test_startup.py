@@ -0,0 +1,66 @@
+import sys
+import json
+import threading
+import subprocess
+
+from fastapi.testclient import TestClient
+
+from deploy_chatbot_python.backend.server import api, Query
+from deploy_chatbot_python.core.index_manager import IndexManager
+from deploy_chatbot_python.config import constants
+
+
+HEAVY_MODULES = ('llama_index.core', 'openai', 'yaml')
+
+
+def test_api_and_frontend_imports_are_fast_and_lazy():
+    script = (
+        "import sys, time, json\n"
+        "start = time.perf_counter()\n"
+        "import deploy_chatbot_python.backend.server\n"
+        "elapsed = time.perf_counter() - start\n"
+        "import deploy_chatbot_python.frontend.callbacks\n"
+        f"print(json.dumps([elapsed, [m for m in {HEAVY_MODULES!r} if m in sys.modules]]))\n"
+    )
+    output = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True,
+                            check=True).stdout
+    elapsed, heavy_modules = json.loads(output.strip().splitlines()[-1])
+    assert not heavy_modules
+    assert elapsed < constants.API_IMPORT_TIME_TARGET_SECONDS
+
+
+def test_api_is_live_before_the_index_is_ready(offline_models, training_data, monkeypatch):  # pylint: disable=unused-argument
+    (training_data / 'dogs.txt').write_text('Poodles and beagles are dogs.', encoding='utf-8')
+    release = threading.Event()
+    initialize = IndexManager._initialize  # pylint: disable=protected-access
+
+    def _blocked_initialize(self):
+        release.wait(timeout=30)
+        initialize(self)
+
+    monkeypatch.setattr(IndexManager, '_initialize', _blocked_initialize)
+    question = Query(text='What dogs do you know?').model_dump()
+    with TestClient(api) as client:
+        assert client.get("/health").json() == {"status": "live"}
+        ready = client.get("/ready")
+        assert ready.status_code == 503 and ready.json()["status"] == "loading"
+        query = client.post(f"/{constants.API_POST_ENDPOINT}", json=question)
+        assert query.status_code == 503 and "Retry-After" in query.headers
+
+        release.set()
+        client.portal.call(api.state.index_loader.wait)
+        assert client.get("/ready").json() == {"status": "ready"}
+        query = client.post(f"/{constants.API_POST_ENDPOINT}", json=question)
+        assert query.status_code == 200
+
+
+def test_ready_reports_a_failed_index_load(offline_models, training_data, monkeypatch):  # pylint: disable=unused-argument
+    def _failing_initialize(self):
+        raise ValueError("broken index")
+
+    monkeypatch.setattr(IndexManager, '_initialize', _failing_initialize)
+    with TestClient(api) as client:
+        client.portal.call(api.state.index_loader.wait)
+        ready = client.get("/ready")
+    assert ready.status_code == 503
+    assert ready.json() == {"status": "failed", "error": "broken index"}
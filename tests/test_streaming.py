@@ -0,0 +1,23 @@
+import json
+
+from fastapi.testclient import TestClient
+
+from deploy_chatbot_python.backend.server import api, Query
+from deploy_chatbot_python.config import constants
+
+
+def test_post_query_stream_yields_token_events(offline_models, training_data):  # pylint: disable=unused-argument
+    (training_data / 'dogs.txt').write_text('Poodles and beagles are dogs.', encoding='utf-8')
+    with TestClient(api) as client:
+        client.portal.call(api.state.index_loader.wait)
+        response = client.post(
+            f"/{constants.API_STREAM_ENDPOINT}",
+            json=Query(text='What dogs do you know?').model_dump(),
+        )
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    *token_events, end_event = response.text.strip().split("\n\n")
+    tokens = [json.loads(event[len("data:"):])["token"] for event in token_events]
+    assert len(tokens) > 1
+    assert ''.join(tokens).strip()
+    assert end_event.startswith(f"event: {constants.STREAM_END_EVENT}")
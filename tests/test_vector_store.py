@@ -0,0 +1,123 @@
+import json
+
+import numpy as np
+import pytest
+from llama_index.core.schema import NodeRelationship, RelatedNodeInfo, TextNode
+from llama_index.core.vector_stores.types import VectorStoreQuery
+
+from deploy_chatbot_python.core.vector_store import MemmapVectorStore
+
+
+def _make_nodes(vectors: np.ndarray) -> list:
+    return [
+        TextNode(
+            id_=f'node-{i}',
+            embedding=vector.tolist(),
+            relationships={NodeRelationship.SOURCE: RelatedNodeInfo(node_id=f'doc-{i % 2}')},
+        )
+        for i, vector in enumerate(vectors)
+    ]
+
+
+@pytest.mark.parametrize('dtype', ['float32', 'float16', 'int8'])
+def test_query_matches_exact_cosine_top_k_after_persist(tmp_path, dtype):
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(200, 16)).astype(np.float32)
+    query = rng.normal(size=16).astype(np.float32)
+    normalized = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    expected = [f'node-{i}' for i in np.argsort(-(normalized @ query))[:5]]
+
+    store = MemmapVectorStore(dtype=dtype)
+    store.add(_make_nodes(vectors))
+    persist_path = tmp_path / 'default__vector_store.json'
+    store.persist(str(persist_path))
+    loaded = MemmapVectorStore.from_persist_path(persist_path)
+
+    assert isinstance(loaded.vectors, np.memmap)
+    result = loaded.query(VectorStoreQuery(query_embedding=query.tolist(), similarity_top_k=5))
+    assert result.ids[:3] == expected[:3]
+    assert len(set(result.ids) & set(expected)) >= 4
+
+
+def test_deleted_nodes_are_excluded_and_compacted(tmp_path):
+    store = MemmapVectorStore()
+    store.add(_make_nodes(np.eye(4, dtype=np.float32)))
+    store.delete('doc-0')  # node-0 and node-2
+
+    result = store.query(VectorStoreQuery(query_embedding=[1, 0, 1, 0], similarity_top_k=4))
+    assert result.ids == ['node-1', 'node-3']
+
+    persist_path = tmp_path / 'default__vector_store.json'
+    store.persist(str(persist_path))
+    loaded = MemmapVectorStore.from_persist_path(persist_path)
+    assert loaded.num_vectors == 2 and loaded.vectors.shape == (2, 4)
+
+
+def _clustered_vectors(rng, num_vectors: int, num_clusters: int, dim: int) -> np.ndarray:
+    centers = rng.normal(size=(num_clusters, dim))
+    labels = rng.integers(num_clusters, size=num_vectors)
+    return (centers[labels] + 0.3 * rng.normal(size=(num_vectors, dim))).astype(np.float32)
+
+
+def test_ivf_recall_at_k_against_exact_search(tmp_path):
+    rng = np.random.default_rng(0)
+    vectors = _clustered_vectors(rng, 4000, 32, 24)
+    queries = _clustered_vectors(rng, 50, 32, 24)
+    store = MemmapVectorStore(nprobe=4)
+    store.add(_make_nodes(vectors))
+    store.build_ivf_index(num_lists=64)
+
+    assert store.recall_at_k(queries, k=10, nprobe=64) == 1.0
+    assert store.recall_at_k(queries, k=10) >= 0.85
+    assert store.recall_at_k(queries, k=10, nprobe=1) <= store.recall_at_k(queries, k=10)
+
+    persist_path = tmp_path / 'default__vector_store.json'
+    store.persist(str(persist_path))
+    loaded = MemmapVectorStore.from_persist_path(persist_path)
+    assert loaded.ivf_index.num_lists == 64
+    query = VectorStoreQuery(query_embedding=queries[0].tolist(), similarity_top_k=10)
+    assert loaded.query(query, nprobe=4).ids == store.query(query).ids
+
+
+def test_rows_added_after_ivf_training_are_searchable():
+    rng = np.random.default_rng(1)
+    store = MemmapVectorStore(nprobe=1)
+    store.add(_make_nodes(_clustered_vectors(rng, 500, 8, 16)))
+    store.build_ivf_index(num_lists=8)
+    new_vector = rng.normal(size=16).astype(np.float32)
+    store.add([TextNode(id_='new', embedding=new_vector.tolist())])
+
+    result = store.query(VectorStoreQuery(query_embedding=new_vector.tolist(), similarity_top_k=1))
+    assert result.ids == ['new']
+
+
+def test_interrupted_persist_keeps_the_previous_generation(tmp_path, monkeypatch):
+    rng = np.random.default_rng(2)
+    vectors = rng.normal(size=(10, 8)).astype(np.float32)
+    store = MemmapVectorStore()
+    store.add(_make_nodes(vectors))
+    persist_path = tmp_path / 'default__vector_store.json'
+    store.persist(str(persist_path))
+    store.add([TextNode(id_='new', embedding=rng.normal(size=8).tolist())])
+    store.delete_nodes(['node-0'])
+
+    def _crash(*args, **kwargs):
+        raise OSError('disk full')
+
+    with monkeypatch.context() as patch:
+        patch.setattr(json, 'dump', _crash)  # the arrays are written, the meta is not
+        with pytest.raises(OSError):
+            store.persist(str(persist_path))
+    loaded = MemmapVectorStore.from_persist_path(persist_path)
+    normalized = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    assert np.allclose(loaded.vectors, normalized)  # not the new rows under the previous ids
+
+    store.persist(str(persist_path))
+    loaded = MemmapVectorStore.from_persist_path(persist_path)
+    assert loaded.num_vectors == 10 and 'new' in loaded._rows  # pylint: disable=protected-access
+    assert len(list(tmp_path.glob('*.npy'))) == 1  # the arrays of other generations are removed
+
+    meta = json.loads(persist_path.read_text(encoding='utf-8'))
+    persist_path.write_text(json.dumps({**meta, 'num_rows': 11}), encoding='utf-8')
+    with pytest.raises(ValueError):
+        MemmapVectorStore.from_persist_path(persist_path)